@@ -4,12 +4,22 @@ API REST para comentários + Consumidor de eventos de jogos
 """
 
 from flask import Flask, Response, request
-from pymemcache.client import base
-from flask_apscheduler import APScheduler
+from comum.armazenamento import EscritaParcial, LogPaginado, agrupar_por_jogo, configurar, get_cliente
+from comum.barramento import Barramento, acompanhar, formatar_sse
+from comum.cache import CacheRespostas, responder
+from comum.eventos import ConsumidorEventos, EventoInvalido
+from comum.ingestao import INGESTAO_EM_LOTE, GravacaoParcial, IngestaoEmLote
+from comum.logs import Log
+from comum.metricas import instrumentar
+from comum.novidades import Novidades
+from comum.persistencia import PERSISTENCIA_ARQUIVO, Persistencia
+from comum.quentes import DetectorQuentes
+from comum.registro import RegistroJogos, normalizar
+import atexit
 import json
-import pika
 import os
-from time import sleep
+import signal
+import sys
 
 VERSAO = "2.0-event-driven-simple"
 INFO = {
@@ -18,41 +28,90 @@ INFO = {
     "versao": VERSAO,
 }
 
-RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq")
 MEMCACHED_HOST = os.getenv("MEMCACHED_HOST", "banco_comentarios")
-MEMCACHED_PORT = 11211
+MEMCACHED_PORT = int(os.getenv("MEMCACHED_PORT", "11211"))
+
+# Eventos de jogos chegam por um exchange fanout: cada serviço tem sua própria
+# fila durável (todos recebem todos os eventos) e réplicas do mesmo serviço
+# compartilham essa fila como consumidores concorrentes
+EXCHANGE_EVENTOS = os.getenv("EXCHANGE_EVENTOS", "jogos_eventos")
+FILA_EVENTOS = os.getenv("FILA_EVENTOS", "jogos_eventos_comentarios")
+
+# Comentários gravados por uma réplica são anunciados às demais por este
+# exchange (invalidação do cache e streams SSE)
+EXCHANGE_NOVIDADES = os.getenv("EXCHANGE_NOVIDADES", "comentarios_novidades")
+
+# Leitura paginada: limit padrão quando só cursor/since é informado e teto
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+
+# Leitura de vários jogos numa requisição: GET /comentarios?ids=1,2,3
+LIMITE_IDS = 500
+
+# Streams SSE: comentário de keep-alive enviado quando não há novidades
+INTERVALO_HEARTBEAT = 15
 
 servico = Flask("comentarios")
+instrumentar(servico, "comentarios")
+log = Log("COMENTARIOS")
 
-# Controle de jogos conhecidos (recebidos via eventos)
-jogos_conhecidos = set()
+# Cópia durável (logs de comentários) num arquivo SQLite, gravada em
+# background e usada para reidratar o Memcached ao iniciar
+persistencia = None
+if PERSISTENCIA_ARQUIVO:
+    persistencia = Persistencia("COMENTARIOS", PERSISTENCIA_ARQUIVO, ("comentarios_",))
 
+configurar(servidor=(MEMCACHED_HOST, MEMCACHED_PORT), persistencia=persistencia)
+log_comentarios = LogPaginado("comentarios")
+barramento = Barramento()
+cache = CacheRespostas()
+novidades = Novidades("COMENTARIOS", EXCHANGE_NOVIDADES, cache, barramento)
 
-def processar_eventos_jogos():
-    """Consome eventos de jogos criados (executado periodicamente)"""
-    try:
-        credentials = pika.PlainCredentials('admin', 'admin')
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(host=RABBITMQ_HOST, credentials=credentials)
-        )
-        channel = connection.channel()
-        channel.queue_declare(queue="jogos_eventos", durable=True)
+# Jogos com muitas requisições gravam em sub-páginas e toleram um cache curto
+quentes = DetectorQuentes("COMENTARIOS")
 
-        # Processa mensagens disponíveis
-        method_frame, header_frame, body = channel.basic_get(queue="jogos_eventos")
+# Jogos conhecidos (recebidos via eventos), persistidos no Memcached do serviço
+registro = RegistroJogos("COMENTARIOS", get_cliente)
 
-        while method_frame:
-            jogo = json.loads(body)
-            jogos_conhecidos.add(jogo["id_jogo"])
-            print(f"[COMENTARIOS] Jogo recebido: {jogo['id_jogo']} - {jogo['time1']} vs {jogo['time2']}")
 
-            channel.basic_ack(method_frame.delivery_tag)
-            method_frame, header_frame, body = channel.basic_get(queue="jogos_eventos")
+def gravar_lote(id_jogo, comentarios):
+    """Grava de uma vez os comentários acumulados de um jogo (ingestão em lote)
 
-        connection.close()
+    Só os comentários que não chegaram ao log voltam como pendentes: regravar
+    os já anexados os duplicaria. Depois da escrita, uma falha ao anunciar
+    não torna o lote regravável.
+    """
+    try:
+        seqs = log_comentarios.adicionar_varios(get_cliente(), id_jogo, comentarios, quentes.fragmento(id_jogo))
+    except EscritaParcial as e:
+        anunciar_gravados(id_jogo, e.gravadas)
+        raise GravacaoParcial(e.pendentes, e.gravadas) from e.__cause__
+    anunciar_gravados(id_jogo, list(zip(seqs, comentarios)))
 
+
+def anunciar_gravados(id_jogo, entradas):
+    try:
+        novidades.registrar(id_jogo, entradas)
     except Exception as e:
-        print(f"[COMENTARIOS] Erro ao processar eventos: {str(e)}")
+        log.erro("Comentários gravados sem anúncio", id_jogo=id_jogo, itens=len(entradas), erro=str(e))
+
+
+# Com INGESTAO_EM_LOTE=1, POST responde 202 e um flusher grava por jogo
+ingestao = IngestaoEmLote("COMENTARIOS", gravar_lote) if INGESTAO_EM_LOTE else None
+
+
+def processar_evento_jogo(jogo):
+    """Registra um jogo criado recebido via evento
+
+    Evento sem id inteiro é descartado; falhas do Memcached sobem para o
+    consumidor, que devolve a mensagem à fila. Registrar de novo um jogo
+    conhecido não grava nada, então reentregas são inofensivas.
+    """
+    id_jogo = normalizar(jogo.get("id_jogo")) if isinstance(jogo, dict) else None
+    if id_jogo is None:
+        raise EventoInvalido(f"Evento de jogo sem id válido: {jogo!r}")
+    registro.registrar(get_cliente(), id_jogo)
+    log.amostra("Jogo recebido", id_jogo=id_jogo)
 
 
 @servico.get("/")
@@ -67,69 +126,254 @@ def is_alive():
 
 @servico.post("/comentarios/<id_jogo>")
 def adicionar_comentario(id_jogo):
-    """Adiciona comentário a um jogo"""
+    """Adiciona comentário a um jogo
+
+    Jogos desconhecidos são recusados (404) pelo registro em memória; 503
+    enquanto o registro ainda está sendo carregado. Na ingestão em lote,
+    202 ao entrar na fila, 429 com a fila cheia e 503 no encerramento.
+    """
+    if not registro.pronto.is_set():
+        return Response(status=503)
+    if not registro.conhece_ou_atualiza(id_jogo):
+        return Response(status=404)
+
     sucesso = False
     novo_comentario = request.get_json()
+    quentes.registrar(id_jogo)
 
-    try:
-        cliente = base.Client((MEMCACHED_HOST, MEMCACHED_PORT))
-        comentarios_bytes = cliente.get(f"comentarios_{id_jogo}")
-        comentarios = []
-        if comentarios_bytes:
-            comentarios = json.loads(comentarios_bytes.decode("utf-8"))
+    if ingestao is not None:
+        if not isinstance(novo_comentario, dict):
+            return Response(status=422)
+        return aceitar_em_lote(id_jogo, novo_comentario)
 
-        comentarios.append(novo_comentario)
-        cliente.set(f"comentarios_{id_jogo}", json.dumps(comentarios))
-        cliente.close()
+    try:
+        cliente = get_cliente()
+        seq = log_comentarios.adicionar(cliente, id_jogo, novo_comentario, quentes.fragmento(id_jogo))
+        novidades.registrar(id_jogo, [(seq, novo_comentario)])
 
-        print(f"[COMENTARIOS] Adicionado ao jogo {id_jogo}: {novo_comentario}")
+        log.amostra("Adicionado ao jogo", id_jogo=id_jogo, seq=seq)
         sucesso = True
 
     except Exception as e:
-        print(f"[COMENTARIOS] Erro ao adicionar: {str(e)}")
+        log.erro("Erro ao adicionar", erro=str(e))
 
     return Response(status=201 if sucesso else 422)
 
 
-@servico.get("/comentarios/<id_jogo>")
-def get_comentarios(id_jogo):
-    """Busca comentários de um jogo"""
-    sucesso, comentarios = False, []
+def aceitar_em_lote(id_jogo, item):
+    if ingestao.enfileirar(id_jogo, item):
+        return Response(status=202)
+    # Recusado: fila cheia (429) ou serviço encerrando (503)
+    return Response(status=429 if ingestao.aceitando else 503, headers={"Retry-After": "1"})
+
+
+@servico.post("/comentarios/_bulk")
+def importar_comentarios():
+    """Importa em massa itens de vários jogos: [{"id_jogo": 1, ...}, ...]
+
+    Os itens são agrupados por jogo e cada jogo recebe uma única reserva de
+    sequência e um append por página, em vez de uma requisição por item.
+    """
+    try:
+        grupos = agrupar_por_jogo(request.get_json())
+    except (TypeError, ValueError) as e:
+        log.erro("Importação inválida", erro=str(e))
+        return Response(status=400)
+
+    sucesso, total_itens = False, sum(map(len, grupos.values()))
+
+    try:
+        cliente = get_cliente()
+        for id_jogo, itens in grupos.items():
+            seqs = log_comentarios.adicionar_varios(cliente, id_jogo, itens)
+            novidades.registrar(id_jogo, list(zip(seqs, itens)))
+
+        log.info("Importação concluída", itens=total_itens, jogos=len(grupos))
+        sucesso = True
+
+    except Exception as e:
+        log.erro("Erro ao importar", erro=str(e))
+
+    return Response(
+        json.dumps({"itens": total_itens, "jogos": len(grupos)}),
+        status=201 if sucesso else 422,
+        mimetype="application/json",
+    )
+
+
+@servico.get("/comentarios")
+def get_comentarios_varios():
+    """Comentários de vários jogos de uma vez: /comentarios?ids=1,2,3[&limit=N]
+
+    Dois get_many no total (contadores e páginas), em vez de uma requisição
+    por jogo. Com `limit`, só os últimos N de cada jogo; `total` traz a
+    quantidade completa.
+    """
+    ids_jogos = [id_jogo for id_jogo in request.args.get("ids", "").split(",") if id_jogo]
+    limite = request.args.get("limit", type=int)
+    if (
+        not ids_jogos
+        or len(ids_jogos) > LIMITE_IDS
+        or ("limit" in request.args and (limite is None or not 1 <= limite <= LIMITE_MAXIMO))
+    ):
+        return Response(status=400)
+
+    sucesso, resultado = False, []
 
     try:
-        cliente = base.Client((MEMCACHED_HOST, MEMCACHED_PORT))
-        comentarios_bytes = cliente.get(f"comentarios_{id_jogo}")
-        if comentarios_bytes:
-            comentarios = json.loads(comentarios_bytes.decode("utf-8"))
-        cliente.close()
+        cliente = get_cliente()
+        logs = log_comentarios.ler_varios(cliente, list(dict.fromkeys(ids_jogos)), limite)
+        resultado = [
+            {"id_jogo": id_jogo, "total": total, "comentarios": [item for _, item in entradas]}
+            for id_jogo, (total, entradas) in logs.items()
+        ]
         sucesso = True
 
     except Exception as e:
-        print(f"[COMENTARIOS] Erro ao buscar: {str(e)}")
+        log.erro("Erro ao buscar vários jogos", erro=str(e))
 
     return Response(
-        json.dumps(comentarios if sucesso else []),
+        json.dumps(resultado if sucesso else []),
         status=200 if sucesso else 500,
         mimetype="application/json",
     )
 
 
+@servico.get("/comentarios/<id_jogo>")
+def get_comentarios(id_jogo):
+    """Busca comentários de um jogo
+
+    Sem parâmetros devolve a lista inteira. Com `limit`, `cursor` (seq
+    exclusivo para páginas mais antigas) ou `since` (seq exclusivo para
+    comentários mais novos) lê só as páginas necessárias; os cabeçalhos
+    X-Proximo-Cursor e X-Ultimo-Seq indicam de onde continuar.
+
+    Respostas ficam no cache do processo (com ETag) até o jogo receber
+    um comentário novo, aqui ou em outra réplica; em jogos quentes, por
+    até TOLERANCIA_QUENTE mesmo com comentários novos.
+    """
+    paginado = any(nome in request.args for nome in ("limit", "cursor", "since"))
+    limite = request.args.get("limit", LIMITE_PADRAO, type=int)
+    cursor = request.args.get("cursor", type=int)
+    since = request.args.get("since", type=int)
+    if paginado and (
+        not 1 <= limite <= LIMITE_MAXIMO
+        or ("cursor" in request.args and (cursor is None or cursor < 1))
+        or ("since" in request.args and (since is None or since < 0))
+    ):
+        return Response(status=400)
+    quentes.registrar(id_jogo)
+
+    def gerar():
+        sucesso, comentarios, cabecalhos = False, [], {}
+
+        try:
+            cliente = get_cliente()
+            if paginado:
+                entradas = log_comentarios.ler_janela(cliente, id_jogo, limite, antes=cursor, depois=since)
+                comentarios = [comentario for _, comentario in entradas]
+                cabecalhos["X-Ultimo-Seq"] = str(entradas[-1][0] if entradas else since or 0)
+                if entradas and entradas[0][0] > 1:
+                    cabecalhos["X-Proximo-Cursor"] = str(entradas[0][0])
+            else:
+                comentarios = log_comentarios.ler(cliente, id_jogo)
+            sucesso = True
+
+        except Exception as e:
+            log.erro("Erro ao buscar", erro=str(e))
+
+        return Response(
+            json.dumps(comentarios if sucesso else []),
+            status=200 if sucesso else 500,
+            mimetype="application/json",
+            headers=cabecalhos if sucesso else None,
+        )
+
+    return responder(cache, id_jogo, gerar, quentes.tolerancia(id_jogo))
+
+
+@servico.get("/comentarios/<id_jogo>/stream")
+def stream_comentarios(id_jogo):
+    """Stream SSE com os comentários novos do jogo à medida que chegam
+
+    Com Last-Event-ID (ou `since`) os comentários perdidos são recuperados
+    do log antes de seguir ao vivo; cada evento leva seu seq como id.
+    Acima de LIMITE_STREAMS streams no processo, 503 com Retry-After.
+    """
+    ultimo = request.headers.get("Last-Event-ID", type=int)
+    if ultimo is None:
+        ultimo = request.args.get("since", type=int)
+
+    # Assina antes de ler o log para não perder nada entre as duas etapas
+    fila = barramento.assinar(id_jogo)
+    if fila is None:
+        log.amostra("Stream recusado, limite do processo atingido", id_jogo=id_jogo)
+        return Response(status=503, headers={"Retry-After": "5"})
+
+    def gerar(ultimo):
+        try:
+            while ultimo is not None:
+                entradas = log_comentarios.ler_janela(get_cliente(), id_jogo, LIMITE_MAXIMO, depois=ultimo)
+                for seq, comentario in entradas:
+                    yield formatar_sse("comentario", comentario, seq)
+                    ultimo = seq
+                if len(entradas) < LIMITE_MAXIMO:
+                    break
+
+            for evento in acompanhar(fila, INTERVALO_HEARTBEAT):
+                if evento is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                seq, comentario = evento
+                if ultimo is None or seq > ultimo:
+                    yield formatar_sse("comentario", comentario, seq)
+        finally:
+            barramento.cancelar(id_jogo, fila)
+
+    return Response(
+        gerar(ultimo),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def iniciar_tarefas():
+    """Inicia as threads de background do processo (consumidores de eventos)
+
+    Chamado pelo __main__ e, no modo de produção, pelo hook
+    post_worker_init do gunicorn em cada worker.
+    """
+    # Memcached vazio (reiniciado) é reidratado do arquivo antes de tudo
+    if persistencia is not None:
+        persistencia.iniciar(get_cliente)
+
+    # Flusher da ingestão em lote (grava o que foi aceito ao encerrar)
+    if ingestao is not None:
+        ingestao.iniciar()
+
+    # Carrega o registro de jogos (snapshot + diário) e o mantém atualizado
+    registro.start()
+    atexit.register(registro.parar)
+
+    # Push, idempotente por message_id; workers e réplicas dividem a fila
+    consumidor = ConsumidorEventos(
+        "COMENTARIOS", EXCHANGE_EVENTOS, FILA_EVENTOS, processar_evento_jogo, get_cliente
+    )
+    consumidor.start()
+    atexit.register(consumidor.parar)
+
+    # Novidades das outras réplicas: fila exclusiva por processo
+    novidades.iniciar()
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print(f"Iniciando {INFO['descricao']}")
     print(f"Versão: {INFO['versao']}")
     print("=" * 60)
 
-    # Inicia agendador para processar eventos em background
-    agendador = APScheduler()
-    agendador.init_app(servico)
-    agendador.add_job(
-        id="processar_eventos_jogos",
-        func=processar_eventos_jogos,
-        trigger="interval",
-        seconds=3
-    )
-    agendador.start()
+    iniciar_tarefas()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
 
-    # Inicia Flask
+    # Inicia Flask (servidor de desenvolvimento; produção usa gunicorn)
     servico.run(host="0.0.0.0", port=5000, debug=True, use_reloader=False)
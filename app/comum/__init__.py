@@ -0,0 +1,3 @@
+"""
+Módulos compartilhados pelos serviços de jogos, comentários e votação
+"""
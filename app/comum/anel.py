@@ -0,0 +1,302 @@
+"""
+Anel de hashing consistente - Distribui as chaves por vários nós Memcached
+Chaves de um mesmo jogo ficam no mesmo nó; réplicas opcionais nos nós seguintes do anel
+"""
+
+import re
+import threading
+from bisect import bisect
+from functools import lru_cache
+from hashlib import blake2b
+from time import monotonic
+
+from comum.logs import Log
+from comum.metricas import MEMCACHED_ERROS
+
+# Pontos de cada nó no anel: mais pontos, divisão mais uniforme
+PONTOS_POR_NO = 160
+
+# Nó que falhou é evitado por este tempo quando há outra réplica
+NO_INATIVO_SEGUNDOS = 5
+
+# <prefixo>_<id>_... (páginas, contador, placares) roteia por <prefixo>_<id>;
+# as demais chaves roteiam pelo nome inteiro. Sub-chaves de jogos quentes
+# (..._f<k>) roteiam por <prefixo>_<id>_f<k>, espalhando o jogo pelo anel
+GRUPO_POR_JOGO = re.compile(r"^([a-z]+_\d+)(?:_|$)")
+FRAGMENTO = re.compile(r"_f\d+$")
+
+log = Log("MEMCACHED")
+
+
+def _hash(texto):
+    return int.from_bytes(blake2b(texto.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def chave_roteamento(chave):
+    """Parte da chave usada no hashing: agrupa as chaves de cada jogo"""
+    grupo = GRUPO_POR_JOGO.match(chave)
+    if grupo is None:
+        return chave
+    fragmento = FRAGMENTO.search(chave)
+    return grupo.group(1) + fragmento.group(0) if fragmento else grupo.group(1)
+
+
+def ler_nos(texto):
+    """"host1:11211,host2" -> [("host1", 11211), ("host2", 11211)]"""
+    nos = []
+    for parte in texto.split(","):
+        parte = parte.strip()
+        if parte:
+            host, _, porta = parte.partition(":")
+            nos.append((host, int(porta or 11211)))
+    return nos
+
+
+class AnelConsistente:
+    """Mapeia chaves para nós; incluir um nó move só ~1/N das chaves"""
+
+    def __init__(self, nos, pontos_por_no=PONTOS_POR_NO):
+        self.nos = list(nos)
+        pontos = sorted(
+            (_hash(f"{no}#{i}"), indice)
+            for indice, no in enumerate(self.nos)
+            for i in range(pontos_por_no)
+        )
+        self._hashes = [h for h, _ in pontos]
+        self._indices = [indice for _, indice in pontos]
+        self.nos_para = lru_cache(maxsize=65536)(self._nos_para)
+
+    def _nos_para(self, roteamento, replicas=1):
+        """Índices dos `replicas` nós distintos que guardam a chave, primário primeiro"""
+        replicas = min(replicas, len(self.nos))
+        posicao = bisect(self._hashes, _hash(roteamento))
+        escolhidos = []
+        for passo in range(len(self._indices)):
+            indice = self._indices[(posicao + passo) % len(self._indices)]
+            if indice not in escolhidos:
+                escolhidos.append(indice)
+                if len(escolhidos) == replicas:
+                    break
+        return tuple(escolhidos)
+
+
+class ClienteDistribuido:
+    """Cliente com a interface usada do pymemcache sobre vários nós
+
+    Cada chave vai para os `replicas` nós seguintes do anel. Escritas são
+    aplicadas em todas as réplicas e leituras usam a primeira que responder;
+    uma réplica fora do ar é pulada por NO_INATIVO_SEGUNDOS. incr/decr/append
+    numa réplica sem a chave a recriam com o valor de outra réplica. Com uma
+    única réplica, falhas do nó chegam a quem chamou, como no cliente simples.
+    """
+
+    def __init__(self, clientes, nos, replicas=1):
+        self.clientes = list(clientes)
+        self.anel = AnelConsistente(nos)
+        self.replicas = max(1, min(replicas, len(self.clientes)))
+        self._inativo_ate = [0.0] * len(self.clientes)
+        self._lock = threading.Lock()
+
+    def _ordem(self, chave):
+        """Réplicas da chave, com as ativas antes das que falharam há pouco"""
+        indices = self.anel.nos_para(chave_roteamento(chave), self.replicas)
+        if len(indices) == 1:
+            return indices
+        agora = monotonic()
+        return sorted(indices, key=lambda indice: self._inativo_ate[indice] > agora)
+
+    def _falhou(self, indice, operacao, erro):
+        MEMCACHED_ERROS.labels(operacao).inc()
+        with self._lock:
+            self._inativo_ate[indice] = monotonic() + NO_INATIVO_SEGUNDOS
+        log.aviso("Nó do Memcached falhou", no=str(self.anel.nos[indice]), operacao=operacao, erro=str(erro))
+
+    def _ler(self, operacao, chave, *args, **kwargs):
+        ordem = self._ordem(chave)
+        for posicao, indice in enumerate(ordem):
+            try:
+                return getattr(self.clientes[indice], operacao)(chave, *args, **kwargs)
+            except Exception as e:
+                if posicao == len(ordem) - 1:
+                    raise
+                self._falhou(indice, operacao, e)
+
+    def _escrever(self, operacao, chave, *args, **kwargs):
+        """Aplica em todas as réplicas; resultado da primeira que respondeu"""
+        ordem = self._ordem(chave)
+        respondeu, resultado, erro = False, None, None
+        for indice in ordem:
+            try:
+                retorno = getattr(self.clientes[indice], operacao)(chave, *args, **kwargs)
+            except Exception as e:
+                if len(ordem) == 1:
+                    raise
+                self._falhou(indice, operacao, e)
+                erro = e
+                continue
+            if not respondeu:
+                respondeu, resultado = True, retorno
+        if not respondeu:
+            raise erro
+        return resultado
+
+    def _agrupar(self, chaves, posicao=0):
+        grupos = {}
+        for chave in chaves:
+            ordem = self._ordem(chave)
+            if posicao < len(ordem):
+                grupos.setdefault(ordem[posicao], []).append(chave)
+        return grupos
+
+    # --- Leituras ---
+
+    def get(self, key, *args, **kwargs):
+        return self._ler("get", key, *args, **kwargs)
+
+    def gets(self, key, *args, **kwargs):
+        return self._ler("gets", key, *args, **kwargs)
+
+    def get_many(self, keys):
+        """Um get_many por nó; chaves de um nó que falhou vão para a réplica seguinte"""
+        encontrados, pendentes = {}, list(keys)
+        for posicao in range(self.replicas):
+            falharam = []
+            for indice, chaves in self._agrupar(pendentes, posicao).items():
+                try:
+                    encontrados.update(self.clientes[indice].get_many(chaves))
+                except Exception as e:
+                    if posicao == self.replicas - 1:
+                        raise
+                    self._falhou(indice, "get_many", e)
+                    falharam.extend(chaves)
+            if not falharam:
+                break
+            pendentes = falharam
+        return encontrados
+
+    # --- Escritas ---
+
+    def set(self, key, value, *args, **kwargs):
+        return self._escrever("set", key, value, *args, **kwargs)
+
+    def set_many(self, values, *args, **kwargs):
+        """Um set_many por nó e réplica; retorna as chaves que nenhuma réplica gravou"""
+        gravadas = set()
+        for posicao in range(self.replicas):
+            for indice, chaves in self._agrupar(values, posicao).items():
+                try:
+                    falhas = self.clientes[indice].set_many({chave: values[chave] for chave in chaves}, *args, **kwargs)
+                except Exception as e:
+                    if self.replicas == 1:
+                        raise
+                    self._falhou(indice, "set_many", e)
+                    continue
+                gravadas.update(set(chaves).difference(falhas))
+        return [chave for chave in values if chave not in gravadas]
+
+    def add(self, key, value, *args, **kwargs):
+        """Só o primário decide; com sucesso, as réplicas recebem um set"""
+        ordem = self._ordem(key)
+        for posicao, indice in enumerate(ordem):
+            try:
+                resultado = self.clientes[indice].add(key, value, *args, **kwargs)
+                break
+            except Exception as e:
+                if posicao == len(ordem) - 1:
+                    raise
+                self._falhou(indice, "add", e)
+        if resultado:
+            self._replicar(ordem[posicao + 1:], "set", key, value, *args, **kwargs)
+        return resultado
+
+    def cas(self, key, value, cas, *args, **kwargs):
+        """Compare-and-swap no primário; com sucesso, as réplicas recebem um set"""
+        ordem = self._ordem(key)
+        resultado = self.clientes[ordem[0]].cas(key, value, cas, *args, **kwargs)
+        if resultado:
+            self._replicar(ordem[1:], "set", key, value, *args, **kwargs)
+        return resultado
+
+    def _replicar(self, indices, operacao, *args, **kwargs):
+        for indice in indices:
+            try:
+                getattr(self.clientes[indice], operacao)(*args, **kwargs)
+            except Exception as e:
+                self._falhou(indice, operacao, e)
+
+    def _atualizar(self, operacao, chave, *args, **kwargs):
+        """incr/decr/append em todas as réplicas, copiando a chave para as que não a têm
+
+        Uma réplica que perdeu a chave (reiniciou ou estava fora quando ela
+        foi criada) é reparada com o valor de uma réplica que a tem, em vez
+        de ficar para trás. O resultado é o da primeira réplica que tinha a
+        chave, então um primário vazio não esconde o valor das outras.
+        """
+        ordem = self._ordem(chave)
+        if len(ordem) == 1:
+            return getattr(self.clientes[ordem[0]], operacao)(chave, *args, **kwargs)
+
+        resultados, erro = {}, None
+        for indice in ordem:
+            try:
+                resultados[indice] = getattr(self.clientes[indice], operacao)(chave, *args, **kwargs)
+            except Exception as e:
+                self._falhou(indice, operacao, e)
+                erro = e
+        if not resultados:
+            raise erro
+
+        ausentes = [indice for indice, resultado in resultados.items() if resultado is None or resultado is False]
+        origem = next((indice for indice in resultados if indice not in ausentes), None)
+        if origem is None:
+            return resultados[ordem[0]] if ordem[0] in resultados else next(iter(resultados.values()))
+        if ausentes:
+            if operacao == "append":
+                valor = self.clientes[origem].get(chave)
+            else:
+                valor = str(resultados[origem])
+            if valor is not None:
+                for indice in ausentes:
+                    self._reparar(indice, operacao, chave, valor, *args, **kwargs)
+        return resultados[origem]
+
+    def _reparar(self, indice, operacao, chave, valor, *args, **kwargs):
+        """Cria a chave ausente numa réplica sem sobrescrever um reparo concorrente
+
+        `valor` já inclui a operação desta chamada. O add só vale para o
+        primeiro reparo; se outro chegou antes, a réplica recebe de novo só
+        esta operação em vez de um set que a faria voltar a um valor antigo.
+        Um contador pode ficar adiantado (lacuna na sequência), nunca
+        atrasado; um append já contido no valor copiado não é repetido.
+        """
+        cliente = self.clientes[indice]
+        try:
+            if cliente.add(chave, valor, noreply=False):
+                return
+            if operacao == "append":
+                dados = args[0] if isinstance(args[0], bytes) else str(args[0]).encode("utf-8")
+                if dados in (cliente.get(chave) or b""):
+                    return
+            getattr(cliente, operacao)(chave, *args, **kwargs)
+        except Exception as e:
+            self._falhou(indice, operacao, e)
+
+    def append(self, key, value, *args, **kwargs):
+        return self._atualizar("append", key, value, *args, **kwargs)
+
+    def incr(self, key, value, *args, **kwargs):
+        return self._atualizar("incr", key, value, *args, **kwargs)
+
+    def decr(self, key, value, *args, **kwargs):
+        return self._atualizar("decr", key, value, *args, **kwargs)
+
+    def touch(self, key, *args, **kwargs):
+        return self._escrever("touch", key, *args, **kwargs)
+
+    def delete(self, key, *args, **kwargs):
+        return self._escrever("delete", key, *args, **kwargs)
+
+    def delete_many(self, keys, *args, **kwargs):
+        for chave in keys:
+            self.delete(chave, *args, **kwargs)
+        return True
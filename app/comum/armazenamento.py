@@ -0,0 +1,337 @@
+"""
+Armazenamento compartilhado - Pool de clientes Memcached e log paginado
+Usado pelos serviços de jogos, comentários e votação
+"""
+
+import os
+import threading
+
+from pymemcache.client.base import PooledClient
+
+from comum.anel import ClienteDistribuido, ler_nos
+from comum.codec import json_dumps, json_loads
+from comum.metricas import ClienteMedido
+
+MEMCACHED_HOST = os.getenv("MEMCACHED_HOST", "localhost")
+MEMCACHED_PORT = int(os.getenv("MEMCACHED_PORT", "11211"))
+
+# Pool limitado de conexões TCP reaproveitadas entre requisições
+MEMCACHED_POOL_MAX = int(os.getenv("MEMCACHED_POOL_MAX", "32"))
+MEMCACHED_CONNECT_TIMEOUT = float(os.getenv("MEMCACHED_CONNECT_TIMEOUT", "1"))
+MEMCACHED_TIMEOUT = float(os.getenv("MEMCACHED_TIMEOUT", "1"))
+MEMCACHED_POOL_IDLE = 60
+
+# Vários nós ("host1:11211,host2:11211") substituem MEMCACHED_HOST/PORT: as
+# chaves são distribuídas por hashing consistente, com MEMCACHED_REPLICAS
+# cópias de cada uma
+MEMCACHED_NOS = os.getenv("MEMCACHED_NOS", "")
+MEMCACHED_REPLICAS = int(os.getenv("MEMCACHED_REPLICAS", "1"))
+
+# Log segmentado por jogo: contador (<prefixo>_<id>_total, via incr) e páginas
+# de tamanho fixo (<prefixo>_<id>_p<n>) que crescem por append no servidor
+TAMANHO_PAGINA = int(os.getenv("TAMANHO_PAGINA", "100"))
+
+# Jogos quentes (comum.quentes) espalham as linhas de cada página por tantas
+# sub-páginas (<prefixo>_<id>_p<n>_f<k>), listadas em <prefixo>_<id>_fragmentos
+FRAGMENTOS = int(os.getenv("FRAGMENTOS", "8"))
+
+_servidor = (MEMCACHED_HOST, MEMCACHED_PORT)
+_nos = ler_nos(MEMCACHED_NOS)
+_replicas = MEMCACHED_REPLICAS
+_serde = None
+_persistencia = None
+_cliente = None
+_lock = threading.Lock()
+
+
+def configurar(servidor=None, serde=None, cliente=None, persistencia=None, nos=None, replicas=None):
+    """Ajusta o pool do processo antes do primeiro uso
+
+    `serde` é qualquer objeto com serialize/deserialize no formato do
+    pymemcache; `cliente` substitui o pool por um cliente pronto;
+    `persistencia` (comum.persistencia) recebe uma cópia das escritas;
+    `nos` (lista de (host, porta)) tem precedência sobre `servidor`.
+    """
+    global _servidor, _serde, _persistencia, _cliente, _nos, _replicas
+    with _lock:
+        if servidor is not None:
+            _servidor = servidor
+        if nos is not None:
+            _nos = list(nos)
+        if replicas is not None:
+            _replicas = replicas
+        if serde is not None:
+            _serde = serde
+        if persistencia is not None:
+            _persistencia = persistencia
+        _cliente = cliente
+
+
+def criar_cliente(servidor, serde=None):
+    """Cria um cliente com pool de conexões limitado e TCP_NODELAY"""
+    return PooledClient(
+        servidor,
+        serde=serde,
+        connect_timeout=MEMCACHED_CONNECT_TIMEOUT,
+        timeout=MEMCACHED_TIMEOUT,
+        no_delay=True,
+        max_pool_size=MEMCACHED_POOL_MAX,
+        pool_idle_timeout=MEMCACHED_POOL_IDLE,
+    )
+
+
+def get_cliente():
+    """Retorna o cliente compartilhado do processo (seguro entre threads)
+
+    Cada chamada é medida no histograma memcached_operacao_segundos.
+    """
+    global _cliente
+    if _cliente is None:
+        with _lock:
+            if _cliente is None:
+                if len(_nos) > 1:
+                    cliente = ClienteDistribuido([criar_cliente(no, _serde) for no in _nos], _nos, _replicas)
+                else:
+                    cliente = criar_cliente(_nos[0] if _nos else _servidor, _serde)
+                if _persistencia is not None:
+                    cliente = _persistencia.envolver(cliente)
+                _cliente = ClienteMedido(cliente)
+    return _cliente
+
+
+def anexar(cliente, chave, dados):
+    """Anexa bytes a uma chave, criando-a vazia se ainda não existir
+
+    A chave nasce vazia (e os contadores em "0") para que o add só crie e
+    todo conteúdo chegue por append/incr, que a persistência soma na ordem
+    em que as cópias chegarem.
+    """
+    if not cliente.append(chave, dados, noreply=False):
+        cliente.add(chave, b"", noreply=False)
+        cliente.append(chave, dados, noreply=False)
+
+
+def agrupar_por_jogo(itens):
+    """Agrupa itens de importação em massa por id_jogo, sem o campo id_jogo
+
+    Levanta ValueError se algum item não for um objeto com id_jogo.
+    """
+    grupos = {}
+    for item in itens:
+        if not isinstance(item, dict) or "id_jogo" not in item:
+            raise ValueError("Cada item precisa ser um objeto com id_jogo")
+        resto = {campo: valor for campo, valor in item.items() if campo != "id_jogo"}
+        grupos.setdefault(str(item["id_jogo"]), []).append(resto)
+    return grupos
+
+
+class EscritaParcial(Exception):
+    """Levantada por `adicionar_varios` quando só algumas páginas foram gravadas
+
+    `gravadas` são as entradas (seq, item) já anexadas e `pendentes` os
+    itens cujas linhas não chegaram ao log; as sequências reservadas para
+    eles ficam como lacunas.
+    """
+
+    def __init__(self, gravadas, pendentes):
+        super().__init__(f"{len(pendentes)} itens não gravados")
+        self.gravadas = list(gravadas)
+        self.pendentes = list(pendentes)
+
+
+class LogPaginado:
+    """Log de itens por jogo, gravado sem ler nem reescrever a lista
+
+    O incr garante uma sequência única por item mesmo com escritas
+    concorrentes, e o append grava só a linha nova na página correspondente.
+    Cada linha é o JSON [seq, item]; as páginas crescem por append, então
+    ficam sempre em JSON por linha (sem msgpack nem compressão).
+
+    Com `fragmento`, as linhas vão para uma sub-página da página (outro nó
+    do anel, outra chave) e o número da página é anotado na chave de
+    fragmentos do jogo; a leitura busca essa chave junto com as páginas e,
+    se preciso, as sub-páginas numa segunda ida. A sequência continua
+    global, então cursores e ids dos streams não mudam.
+    """
+
+    def __init__(self, prefixo, tamanho_pagina=TAMANHO_PAGINA, fragmentos=FRAGMENTOS):
+        self.prefixo = prefixo
+        self.tamanho_pagina = tamanho_pagina
+        self.fragmentos = fragmentos
+        self._anunciadas = set()
+        self._lock = threading.Lock()
+
+    def chave_total(self, id_jogo):
+        """Contador de itens do log do jogo"""
+        return f"{self.prefixo}_{id_jogo}_total"
+
+    def chave_pagina(self, id_jogo, pagina):
+        """Página do log do jogo com até tamanho_pagina itens"""
+        return f"{self.prefixo}_{id_jogo}_p{pagina}"
+
+    def chave_subpagina(self, id_jogo, pagina, fragmento):
+        """Parte da página gravada enquanto o jogo estava quente"""
+        return f"{self.prefixo}_{id_jogo}_p{pagina}_f{fragmento}"
+
+    def chave_fragmentos(self, id_jogo):
+        """Páginas do jogo que têm sub-páginas, uma por linha"""
+        return f"{self.prefixo}_{id_jogo}_fragmentos"
+
+    def total(self, cliente, id_jogo):
+        """Quantidade de sequências já reservadas no log do jogo"""
+        total_bytes = cliente.get(self.chave_total(id_jogo))
+        return int(total_bytes) if total_bytes else 0
+
+    def reservar(self, cliente, id_jogo, quantidade=1):
+        """Reserva posições no log com incr atômico e retorna a última reservada"""
+        chave = self.chave_total(id_jogo)
+        ultimo = cliente.incr(chave, quantidade, noreply=False)
+        if ultimo is None:
+            cliente.add(chave, "0", noreply=False)
+            ultimo = cliente.incr(chave, quantidade, noreply=False)
+        return ultimo
+
+    def adicionar(self, cliente, id_jogo, item, fragmento=None):
+        """Acrescenta um item ao log do jogo e retorna sua sequência"""
+        return self.adicionar_varios(cliente, id_jogo, [item], fragmento)[0]
+
+    def adicionar_varios(self, cliente, id_jogo, itens, fragmento=None):
+        """Acrescenta vários itens com um único incr e um append por página
+
+        Se uma página falha depois de outras já gravadas, levanta
+        EscritaParcial para que o chamador regrave só os itens pendentes.
+        """
+        ultimo = self.reservar(cliente, id_jogo, len(itens))
+        seqs = list(range(ultimo - len(itens) + 1, ultimo + 1))
+
+        entradas_por_pagina = {}
+        for seq, item in zip(seqs, itens):
+            pagina = (seq - 1) // self.tamanho_pagina
+            entradas_por_pagina.setdefault(pagina, []).append((seq, item))
+        gravadas = []
+        for pagina, entradas in entradas_por_pagina.items():
+            try:
+                if fragmento is None:
+                    chave = self.chave_pagina(id_jogo, pagina)
+                else:
+                    self._anunciar(cliente, id_jogo, pagina)
+                    chave = self.chave_subpagina(id_jogo, pagina, fragmento % self.fragmentos)
+                anexar(cliente, chave, b"".join(json_dumps([seq, item]) + b"\n" for seq, item in entradas))
+            except Exception as e:
+                if not gravadas:
+                    raise
+                raise EscritaParcial(gravadas, itens[len(gravadas):]) from e
+            gravadas.extend(entradas)
+        return seqs
+
+    def _anunciar(self, cliente, id_jogo, pagina):
+        """Anota (uma vez por processo) que a página tem sub-páginas, antes da escrita"""
+        with self._lock:
+            if (id_jogo, pagina) in self._anunciadas:
+                return
+        anexar(cliente, self.chave_fragmentos(id_jogo), f"{pagina}\n")
+        with self._lock:
+            if len(self._anunciadas) > 100_000:
+                self._anunciadas.clear()
+            self._anunciadas.add((id_jogo, pagina))
+
+    def ler_intervalo(self, cliente, id_jogo, inicio, fim):
+        """Lê as entradas (seq, item) com inicio <= seq <= fim
+
+        Só busca as páginas que cobrem o intervalo, com um único get_many.
+        """
+        if fim < inicio:
+            return []
+
+        chaves = self._chaves_intervalo(id_jogo, inicio, fim)
+        marca = self.chave_fragmentos(id_jogo)
+        paginas = cliente.get_many(chaves + [marca])
+        self._juntar_fragmentos(cliente, paginas, {id_jogo: (marca, chaves)})
+        return self._entradas(paginas, chaves, inicio, fim)
+
+    def _juntar_fragmentos(self, cliente, paginas, chaves_por_jogo):
+        """Acrescenta a `paginas` as linhas das sub-páginas (uma get_many a mais)
+
+        `chaves_por_jogo` é {id_jogo: (chave de fragmentos, chaves das
+        páginas)}; só jogos cuja chave de fragmentos veio em `paginas` e
+        cita alguma das páginas pedidas custam a segunda ida.
+        """
+        subchaves = {}
+        for id_jogo, (marca, chaves) in chaves_por_jogo.items():
+            if marca not in paginas:
+                continue
+            fragmentadas = {int(linha) for linha in paginas.pop(marca).split()}
+            for chave in chaves:
+                pagina = int(chave.rpartition("_p")[2])
+                if pagina in fragmentadas:
+                    for fragmento in range(self.fragmentos):
+                        subchaves[self.chave_subpagina(id_jogo, pagina, fragmento)] = chave
+        if not subchaves:
+            return
+        for subchave, valor in cliente.get_many(list(subchaves)).items():
+            chave = subchaves[subchave]
+            paginas[chave] = paginas.get(chave, b"") + valor
+
+    def _chaves_intervalo(self, id_jogo, inicio, fim):
+        return [
+            self.chave_pagina(id_jogo, pagina)
+            for pagina in range((inicio - 1) // self.tamanho_pagina, (fim - 1) // self.tamanho_pagina + 1)
+        ]
+
+    def _entradas(self, paginas, chaves, inicio, fim):
+        """Entradas (seq, item) de `chaves` com inicio <= seq <= fim, em ordem"""
+        entradas = []
+        for chave in chaves:
+            if chave in paginas:
+                for linha in paginas[chave].splitlines():
+                    seq, item = json_loads(linha)
+                    if inicio <= seq <= fim:
+                        entradas.append((seq, item))
+        entradas.sort(key=lambda entrada: entrada[0])
+        return entradas
+
+    def ler_varios(self, cliente, ids_jogos, limite=None):
+        """Lê o log de vários jogos com dois get_many: totais e depois páginas
+
+        Jogos com sub-páginas no intervalo custam um terceiro. Com `limite`, só os últimos `limite` itens de cada jogo. Retorna
+        {id_jogo: (total, [(seq, item), ...])}.
+        """
+        chaves_total = {id_jogo: self.chave_total(id_jogo) for id_jogo in ids_jogos}
+        marcas = {id_jogo: self.chave_fragmentos(id_jogo) for id_jogo in ids_jogos}
+        totais = cliente.get_many(list(chaves_total.values()) + list(marcas.values()))
+
+        intervalos, todas = {}, []
+        for id_jogo, chave in chaves_total.items():
+            total = int(totais[chave]) if chave in totais else 0
+            inicio = 1 if limite is None else max(1, total - limite + 1)
+            chaves = self._chaves_intervalo(id_jogo, inicio, total) if total else []
+            intervalos[id_jogo] = (total, inicio, chaves)
+            todas.extend(chaves)
+        paginas = cliente.get_many(todas) if todas else {}
+        paginas.update((marca, totais[marca]) for marca in marcas.values() if marca in totais)
+        self._juntar_fragmentos(cliente, paginas, {
+            id_jogo: (marcas[id_jogo], chaves) for id_jogo, (_, _, chaves) in intervalos.items()
+        })
+
+        return {
+            id_jogo: (total, self._entradas(paginas, chaves, inicio, total))
+            for id_jogo, (total, inicio, chaves) in intervalos.items()
+        }
+
+    def ler_janela(self, cliente, id_jogo, limite, antes=None, depois=None):
+        """Lê até `limite` entradas (seq, item) sem percorrer o log inteiro
+
+        Com `depois`, as primeiras entradas com seq > depois (acompanhar
+        novidades); com `antes`, as últimas com seq < antes (paginar para
+        trás); sem nenhum dos dois, as últimas do log. Só este último caso lê
+        o contador; os demais tocam apenas as páginas do intervalo.
+        """
+        if depois is not None:
+            return self.ler_intervalo(cliente, id_jogo, depois + 1, depois + limite)
+        fim = antes - 1 if antes is not None else self.total(cliente, id_jogo)
+        return self.ler_intervalo(cliente, id_jogo, max(1, fim - limite + 1), fim)
+
+    def ler(self, cliente, id_jogo):
+        """Lê todas as páginas do log e devolve os itens em ordem"""
+        total = self.total(cliente, id_jogo)
+        return [item for _, item in self.ler_intervalo(cliente, id_jogo, 1, total)]
@@ -0,0 +1,106 @@
+"""
+Barramento em processo - Pub/sub para empurrar novidades aos streams SSE
+Alimentado pelo caminho de escrita dos serviços
+"""
+
+import json
+import os
+import queue
+import threading
+
+# Eventos pendentes por assinante; quem não acompanha é desconectado e
+# retoma pelo Last-Event-ID
+TAMANHO_FILA_ASSINANTE = int(os.getenv("TAMANHO_FILA_ASSINANTE", "1000"))
+
+# Streams abertos ao mesmo tempo por processo. No gunicorn gthread cada stream
+# ocupa uma thread do worker enquanto durar; o teto deixa as demais threads
+# (GUNICORN_THREADS) para as outras requisições, e acima dele o stream é
+# recusado com 503
+LIMITE_STREAMS = int(os.getenv("LIMITE_STREAMS", "16"))
+
+# Sentinela entregue ao assinante que ficou para trás (objeto próprio, para
+# não ser confundida com nenhum evento)
+ATRASADO = object()
+
+
+class Barramento:
+    """Pub/sub por tópico com uma fila limitada por assinante
+
+    publicar() nunca bloqueia quem escreve: se a fila de um assinante
+    enche, ela é esvaziada e recebe ATRASADO, e o stream correspondente
+    encerra para o cliente reconectar e recuperar o que perdeu do log.
+    """
+
+    def __init__(self, tamanho_fila=TAMANHO_FILA_ASSINANTE, limite=LIMITE_STREAMS):
+        self.tamanho_fila = tamanho_fila
+        self.limite = limite
+        self._assinantes = {}
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def assinar(self, topico):
+        """Fila do novo assinante, ou None se o processo já tem `limite` assinantes"""
+        fila = queue.Queue(maxsize=self.tamanho_fila)
+        with self._lock:
+            if self._total >= self.limite:
+                return None
+            self._assinantes.setdefault(topico, set()).add(fila)
+            self._total += 1
+        return fila
+
+    def cancelar(self, topico, fila):
+        with self._lock:
+            assinantes = self._assinantes.get(topico)
+            if assinantes is not None and fila in assinantes:
+                assinantes.discard(fila)
+                self._total -= 1
+                if not assinantes:
+                    del self._assinantes[topico]
+
+    def publicar(self, topico, evento):
+        with self._lock:
+            assinantes = list(self._assinantes.get(topico, ()))
+        for fila in assinantes:
+            try:
+                fila.put_nowait(evento)
+            except queue.Full:
+                self._descartar(fila)
+
+    def _descartar(self, fila):
+        try:
+            while True:
+                fila.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            fila.put_nowait(ATRASADO)
+        except queue.Full:
+            pass
+
+
+def acompanhar(fila, espera):
+    """Eventos de uma fila assinada, para o laço de um stream
+
+    Produz None quando `espera` segundos (número ou função chamada a cada
+    volta) passam sem eventos, para o stream mandar keep-alive ou o placar
+    pendente, e termina ao receber ATRASADO.
+    """
+    while True:
+        try:
+            evento = fila.get(timeout=espera() if callable(espera) else espera)
+        except queue.Empty:
+            yield None
+            continue
+        if evento is ATRASADO:
+            return
+        yield evento
+
+
+def formatar_sse(tipo, dados, id_evento=None):
+    """Serializa um evento no formato text/event-stream"""
+    linhas = []
+    if id_evento is not None:
+        linhas.append(f"id: {id_evento}")
+    linhas.append(f"event: {tipo}")
+    linhas.append(f"data: {json.dumps(dados)}")
+    return "\n".join(linhas) + "\n\n"
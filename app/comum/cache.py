@@ -0,0 +1,102 @@
+"""
+Cache de respostas - Corpos JSON já serializados das rotas GET
+Invalidado pelo caminho de escrita local e por eventos do broker (réplicas)
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from time import monotonic
+
+from flask import Response, request
+
+# Respostas guardadas por processo e validade máxima de cada uma; o TTL só
+# limita o tempo de uma resposta velha caso uma invalidação se perca
+CACHE_CAPACIDADE = int(os.getenv("CACHE_CAPACIDADE", "2048"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))
+
+# Cabeçalhos da resposta original que acompanham o corpo guardado
+CABECALHOS_GUARDADOS = ("X-Ultimo-Seq", "X-Proximo-Cursor")
+
+EntradaCache = namedtuple("EntradaCache", "corpo etag cabecalhos versao criada expira")
+
+
+class CacheRespostas:
+    """LRU limitado de respostas por URL, agrupadas por tópico (ex.: id do jogo)
+
+    Invalidar um tópico só incrementa sua versão: entradas com versão
+    antiga são descartadas quando lidas. Quem gera uma resposta anota a
+    versão antes de ler o Memcached, então uma escrita concorrente impede
+    que o resultado velho seja guardado.
+
+    Com `tolerancia` (jogos quentes), entradas de versão antiga ainda são
+    servidas e guardadas enquanto tiverem menos que `tolerancia` segundos.
+    """
+
+    def __init__(self, capacidade=CACHE_CAPACIDADE, ttl=CACHE_TTL):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+        self._versoes = {}
+        self._lock = threading.Lock()
+
+    def versao(self, topico):
+        with self._lock:
+            return self._versoes.get(topico, 0)
+
+    def obter(self, chave, topico, tolerancia=0):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            agora = monotonic()
+            velha = entrada.versao != self._versoes.get(topico, 0) and agora - entrada.criada >= tolerancia
+            if entrada.expira < agora or velha:
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return entrada
+
+    def guardar(self, chave, topico, versao, corpo, cabecalhos=(), tolerancia=0):
+        etag = hashlib.blake2b(corpo, digest_size=12).hexdigest()
+        agora = monotonic()
+        entrada = EntradaCache(corpo, etag, tuple(cabecalhos), versao, agora, agora + self.ttl)
+        with self._lock:
+            if tolerancia or versao == self._versoes.get(topico, 0):
+                self._entradas[chave] = entrada
+                self._entradas.move_to_end(chave)
+                while len(self._entradas) > self.capacidade:
+                    self._entradas.popitem(last=False)
+        return entrada
+
+    def invalidar(self, topico):
+        with self._lock:
+            self._versoes[topico] = self._versoes.get(topico, 0) + 1
+
+
+def responder(cache, topico, gerar, tolerancia=0):
+    """Serve a rota GET atual do cache, gerando e guardando a resposta na falta
+
+    `gerar` devolve a Response da rota; só respostas 200 são guardadas.
+    If-None-Match com o ETag atual devolve 304 sem corpo. `tolerancia`
+    aceita respostas de até tantos segundos mesmo após invalidações.
+    """
+    chave = request.full_path
+    entrada = cache.obter(chave, topico, tolerancia)
+    if entrada is None:
+        versao = cache.versao(topico)
+        resposta = gerar()
+        if resposta.status_code != 200:
+            return resposta
+        cabecalhos = [
+            (nome, resposta.headers[nome]) for nome in CABECALHOS_GUARDADOS if nome in resposta.headers
+        ]
+        entrada = cache.guardar(chave, topico, versao, resposta.get_data(), cabecalhos, tolerancia)
+
+    if request.if_none_match.contains(entrada.etag):
+        resposta = Response(status=304, headers=entrada.cabecalhos)
+    else:
+        resposta = Response(entrada.corpo, status=200, mimetype="application/json", headers=entrada.cabecalhos)
+    resposta.set_etag(entrada.etag)
+    return resposta
@@ -0,0 +1,102 @@
+"""
+Codec compartilhado - Serialização dos valores no Memcached e das mensagens AMQP
+Usa orjson/msgpack quando instalados e cai para o json da biblioteca padrão
+"""
+
+import json
+import os
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Formato dos valores novos: "json" (orjson se disponível) ou "msgpack".
+# Valores de qualquer formato continuam legíveis, então só troque para
+# msgpack depois que todos os processos tiverem esta versão.
+CODEC_FORMATO = os.getenv("CODEC_FORMATO", "json")
+
+# Valores maiores que isto (bytes) são comprimidos com zlib; 0 desliga
+CODEC_COMPRIMIR_ACIMA = int(os.getenv("CODEC_COMPRIMIR_ACIMA", "4096"))
+CODEC_NIVEL_ZLIB = 1
+
+# Primeiro byte dos valores binários. JSON nunca começa com estes bytes,
+# então valores antigos (JSON puro, sem marca) seguem sendo lidos.
+MARCA_MSGPACK = b"\x01"
+MARCA_ZLIB = b"\x02"
+
+TIPO_JSON = "application/json"
+TIPO_MSGPACK = "application/msgpack"
+CODIFICACAO_ZLIB = "deflate"
+
+
+def json_dumps(obj):
+    """JSON em bytes (orjson quando instalado), para formatos de texto por linha"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def json_loads(dados):
+    if orjson is not None:
+        return orjson.loads(dados)
+    return json.loads(dados)
+
+
+def _serializar(obj, formato):
+    if formato == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("CODEC_FORMATO=msgpack requer o pacote msgpack")
+        return msgpack.packb(obj, use_bin_type=True)
+    return json_dumps(obj)
+
+
+def _comprimir(dados, comprimir_acima):
+    return 0 < comprimir_acima < len(dados)
+
+
+def codificar(obj, formato=CODEC_FORMATO, comprimir_acima=CODEC_COMPRIMIR_ACIMA):
+    """Serializa um valor do Memcached com a marca do seu formato"""
+    dados = _serializar(obj, formato)
+    if formato == "msgpack":
+        dados = MARCA_MSGPACK + dados
+    if _comprimir(dados, comprimir_acima):
+        dados = MARCA_ZLIB + zlib.compress(dados, CODEC_NIVEL_ZLIB)
+    return dados
+
+
+def decodificar(dados):
+    """Lê um valor gravado por codificar() ou um JSON antigo sem marca"""
+    if dados[:1] == MARCA_ZLIB:
+        dados = zlib.decompress(dados[1:])
+    if dados[:1] == MARCA_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("Valor em msgpack requer o pacote msgpack")
+        return msgpack.unpackb(dados[1:], raw=False)
+    return json_loads(dados)
+
+
+def codificar_mensagem(obj, formato=CODEC_FORMATO, comprimir_acima=CODEC_COMPRIMIR_ACIMA):
+    """Corpo AMQP e seus content_type/content_encoding"""
+    dados = _serializar(obj, formato)
+    tipo = TIPO_MSGPACK if formato == "msgpack" else TIPO_JSON
+    if _comprimir(dados, comprimir_acima):
+        return zlib.compress(dados, CODEC_NIVEL_ZLIB), tipo, CODIFICACAO_ZLIB
+    return dados, tipo, None
+
+
+def decodificar_mensagem(corpo, properties=None):
+    """Lê um corpo AMQP conforme as properties; sem elas, assume JSON"""
+    if properties is not None and properties.content_encoding == CODIFICACAO_ZLIB:
+        corpo = zlib.decompress(corpo)
+    if properties is not None and properties.content_type == TIPO_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("Mensagem em msgpack requer o pacote msgpack")
+        return msgpack.unpackb(corpo, raw=False)
+    return json_loads(corpo)
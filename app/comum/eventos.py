@@ -0,0 +1,168 @@
+"""
+Eventos compartilhados - Consumidor push do exchange de jogos
+Usado pelos serviços de comentários e votação
+"""
+
+import os
+import threading
+from time import perf_counter
+
+import pika
+
+from comum.codec import decodificar_mensagem
+from comum.logs import Log
+from comum.metricas import EVENTO_SEGUNDOS, EVENTOS_CONSUMIDOS
+
+RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq")
+
+# Consumo push (basic_consume): mensagens em voo por consumidor e teto do
+# intervalo entre tentativas de reconexão com o RabbitMQ
+PREFETCH_COUNT = int(os.getenv("PREFETCH_COUNT", "50"))
+RECONEXAO_MAX_SEGUNDOS = 30
+
+# Ids de mensagens já processadas ficam no Memcached do serviço por este tempo
+TTL_DEDUP = int(os.getenv("TTL_DEDUP", str(7 * 24 * 3600)))
+
+# Falhas transitórias (Memcached, tratamento) devolvem a mensagem à fila
+# depois de uma espera que dobra a cada falha seguida, até o teto
+ESPERA_REENTREGA = 0.5
+ESPERA_REENTREGA_MAX = 10
+
+
+class EventoInvalido(ValueError):
+    """Evento que nunca vai ser tratado com sucesso; é descartado sem voltar à fila"""
+
+
+def id_evento(properties, evento):
+    """message_id do publicador; eventos antigos sem ele usam o id do jogo"""
+    if properties is not None and properties.message_id:
+        return properties.message_id
+    return f"jogo-{evento['id_jogo']}"
+
+
+class ConsumidorEventos(threading.Thread):
+    """Consumidor de longa duração da fila de eventos de jogos do serviço
+
+    Mantém uma única conexão AMQP com basic_consume e prefetch_count, em vez
+    de reconectar e fazer basic_get periodicamente. Reconecta com backoff
+    exponencial quando a conexão cai e para de forma limpa via parar().
+
+    Com `get_cliente`, cada message_id tratado é marcado no Memcached
+    depois do tratamento: reentregas e republicações do outbox já marcadas
+    custam um único round-trip e não chegam ao `tratar_evento`. Como a
+    marca vem depois, uma entrega repetida antes dela (queda entre o
+    tratamento e o ack) trata o evento de novo, então `tratar_evento`
+    precisa ser idempotente.
+
+    Corpo que não decodifica ou `EventoInvalido` são descartados (nack sem
+    requeue); qualquer outro erro devolve a mensagem à fila com backoff.
+
+    Sem `fila`, o processo recebe todos os eventos numa fila exclusiva e
+    temporária (nome gerado pelo broker), em vez de dividir a fila durável
+    com as outras réplicas.
+    """
+
+    def __init__(self, nome, exchange, fila, tratar_evento, get_cliente=None, prefetch_count=PREFETCH_COUNT):
+        super().__init__(name=f"consumidor-{fila or exchange}", daemon=True)
+        self.nome = nome
+        self.exchange = exchange
+        self.fila = fila
+        self.tratar_evento = tratar_evento
+        self.get_cliente = get_cliente
+        self.prefetch_count = prefetch_count
+        self.log = Log(nome)
+        self._rotulo = fila or exchange
+        self._espera_reentrega = ESPERA_REENTREGA
+        self._parar = threading.Event()
+        self._connection = None
+        self._channel = None
+
+    def run(self):
+        espera = 1
+        while not self._parar.is_set():
+            try:
+                self._consumir()
+                espera = 1
+            except Exception as e:
+                if self._parar.is_set():
+                    break
+                self.log.aviso("Conexão de eventos perdida, reconectando", erro=str(e), espera=espera)
+                self._parar.wait(espera)
+                espera = min(espera * 2, RECONEXAO_MAX_SEGUNDOS)
+
+    def _consumir(self):
+        credentials = pika.PlainCredentials('admin', 'admin')
+        self._connection = pika.BlockingConnection(
+            pika.ConnectionParameters(host=RABBITMQ_HOST, credentials=credentials)
+        )
+        self._channel = self._connection.channel()
+        self._channel.exchange_declare(exchange=self.exchange, exchange_type="fanout", durable=True)
+        if self.fila:
+            fila = self._channel.queue_declare(queue=self.fila, durable=True).method.queue
+        else:
+            fila = self._channel.queue_declare(queue="", exclusive=True).method.queue
+        self._channel.queue_bind(queue=fila, exchange=self.exchange)
+        self._channel.basic_qos(prefetch_count=self.prefetch_count)
+        self._channel.basic_consume(queue=fila, on_message_callback=self._ao_receber)
+
+        if not self._parar.is_set():
+            self._channel.start_consuming()
+        self._connection.close()
+
+    def _chave_dedup(self, properties, evento):
+        return f"evento_{self.fila}_{id_evento(properties, evento)}"
+
+    def _ao_receber(self, channel, method, properties, body):
+        try:
+            evento = decodificar_mensagem(body, properties)
+            chave = self._chave_dedup(properties, evento) if self.get_cliente is not None else None
+        except Exception as e:
+            self._descartar(channel, method, e)
+            return
+
+        try:
+            if chave is not None and self.get_cliente().get(chave) is not None:
+                channel.basic_ack(method.delivery_tag)
+                EVENTOS_CONSUMIDOS.labels(self._rotulo, "duplicado").inc()
+                return
+
+            inicio = perf_counter()
+            self.tratar_evento(evento)
+            EVENTO_SEGUNDOS.labels(self._rotulo).observe(perf_counter() - inicio)
+            if chave is not None:
+                self.get_cliente().set(chave, "1", expire=TTL_DEDUP, noreply=False)
+        except EventoInvalido as e:
+            self._descartar(channel, method, e)
+            return
+        except Exception as e:
+            self._devolver(channel, method, e)
+            return
+
+        self._espera_reentrega = ESPERA_REENTREGA
+        channel.basic_ack(method.delivery_tag)
+        EVENTOS_CONSUMIDOS.labels(self._rotulo, "processado").inc()
+
+    def _descartar(self, channel, method, erro):
+        """Mensagem inválida: não volta para a fila para não travar o consumo"""
+        EVENTOS_CONSUMIDOS.labels(self._rotulo, "invalido").inc()
+        self.log.erro("Evento inválido descartado", erro=str(erro))
+        channel.basic_nack(method.delivery_tag, requeue=False)
+
+    def _devolver(self, channel, method, erro):
+        """Falha transitória: espera (backoff) e devolve a mensagem à fila"""
+        EVENTOS_CONSUMIDOS.labels(self._rotulo, "erro").inc()
+        self.log.aviso("Erro ao processar evento, devolvendo à fila", erro=str(erro), espera=self._espera_reentrega)
+        self._parar.wait(self._espera_reentrega)
+        self._espera_reentrega = min(self._espera_reentrega * 2, ESPERA_REENTREGA_MAX)
+        channel.basic_nack(method.delivery_tag, requeue=True)
+
+    def parar(self, timeout=5):
+        """Interrompe o consumo e aguarda a thread encerrar"""
+        self._parar.set()
+        connection = self._connection
+        if connection is not None and connection.is_open:
+            try:
+                connection.add_callback_threadsafe(self._channel.stop_consuming)
+            except Exception:
+                pass
+        self.join(timeout)
@@ -0,0 +1,142 @@
+"""
+Ingestão em lote - Escritas aceitas numa fila do processo e gravadas juntas por jogo
+Modo opcional de comentários e votação para picos de milhares de escritas por segundo
+"""
+
+import atexit
+import os
+import queue
+import threading
+from time import monotonic
+
+from comum.logs import Log
+from comum.metricas import INGESTAO_LOTE, INGESTAO_PERDIDAS, INGESTAO_RECUSADAS
+
+# INGESTAO_EM_LOTE=1 liga o modo: POST responde 202 assim que o item entra na
+# fila e um flusher grava a cada INTERVALO_INGESTAO_MS ou LOTE_INGESTAO itens
+INGESTAO_EM_LOTE = os.getenv("INGESTAO_EM_LOTE", "0") == "1"
+CAPACIDADE_INGESTAO = int(os.getenv("CAPACIDADE_INGESTAO", "10000"))
+INTERVALO_INGESTAO_MS = float(os.getenv("INTERVALO_INGESTAO_MS", "5"))
+LOTE_INGESTAO = int(os.getenv("LOTE_INGESTAO", "500"))
+
+# Um jogo cujo lote falhou é regravado algumas vezes antes de ser descartado
+TENTATIVAS_GRAVACAO = 3
+ESPERA_TENTATIVA = 0.2
+
+
+class GravacaoParcial(Exception):
+    """Levantada por `gravar` quando só parte dos itens foi gravada
+
+    `pendentes` são os itens ainda não aplicados (os únicos regravados) e
+    `gravados` o que o chamador já deu por gravado.
+    """
+
+    def __init__(self, pendentes, gravados=()):
+        super().__init__(f"{len(pendentes)} itens pendentes")
+        self.pendentes = list(pendentes)
+        self.gravados = list(gravados)
+
+
+class IngestaoEmLote(threading.Thread):
+    """Fila limitada de (id_jogo, item) drenada por uma thread em lotes
+
+    `gravar(id_jogo, itens)` recebe os itens pendentes de cada jogo na
+    ordem de chegada e faz uma única escrita (um incr e um append por
+    página). Fila cheia recusa o item (o chamador responde 429) e parar()
+    grava tudo o que já foi aceito antes de encerrar. Se `gravar` levanta
+    GravacaoParcial, só os itens pendentes são regravados.
+    """
+
+    def __init__(self, nome, gravar, capacidade=CAPACIDADE_INGESTAO,
+                 intervalo=INTERVALO_INGESTAO_MS / 1000, maximo=LOTE_INGESTAO):
+        super().__init__(name=f"ingestao-{nome.lower()}", daemon=True)
+        self.nome = nome
+        self.log = Log(nome)
+        self.gravar = gravar
+        self.intervalo = intervalo
+        self.maximo = maximo
+        self._fila = queue.Queue(maxsize=capacidade)
+        self._aceitando = True
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+
+    @property
+    def aceitando(self):
+        return self._aceitando and self.is_alive()
+
+    def enfileirar(self, id_jogo, item):
+        """True se o item foi aceito; False com a fila cheia ou no encerramento
+
+        A conferência e o put ficam sob o mesmo lock que parar() usa, então
+        todo item aceito entra na fila antes de a drenagem final começar.
+        """
+        with self._lock:
+            if not self._aceitando:
+                return False
+            try:
+                self._fila.put_nowait((id_jogo, item))
+                return True
+            except queue.Full:
+                INGESTAO_RECUSADAS.labels(self.nome).inc()
+                return False
+
+    def iniciar(self):
+        self.start()
+        atexit.register(self.parar)
+
+    def _coletar(self):
+        """Espera o primeiro item e junta o que chegar em `intervalo` (até `maximo`)"""
+        try:
+            lote = [self._fila.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        limite = monotonic() + self.intervalo
+        while len(lote) < self.maximo:
+            try:
+                lote.append(self._fila.get_nowait())
+            except queue.Empty:
+                restante = limite - monotonic()
+                if restante <= 0 or self._parar.is_set():
+                    break
+                self._parar.wait(min(restante, 0.001))
+        return lote
+
+    def _gravar(self, lote):
+        por_jogo = {}
+        for id_jogo, item in lote:
+            por_jogo.setdefault(id_jogo, []).append(item)
+        INGESTAO_LOTE.labels(self.nome).observe(len(lote))
+
+        for id_jogo, itens in por_jogo.items():
+            for tentativa in range(1, TENTATIVAS_GRAVACAO + 1):
+                try:
+                    self.gravar(id_jogo, itens)
+                    break
+                except Exception as e:
+                    if isinstance(e, GravacaoParcial):
+                        itens = e.pendentes
+                        if not itens:
+                            break
+                    if tentativa == TENTATIVAS_GRAVACAO:
+                        INGESTAO_PERDIDAS.labels(self.nome).inc(len(itens))
+                        self.log.erro(
+                            "Lote descartado após falhas", id_jogo=id_jogo, itens=len(itens),
+                            erro=str(e.__cause__ or e),
+                        )
+                    else:
+                        self._parar.wait(ESPERA_TENTATIVA)
+
+    def run(self):
+        while not (self._parar.is_set() and self._fila.empty()):
+            lote = self._coletar()
+            if lote:
+                self._gravar(lote)
+
+    def parar(self, timeout=30):
+        """Recusa novos itens, grava os pendentes e encerra"""
+        with self._lock:
+            self._aceitando = False
+        self._parar.set()
+        self.join(timeout)
+        if not self._fila.empty():
+            self.log.erro("Itens aceitos não gravados no encerramento", itens=self._fila.qsize())
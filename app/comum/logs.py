@@ -0,0 +1,79 @@
+"""
+Logs estruturados - Uma linha JSON por evento, com nível e amostragem
+Substitui os prints dos serviços; eventos por item são amostrados
+"""
+
+import itertools
+import json
+import logging
+import os
+import sys
+
+# LOG_NIVEL=DEBUG mostra todos os eventos por item; em INFO só 1 a cada
+# LOG_AMOSTRA_A_CADA ocorrências de cada mensagem amostrada
+LOG_NIVEL = os.getenv("LOG_NIVEL", "INFO").upper()
+LOG_AMOSTRA_A_CADA = max(1, int(os.getenv("LOG_AMOSTRA_A_CADA", "100")))
+
+RAIZ = "futebol"
+
+
+class FormatoJson(logging.Formatter):
+    def format(self, record):
+        dados = {
+            "ts": round(record.created, 3),
+            "nivel": record.levelname,
+            "servico": record.name.rpartition(".")[2],
+            "msg": record.getMessage(),
+            **getattr(record, "campos", {}),
+        }
+        if record.exc_info:
+            dados["exc"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+def _configurar():
+    raiz = logging.getLogger(RAIZ)
+    if not raiz.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(FormatoJson())
+        raiz.addHandler(handler)
+        raiz.setLevel(LOG_NIVEL)
+        raiz.propagate = False
+
+
+_configurar()
+
+
+class Log:
+    """Logger de um componente: log.info("mensagem", campo=valor, ...)"""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self._logger = logging.getLogger(f"{RAIZ}.{nome}")
+        self._contadores = {}
+
+    def _emitir(self, nivel, mensagem, campos):
+        if self._logger.isEnabledFor(nivel):
+            self._logger.log(nivel, mensagem, extra={"campos": campos})
+
+    def debug(self, mensagem, **campos):
+        self._emitir(logging.DEBUG, mensagem, campos)
+
+    def info(self, mensagem, **campos):
+        self._emitir(logging.INFO, mensagem, campos)
+
+    def aviso(self, mensagem, **campos):
+        self._emitir(logging.WARNING, mensagem, campos)
+
+    def erro(self, mensagem, **campos):
+        self._emitir(logging.ERROR, mensagem, campos)
+
+    def amostra(self, mensagem, **campos):
+        """Evento por item: INFO a cada LOG_AMOSTRA_A_CADA ocorrências, DEBUG nas demais"""
+        contador = self._contadores.get(mensagem)
+        if contador is None:
+            contador = self._contadores.setdefault(mensagem, itertools.count())
+        if next(contador) % LOG_AMOSTRA_A_CADA == 0:
+            self._emitir(logging.INFO, mensagem, {**campos, "amostra": LOG_AMOSTRA_A_CADA})
+        else:
+            self._emitir(logging.DEBUG, mensagem, campos)
@@ -0,0 +1,151 @@
+"""
+Métricas Prometheus - Latência por rota, Memcached, AMQP, eventos e payloads
+Cada serviço expõe GET /metrics; com gunicorn em vários workers, defina
+PROMETHEUS_MULTIPROC_DIR para agregar os processos
+"""
+
+import os
+from time import perf_counter
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+BUCKETS_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+BUCKETS_BYTES = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+BUCKETS_LOTE = (1, 5, 10, 50, 100, 200, 500, 1000)
+
+HTTP_SEGUNDOS = Histogram(
+    "http_requisicao_segundos", "Latência das requisições HTTP por rota",
+    ["servico", "metodo", "rota"], buckets=BUCKETS_LATENCIA,
+)
+HTTP_RESPOSTAS = Counter(
+    "http_respostas_total", "Respostas HTTP por rota e status",
+    ["servico", "metodo", "rota", "status"],
+)
+PAYLOAD_BYTES = Histogram(
+    "payload_bytes", "Tamanho dos corpos HTTP e das mensagens AMQP",
+    ["servico", "origem"], buckets=BUCKETS_BYTES,
+)
+MEMCACHED_SEGUNDOS = Histogram(
+    "memcached_operacao_segundos", "Duração das chamadas ao Memcached",
+    ["operacao"], buckets=BUCKETS_LATENCIA,
+)
+MEMCACHED_ERROS = Counter(
+    "memcached_erros_total", "Chamadas ao Memcached que levantaram exceção", ["operacao"],
+)
+AMQP_PUBLICACOES = Counter(
+    "amqp_publicacoes_total", "Mensagens publicadas por resultado da confirmação",
+    ["exchange", "resultado"],
+)
+AMQP_CONFIRMACAO_SEGUNDOS = Histogram(
+    "amqp_confirmacao_segundos", "Tempo entre publicar e o broker confirmar",
+    ["exchange"], buckets=BUCKETS_LATENCIA,
+)
+EVENTOS_CONSUMIDOS = Counter(
+    "eventos_consumidos_total", "Eventos recebidos por resultado (processado, duplicado, erro, invalido)",
+    ["fila", "resultado"],
+)
+EVENTO_SEGUNDOS = Histogram(
+    "evento_processamento_segundos", "Duração do tratamento de cada evento",
+    ["fila"], buckets=BUCKETS_LATENCIA,
+)
+RELAY_LOTE = Histogram(
+    "relay_lote_eventos", "Eventos drenados do outbox por lote", buckets=BUCKETS_LOTE,
+)
+RELAY_SEGUNDOS = Histogram(
+    "relay_lote_segundos", "Duração de um lote do relay (publicação até confirmação)",
+    buckets=BUCKETS_LATENCIA,
+)
+RELAY_FALHAS = Counter("relay_falhas_total", "Lotes do relay que falharam e serão repetidos")
+PERSISTENCIA_LOTE = Histogram(
+    "persistencia_lote_operacoes", "Escritas copiadas para o SQLite por transação", buckets=BUCKETS_LOTE,
+)
+PERSISTENCIA_SEGUNDOS = Histogram(
+    "persistencia_lote_segundos", "Duração de cada transação da persistência write-behind",
+    buckets=BUCKETS_LATENCIA,
+)
+INGESTAO_LOTE = Histogram(
+    "ingestao_lote_itens", "Itens gravados por volta do flusher da ingestão em lote",
+    ["servico"], buckets=BUCKETS_LOTE,
+)
+INGESTAO_RECUSADAS = Counter(
+    "ingestao_recusadas_total", "Escritas recusadas (429) com a fila de ingestão cheia", ["servico"],
+)
+INGESTAO_PERDIDAS = Counter(
+    "ingestao_perdidas_total", "Escritas aceitas (202) descartadas após falhas de gravação", ["servico"],
+)
+JOGOS_QUENTES = Counter(
+    "jogos_quentes_total", "Vezes que um jogo passou a gravar em sub-chaves por excesso de requisições",
+    ["servico"],
+)
+JOGOS_RECEBIDOS = Counter(
+    "jogos_recebidos_total", "Jogos recebidos em POST /jogos por resultado (inserido, duplicado)",
+    ["resultado"],
+)
+
+
+class ClienteMedido:
+    """Envolve um cliente Memcached medindo cada chamada por operação
+
+    O método medido fica guardado na instância, então só o primeiro acesso
+    a cada operação passa por __getattr__.
+    """
+
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def __getattr__(self, operacao):
+        metodo = getattr(self._cliente, operacao)
+        if not callable(metodo):
+            return metodo
+        histograma = MEMCACHED_SEGUNDOS.labels(operacao)
+
+        def medido(*args, **kwargs):
+            inicio = perf_counter()
+            try:
+                return metodo(*args, **kwargs)
+            except Exception:
+                MEMCACHED_ERROS.labels(operacao).inc()
+                raise
+            finally:
+                histograma.observe(perf_counter() - inicio)
+
+        setattr(self, operacao, medido)
+        return medido
+
+
+def instrumentar(servico, nome):
+    """Mede as rotas da aplicação Flask e registra GET /metrics"""
+
+    @servico.before_request
+    def _iniciar_medida():
+        g.inicio_medida = perf_counter()
+
+    @servico.after_request
+    def _registrar_medida(resposta):
+        inicio = g.pop("inicio_medida", None)
+        if inicio is None:
+            return resposta
+        rota = request.url_rule.rule if request.url_rule is not None else "desconhecida"
+        HTTP_SEGUNDOS.labels(nome, request.method, rota).observe(perf_counter() - inicio)
+        HTTP_RESPOSTAS.labels(nome, request.method, rota, str(resposta.status_code)).inc()
+        if request.content_length:
+            PAYLOAD_BYTES.labels(nome, "http_entrada").observe(request.content_length)
+        if not resposta.is_streamed and resposta.content_length is not None:
+            PAYLOAD_BYTES.labels(nome, "http_saida").observe(resposta.content_length)
+        return resposta
+
+    @servico.get("/metrics")
+    def metrics():
+        if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            registro = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registro)
+            return Response(generate_latest(registro), content_type=CONTENT_TYPE_LATEST)
+        return Response(generate_latest(), content_type=CONTENT_TYPE_LATEST)
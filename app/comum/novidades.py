@@ -0,0 +1,70 @@
+"""
+Novidades entre réplicas - Escritas locais anunciadas pelo broker
+Cada processo invalida seu cache e alimenta seus streams SSE com as escritas das outras réplicas
+"""
+
+import atexit
+import threading
+import uuid
+
+import pika
+
+from comum.codec import codificar_mensagem
+from comum.eventos import ConsumidorEventos
+from comum.logs import Log
+from comum.publicador import PoolPublicadores
+
+
+class Novidades:
+    """Propaga (topico, [(seq, item), ...]) entre as réplicas de um serviço
+
+    registrar() aplica a escrita localmente (cache e barramento) e publica
+    no exchange fanout do serviço sem esperar confirmação; cada processo
+    consome por uma fila exclusiva e ignora o que ele mesmo publicou.
+    """
+
+    def __init__(self, nome, exchange, cache, barramento):
+        self.nome = nome
+        self.log = Log(nome)
+        self.exchange = exchange
+        self.cache = cache
+        self.barramento = barramento
+        self.instancia = uuid.uuid4().hex
+        self._publicador = None
+        self._lock = threading.Lock()
+
+    def _get_publicador(self):
+        with self._lock:
+            if self._publicador is None:
+                self._publicador = PoolPublicadores(self.exchange, nome=self.nome)
+                atexit.register(self._publicador.parar)
+            return self._publicador
+
+    def aplicar(self, topico, entradas):
+        self.cache.invalidar(topico)
+        for seq, item in entradas:
+            self.barramento.publicar(topico, (seq, item))
+
+    def registrar(self, topico, entradas):
+        """Aplica a escrita neste processo e a anuncia às outras réplicas"""
+        self.aplicar(topico, entradas)
+        try:
+            corpo, tipo, codificacao = codificar_mensagem(
+                {"origem": self.instancia, "topico": topico, "entradas": entradas}
+            )
+            self._get_publicador().publicar(
+                corpo,
+                pika.BasicProperties(content_type=tipo, content_encoding=codificacao, delivery_mode=1),
+            )
+        except Exception as e:
+            self.log.erro("Falha ao anunciar novidade", topico=topico, erro=str(e))
+
+    def _ao_receber(self, evento):
+        if evento["origem"] != self.instancia:
+            self.aplicar(evento["topico"], [tuple(entrada) for entrada in evento["entradas"]])
+
+    def iniciar(self):
+        """Começa a consumir as novidades das outras réplicas"""
+        consumidor = ConsumidorEventos(self.nome, self.exchange, None, self._ao_receber)
+        consumidor.start()
+        atexit.register(consumidor.parar)
@@ -0,0 +1,303 @@
+"""
+Persistência write-behind - Cópia durável em SQLite do estado guardado no Memcached
+As escritas são espelhadas em lotes fora da requisição; ao iniciar, o Memcached é reidratado com set_many
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+from time import monotonic, perf_counter
+
+from comum.logs import Log
+from comum.metricas import PERSISTENCIA_LOTE, PERSISTENCIA_SEGUNDOS
+
+# Arquivo SQLite do serviço; vazio desliga a persistência
+PERSISTENCIA_ARQUIVO = os.getenv("PERSISTENCIA_ARQUIVO", "")
+
+# Operações gravadas por transação e espera máxima antes de gravar um lote
+LOTE_PERSISTENCIA = int(os.getenv("LOTE_PERSISTENCIA", "1000"))
+INTERVALO_PERSISTENCIA = float(os.getenv("INTERVALO_PERSISTENCIA", "0.2"))
+
+# Chaves por set_many na reidratação
+LOTE_REIDRATACAO = 500
+
+# A marca some quando o Memcached reinicia; é conferida antes de cada escrita
+# que cria uma chave durável e a cada intervalo (para reidratar mesmo sem
+# escritas) e, enquanto uma reidratação está em andamento, fica "carregando"
+INTERVALO_VERIFICACAO = 5
+LEASE_REIDRATACAO = 120
+
+# Processos diferentes copiam as escritas por filas próprias, então as cópias
+# de uma chave chegam ao arquivo fora de ordem. Somar comuta, e append comuta
+# para as páginas (a leitura ordena as linhas por seq). O add só cria: listas
+# nascem vazias e contadores em "0" (armazenamento.anexar, reservar), então
+# ignorar um add que chega depois não perde nada. Chaves de valor único
+# (jogos, voto atual de um autor) são criadas por add e trocadas por set/cas.
+SQL_TABELA = "CREATE TABLE IF NOT EXISTS valores (chave TEXT PRIMARY KEY, valor BLOB NOT NULL)"
+SQL = {
+    "set": "INSERT OR REPLACE INTO valores (chave, valor) VALUES (?, ?)",
+    "add": "INSERT OR IGNORE INTO valores (chave, valor) VALUES (?, ?)",
+    "append": (
+        "INSERT INTO valores (chave, valor) VALUES (?, ?) "
+        "ON CONFLICT(chave) DO UPDATE SET valor = CAST(valor || excluded.valor AS BLOB)"
+    ),
+    "somar": (
+        "INSERT INTO valores (chave, valor) VALUES (?, CAST(? AS BLOB)) "
+        "ON CONFLICT(chave) DO UPDATE SET "
+        "valor = CAST(CAST(valor AS INTEGER) + CAST(excluded.valor AS INTEGER) AS BLOB)"
+    ),
+    "delete": "DELETE FROM valores WHERE chave = ?",
+}
+
+
+def _bytes(valor):
+    return valor if isinstance(valor, bytes) else str(valor).encode("utf-8")
+
+
+class ClienteDuravel:
+    """Envolve o cliente Memcached repassando as escritas duráveis à Persistencia
+
+    Só chaves com um dos prefixos do serviço e sem expiração são copiadas;
+    chaves temporárias (deduplicação, leases, outbox) ficam só no Memcached.
+    A cópia é enfileirada depois que o Memcached respondeu, sem I/O em disco.
+
+    Escritas que criam chaves duráveis (set, add) conferem antes a marca de
+    carregado: num Memcached que reiniciou, elas esperam a reidratação em
+    vez de recomeçar contadores e listas do zero. incr/append numa chave
+    ausente falham e levam ao add, então também passam pela conferência.
+    """
+
+    def __init__(self, cliente, persistencia):
+        self._cliente = cliente
+        self._persistencia = persistencia
+
+    def __getattr__(self, nome):
+        return getattr(self._cliente, nome)
+
+    def _duravel(self, chave, expire=0):
+        return not expire and chave.startswith(self._persistencia.prefixos)
+
+    def set(self, key, value, expire=0, **kwargs):
+        if self._duravel(key, expire):
+            self._persistencia.garantir()
+        resultado = self._cliente.set(key, value, expire=expire, **kwargs)
+        if resultado and self._duravel(key, expire):
+            self._persistencia.registrar("set", key, _bytes(value))
+        return resultado
+
+    def set_many(self, values, expire=0, **kwargs):
+        if any(self._duravel(chave, expire) for chave in values):
+            self._persistencia.garantir()
+        falhas = self._cliente.set_many(values, expire=expire, **kwargs)
+        for chave, valor in values.items():
+            if chave not in falhas and self._duravel(chave, expire):
+                self._persistencia.registrar("set", chave, _bytes(valor))
+        return falhas
+
+    def add(self, key, value, expire=0, **kwargs):
+        if self._duravel(key, expire):
+            self._persistencia.garantir()
+        resultado = self._cliente.add(key, value, expire=expire, **kwargs)
+        if resultado and self._duravel(key, expire):
+            self._persistencia.registrar("add", key, _bytes(value))
+        return resultado
+
+    def cas(self, key, value, cas, expire=0, **kwargs):
+        resultado = self._cliente.cas(key, value, cas, expire=expire, **kwargs)
+        if resultado and self._duravel(key, expire):
+            self._persistencia.registrar("set", key, _bytes(value))
+        return resultado
+
+    def append(self, key, value, expire=0, **kwargs):
+        resultado = self._cliente.append(key, value, expire=expire, **kwargs)
+        if resultado and self._duravel(key, expire):
+            self._persistencia.registrar("append", key, _bytes(value))
+        return resultado
+
+    def incr(self, key, value, **kwargs):
+        resultado = self._cliente.incr(key, value, **kwargs)
+        if resultado is not None and self._duravel(key):
+            self._persistencia.registrar("somar", key, int(value))
+        return resultado
+
+    def decr(self, key, value, **kwargs):
+        resultado = self._cliente.decr(key, value, **kwargs)
+        if resultado is not None and self._duravel(key):
+            self._persistencia.registrar("somar", key, -int(value))
+        return resultado
+
+    def delete(self, key, **kwargs):
+        resultado = self._cliente.delete(key, **kwargs)
+        if self._duravel(key):
+            self._persistencia.registrar("delete", key)
+        return resultado
+
+    def delete_many(self, keys, **kwargs):
+        resultado = self._cliente.delete_many(keys, **kwargs)
+        for chave in keys:
+            if self._duravel(chave):
+                self._persistencia.registrar("delete", chave)
+        return resultado
+
+
+class Persistencia(threading.Thread):
+    """Grava em lotes, num arquivo SQLite, as escritas duráveis do serviço
+
+    O arquivo guarda o valor atual de cada chave (append vira concatenação e
+    incr/decr viram soma), então ele próprio é o snapshot compacto usado
+    para reidratar o Memcached. Escritas feitas antes de a persistência ser
+    ligada não estão no arquivo.
+    """
+
+    def __init__(self, nome, arquivo, prefixos):
+        super().__init__(name=f"persistencia-{nome.lower()}", daemon=True)
+        self.nome = nome
+        self.log = Log(nome)
+        self.arquivo = arquivo
+        self.prefixos = tuple(prefixos)
+        self.chave_marca = f"persistencia_{nome.lower()}_carregado"
+        self._fila = queue.Queue()
+        self._memcached = None
+        self._iniciada = False
+        self._lock_carga = threading.Lock()
+        self._parar = threading.Event()
+
+    def envolver(self, cliente):
+        """Cliente que espelha as escritas; `cliente` é usado na reidratação"""
+        self._memcached = cliente
+        return ClienteDuravel(cliente, self)
+
+    def registrar(self, operacao, chave, valor=None):
+        self._fila.put((operacao, chave, valor))
+
+    def _conectar(self):
+        conexao = sqlite3.connect(self.arquivo, timeout=30, isolation_level=None, check_same_thread=False)
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        conexao.execute(SQL_TABELA)
+        return conexao
+
+    # --- Reidratação ---
+
+    def reidratar(self, conexao):
+        """Copia o arquivo para o Memcached com set_many; retorna as chaves gravadas"""
+        total = 0
+        cursor = conexao.execute("SELECT chave, valor FROM valores")
+        while True:
+            linhas = cursor.fetchmany(LOTE_REIDRATACAO)
+            if not linhas:
+                return total
+            falhas = self._memcached.set_many(dict(linhas), noreply=False)
+            if falhas:
+                raise RuntimeError(f"{len(falhas)} chaves recusadas pelo Memcached")
+            total += len(linhas)
+
+    def _garantir_carregado(self, conexao):
+        """Reidrata se a marca sumiu (Memcached vazio); outros processos esperam"""
+        marca = self._memcached.get(self.chave_marca)
+        if marca == b"pronto":
+            return
+        if marca is None and self._memcached.add(
+            self.chave_marca, "carregando", expire=LEASE_REIDRATACAO, noreply=False
+        ):
+            try:
+                inicio = monotonic()
+                total = self.reidratar(conexao)
+            except Exception:
+                self._memcached.delete(self.chave_marca, noreply=False)
+                raise
+            self._memcached.set(self.chave_marca, "pronto", noreply=False)
+            self.log.info("Memcached reidratado", chaves=total, segundos=round(monotonic() - inicio, 3))
+            return
+
+        # Outro processo está reidratando
+        limite = monotonic() + LEASE_REIDRATACAO
+        while monotonic() < limite and self._memcached.get(self.chave_marca) == b"carregando":
+            self._parar.wait(0.1)
+
+    def garantir(self):
+        """Confere a marca antes de uma escrita que cria chave; reidrata se sumiu
+
+        Custa um get por chave criada. Só a primeira thread que encontra a
+        marca ausente reidrata (ou espera o processo que está reidratando).
+        """
+        if not self._iniciada or self._memcached.get(self.chave_marca) == b"pronto":
+            return
+        with self._lock_carga:
+            if self._memcached.get(self.chave_marca) == b"pronto":
+                return
+            conexao = self._conectar()
+            try:
+                self._garantir_carregado(conexao)
+            finally:
+                conexao.close()
+
+    def iniciar(self, get_cliente):
+        """Reidrata o Memcached se necessário e começa a gravar em background
+
+        Chamado antes de o processo atender requisições, para que nenhuma
+        escrita nova caia num Memcached ainda vazio.
+        """
+        get_cliente()
+        self._iniciada = True
+        self.garantir()
+        self.start()
+        atexit.register(self.parar)
+
+    # --- Gravação em lotes ---
+
+    def _proximo_lote(self, espera):
+        try:
+            lote = [self._fila.get(timeout=espera)]
+        except queue.Empty:
+            return []
+        while len(lote) < LOTE_PERSISTENCIA:
+            try:
+                lote.append(self._fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _gravar(self, conexao, lote):
+        inicio = perf_counter()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            for operacao, chave, valor in lote:
+                if operacao == "delete":
+                    conexao.execute(SQL[operacao], (chave,))
+                else:
+                    conexao.execute(SQL[operacao], (chave, valor))
+            conexao.execute("COMMIT")
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+        PERSISTENCIA_LOTE.observe(len(lote))
+        PERSISTENCIA_SEGUNDOS.observe(perf_counter() - inicio)
+
+    def run(self):
+        conexao = self._conectar()
+        pendente, proxima_verificacao = [], monotonic() + INTERVALO_VERIFICACAO
+        while not (self._parar.is_set() and not pendente and self._fila.empty()):
+            try:
+                if not pendente:
+                    pendente = self._proximo_lote(INTERVALO_PERSISTENCIA)
+                if pendente:
+                    self._gravar(conexao, pendente)
+                    pendente = []
+                if monotonic() >= proxima_verificacao:
+                    proxima_verificacao = monotonic() + INTERVALO_VERIFICACAO
+                    self.garantir()
+            except Exception as e:
+                # O lote fica guardado e é regravado na próxima volta
+                self.log.erro("Falha na persistência", erro=str(e), pendentes=len(pendente))
+                if self._parar.is_set():
+                    break
+                self._parar.wait(1)
+        conexao.close()
+
+    def parar(self, timeout=10):
+        """Grava o que ainda está na fila e encerra"""
+        self._parar.set()
+        self.join(timeout)
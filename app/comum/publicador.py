@@ -0,0 +1,244 @@
+"""
+Publicador de eventos - conexão AMQP persistente com publisher confirms
+Compartilhado por todas as requisições do processo (seguro entre threads)
+Usado pelo relay do outbox de jogos e pelas novidades entre réplicas
+"""
+
+import itertools
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+from time import monotonic, sleep
+
+import pika
+from pika.adapters.select_connection import IOLoop
+
+from comum.logs import Log
+from comum.metricas import AMQP_CONFIRMACAO_SEGUNDOS, AMQP_PUBLICACOES, PAYLOAD_BYTES
+
+RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq")
+
+# Mensagens publicadas por volta do loop de I/O e conexões mantidas pelo pool
+LOTE_PUBLICACAO = int(os.getenv("LOTE_PUBLICACAO", "200"))
+TAMANHO_POOL = int(os.getenv("RABBITMQ_PUBLICADORES", "1"))
+RECONEXAO_MAX_SEGUNDOS = 30
+
+# Mensagens aguardando a thread de I/O; com o broker fora do ar a fila não
+# cresce além disso e publicar() recusa o excedente na hora
+CAPACIDADE_PUBLICACAO = int(os.getenv("CAPACIDADE_PUBLICACAO", "10000"))
+
+
+class ErroPublicacao(Exception):
+    """O broker recusou (nack) a mensagem ou a fila local estava cheia"""
+
+
+class PublicadorEventos:
+    """Publica em um exchange fanout por uma conexão persistente
+
+    Uma thread dedicada roda o loop de I/O do pika (SelectConnection) e é a
+    única a tocar na conexão. publicar() só enfileira a mensagem e devolve um
+    Future; a thread publica em lotes e resolve os Futures conforme chegam os
+    Basic.Ack/Basic.Nack do broker (inclusive confirmações múltiplas). Se a
+    conexão cair, as mensagens ainda não confirmadas são republicadas depois
+    da reconexão; enquanto isso, a fila limitada recusa o excedente.
+    """
+
+    def __init__(self, exchange, tamanho_lote=LOTE_PUBLICACAO, nome="PUBLICADOR",
+                 capacidade=CAPACIDADE_PUBLICACAO):
+        self.exchange = exchange
+        self.nome = nome
+        self.tamanho_lote = tamanho_lote
+        self._fila = queue.Queue(maxsize=capacidade)
+        self._reenvio = deque()
+        self._pendentes = {}
+        self._publicado_em = {}
+        self.log = Log(nome)
+        self._proxima_tag = 0
+        self._ioloop = IOLoop()
+        self._connection = None
+        self._channel = None
+        self._pronto = False
+        self._parar = False
+        self._agendado = False
+        self._lock = threading.Lock()
+        self._espera = 1
+        self._thread = threading.Thread(
+            target=self._executar, name=f"publicador-{exchange}", daemon=True
+        )
+        self._thread.start()
+
+    def publicar(self, corpo, properties=None):
+        """Enfileira uma mensagem; o Future resolve quando o broker confirma
+
+        Com a fila cheia (broker fora do ar) o Future já volta com
+        ErroPublicacao, sem reter a mensagem.
+        """
+        futuro = Future()
+        try:
+            self._fila.put_nowait((corpo, properties, futuro))
+        except queue.Full:
+            AMQP_PUBLICACOES.labels(self.exchange, "descartada").inc()
+            futuro.set_exception(ErroPublicacao("Fila de publicação cheia"))
+            return futuro
+        self._acordar()
+        return futuro
+
+    def parar(self, timeout=5):
+        """Aguarda o envio do que está pendente e fecha a conexão"""
+        limite = monotonic() + timeout
+        while (not self._fila.empty() or self._pendentes) and monotonic() < limite:
+            sleep(0.05)
+        self._ioloop.add_callback_threadsafe(self._encerrar)
+        self._thread.join(max(0, limite - monotonic()))
+
+    def _acordar(self):
+        with self._lock:
+            if self._agendado:
+                return
+            self._agendado = True
+        self._ioloop.add_callback_threadsafe(self._drenar)
+
+    # --- Tudo abaixo roda na thread do loop de I/O ---
+
+    def _executar(self):
+        self._conectar()
+        self._ioloop.start()
+
+    def _conectar(self):
+        if self._parar:
+            return
+        credentials = pika.PlainCredentials('admin', 'admin')
+        self._connection = pika.SelectConnection(
+            pika.ConnectionParameters(host=RABBITMQ_HOST, credentials=credentials),
+            on_open_callback=self._ao_abrir_conexao,
+            on_open_error_callback=self._ao_falhar_conexao,
+            on_close_callback=self._ao_fechar_conexao,
+            custom_ioloop=self._ioloop,
+        )
+
+    def _ao_abrir_conexao(self, connection):
+        connection.channel(on_open_callback=self._ao_abrir_canal)
+
+    def _ao_abrir_canal(self, channel):
+        self._channel = channel
+        channel.add_on_close_callback(self._ao_fechar_canal)
+        channel.exchange_declare(
+            exchange=self.exchange,
+            exchange_type="fanout",
+            durable=True,
+            callback=lambda _: channel.confirm_delivery(
+                self._ao_confirmar, callback=self._ao_ativar_confirmacoes
+            ),
+        )
+
+    def _ao_ativar_confirmacoes(self, _):
+        self._pronto = True
+        self._proxima_tag = 0
+        self._espera = 1
+        self.log.info("Publicador conectado", exchange=self.exchange)
+        self._drenar()
+
+    def _ao_fechar_canal(self, channel, motivo):
+        self._pronto = False
+        if self._connection is not None and self._connection.is_open:
+            self._connection.close()
+
+    def _ao_falhar_conexao(self, connection, erro):
+        self._ao_fechar_conexao(connection, erro)
+
+    def _ao_fechar_conexao(self, connection, motivo):
+        self._pronto = False
+        self._channel = None
+
+        # Não confirmadas voltam para a frente da fila, na ordem original
+        self._reenvio.extendleft(reversed(list(self._pendentes.values())))
+        self._pendentes.clear()
+        self._publicado_em.clear()
+
+        if self._parar:
+            self._ioloop.stop()
+            return
+        self.log.aviso("Publicador desconectado, reconectando", motivo=str(motivo), espera=self._espera)
+        self._ioloop.call_later(self._espera, self._conectar)
+        self._espera = min(self._espera * 2, RECONEXAO_MAX_SEGUNDOS)
+
+    def _drenar(self):
+        with self._lock:
+            self._agendado = False
+        if not self._pronto:
+            return
+
+        enviados = 0
+        while enviados < self.tamanho_lote:
+            if self._reenvio:
+                item = self._reenvio.popleft()
+            else:
+                try:
+                    item = self._fila.get_nowait()
+                except queue.Empty:
+                    break
+            corpo, properties, _ = item
+            self._proxima_tag += 1
+            self._pendentes[self._proxima_tag] = item
+            self._publicado_em[self._proxima_tag] = monotonic()
+            self._channel.basic_publish(self.exchange, "", corpo, properties)
+            PAYLOAD_BYTES.labels(self.nome, "amqp").observe(len(corpo))
+            enviados += 1
+
+        # Lote cheio: cede o loop para processar confirmações antes do próximo
+        if enviados == self.tamanho_lote:
+            self._acordar()
+
+    def _ao_confirmar(self, frame):
+        metodo = frame.method
+        if metodo.multiple:
+            tags = [tag for tag in self._pendentes if tag <= metodo.delivery_tag]
+        else:
+            tags = [metodo.delivery_tag]
+
+        confirmado = isinstance(metodo, pika.spec.Basic.Ack)
+        agora = monotonic()
+        contador = AMQP_PUBLICACOES.labels(self.exchange, "confirmada" if confirmado else "recusada")
+        latencia = AMQP_CONFIRMACAO_SEGUNDOS.labels(self.exchange)
+        for tag in tags:
+            item = self._pendentes.pop(tag, None)
+            publicado_em = self._publicado_em.pop(tag, None)
+            if item is None:
+                continue
+            contador.inc()
+            if publicado_em is not None:
+                latencia.observe(agora - publicado_em)
+            futuro = item[2]
+            if confirmado:
+                futuro.set_result(True)
+            else:
+                futuro.set_exception(ErroPublicacao(f"Mensagem recusada pelo broker (tag {tag})"))
+
+    def _encerrar(self):
+        self._parar = True
+        if self._connection is not None and self._connection.is_open:
+            self._connection.close()
+        elif self._connection is None or self._connection.is_closed:
+            self._ioloop.stop()
+
+
+class PoolPublicadores:
+    """Distribui publicações entre N conexões persistentes (round-robin)"""
+
+    def __init__(self, exchange, tamanho=TAMANHO_POOL, nome="PUBLICADOR"):
+        self._publicadores = [
+            PublicadorEventos(exchange, nome=nome) for _ in range(max(1, tamanho))
+        ]
+        self._proximo = itertools.cycle(self._publicadores)
+        self._lock = threading.Lock()
+
+    def publicar(self, corpo, properties=None):
+        with self._lock:
+            publicador = next(self._proximo)
+        return publicador.publicar(corpo, properties)
+
+    def parar(self, timeout=5):
+        for publicador in self._publicadores:
+            publicador.parar(timeout)
@@ -0,0 +1,101 @@
+"""
+Jogos quentes - Detecção por taxa de requisições no processo
+Enquanto quente, um jogo grava em sub-chaves e suas leituras aceitam um cache curto
+"""
+
+import os
+import random
+import threading
+import zlib
+from time import monotonic
+
+from comum.armazenamento import FRAGMENTOS
+from comum.logs import Log
+from comum.metricas import JOGOS_QUENTES
+
+# Requisições por segundo (neste processo) para um jogo ficar quente e para
+# começar a esfriar; abaixo de LIMIAR_FRIO por MANTER_QUENTE segundos o jogo
+# volta ao layout normal
+LIMIAR_QUENTE = int(os.getenv("LIMIAR_QUENTE", "200"))
+LIMIAR_FRIO = int(os.getenv("LIMIAR_FRIO", "50"))
+MANTER_QUENTE = float(os.getenv("MANTER_QUENTE", "10"))
+
+# Idade máxima de uma resposta em cache servida a um jogo quente mesmo depois
+# de escritas novas (o stream SSE continua em tempo real)
+TOLERANCIA_QUENTE = float(os.getenv("TOLERANCIA_QUENTE", "0.5"))
+
+# Jogos acompanhados; os frios e parados são descartados acima disso
+LIMITE_JOGOS = 10_000
+
+
+class DetectorQuentes:
+    """Conta requisições por jogo em janelas de um segundo
+
+    Estado por jogo: [segundo, contagem no segundo, frio desde, quente].
+    Cada processo decide sozinho: gravar em sub-chaves ou na página normal
+    dá o mesmo resultado na leitura, então réplicas não precisam concordar.
+    """
+
+    def __init__(self, nome, fragmentos=FRAGMENTOS):
+        self.nome = nome
+        self.log = Log(nome)
+        self.fragmentos = fragmentos
+        self._jogos = {}
+        self._ultima_poda = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, id_jogo):
+        """Conta uma requisição ao jogo"""
+        segundo = int(monotonic())
+        with self._lock:
+            estado = self._jogos.get(id_jogo)
+            if estado is None:
+                if len(self._jogos) >= LIMITE_JOGOS:
+                    self._podar(segundo)
+                estado = self._jogos[id_jogo] = [segundo, 0, None, False]
+            elif estado[0] != segundo:
+                self._virar_segundo(id_jogo, estado, segundo)
+            estado[1] += 1
+            if not estado[3] and estado[1] >= LIMIAR_QUENTE:
+                estado[2], estado[3] = None, True
+                JOGOS_QUENTES.labels(self.nome).inc()
+                self.log.info("Jogo quente, gravando em sub-chaves", id_jogo=id_jogo, fragmentos=self.fragmentos)
+
+    def _virar_segundo(self, id_jogo, estado, segundo):
+        if estado[3]:
+            anterior = estado[1] if estado[0] == segundo - 1 else 0
+            if anterior >= LIMIAR_FRIO:
+                estado[2] = None
+            else:
+                estado[2] = estado[2] if estado[2] is not None else estado[0]
+                if segundo - estado[2] >= MANTER_QUENTE:
+                    estado[2], estado[3] = None, False
+                    self.log.info("Jogo esfriou, de volta ao layout normal", id_jogo=id_jogo)
+        estado[0], estado[1] = segundo, 0
+
+    def _podar(self, segundo):
+        if segundo == self._ultima_poda:
+            return
+        self._ultima_poda = segundo
+        for id_jogo in [i for i, estado in self._jogos.items() if not estado[3] and estado[0] < segundo - 1]:
+            del self._jogos[id_jogo]
+
+    def quente(self, id_jogo):
+        estado = self._jogos.get(id_jogo)
+        return estado is not None and estado[3] and monotonic() - estado[0] < MANTER_QUENTE
+
+    def fragmento(self, id_jogo, chave=None):
+        """Sub-chave para a escrita: None (layout normal) se o jogo está frio
+
+        Com `chave`, a mesma chave cai sempre no mesmo fragmento (em
+        qualquer processo); sem ela, o fragmento é sorteado.
+        """
+        if not self.quente(id_jogo):
+            return None
+        if chave is None:
+            return random.randrange(self.fragmentos)
+        return zlib.crc32(chave.encode("utf-8")) % self.fragmentos
+
+    def tolerancia(self, id_jogo):
+        """Segundos de cache tolerados nas leituras do jogo"""
+        return TOLERANCIA_QUENTE if self.quente(id_jogo) else 0
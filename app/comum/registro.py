@@ -0,0 +1,288 @@
+"""
+Registro de jogos conhecidos - Ids recebidos por eventos, persistidos no Memcached
+Usado por comentários e votação para recusar escritas em jogos inexistentes
+"""
+
+import os
+import threading
+import zlib
+from array import array
+from bisect import bisect_left
+from time import monotonic
+
+import requests
+
+from comum.armazenamento import LogPaginado
+from comum.codec import codificar, decodificar
+from comum.logs import Log
+
+# Cada id recebido vai para um diário (LogPaginado); de tempos em tempos um
+# snapshot compacto (array('q') ordenado, zlib) cobre o diário até uma
+# sequência e as páginas já cobertas são descartadas
+ORIGEM = "jogos"
+IDS_POR_PARTE = 100_000
+INTERVALO_REGISTRO = float(os.getenv("INTERVALO_REGISTRO", "1"))
+SNAPSHOT_A_CADA = int(os.getenv("SNAPSHOT_A_CADA", "10000"))
+LEASE_SEGUNDOS = 30
+RETRY_MAX_SEGUNDOS = 30
+
+# Recentes ficam num set pequeno até serem fundidos no array ordenado
+LIMITE_RECENTES = 1000
+
+# Id desconhecido pode ter sido registrado por outra réplica há pouco: o
+# diário é relido, mas no máximo uma vez por este intervalo (segundos)
+INTERVALO_RELEITURA = 0.5
+
+# Sequências reservadas no diário mas ainda sem linha são puladas depois de
+# tantos segundos desde a primeira vez que a lacuna foi vista (bem acima de
+# qualquer escrita em andamento, que leva milissegundos)
+ESPERA_LACUNA_SEGUNDOS = 30
+
+# Com registro e diário vazios (primeira execução com jogos já existentes),
+# a lista inicial vem do serviço de jogos; vazio desliga
+JOGOS_URL = os.getenv("JOGOS_URL", "http://jogos:5000")
+
+
+def normalizar(id_jogo):
+    """Id inteiro do jogo, ou None se não for um id válido"""
+    try:
+        return int(id_jogo)
+    except (TypeError, ValueError):
+        return None
+
+
+class RegistroJogos(threading.Thread):
+    """Conjunto de ids de jogos com consulta local e persistência no Memcached
+
+    conhece() não faz I/O: busca binária num array('q') ordenado (8 bytes
+    por jogo) mais um set com os ids mais recentes. A thread carrega o
+    snapshot e o diário ao iniciar, acompanha o diário escrito pelas outras
+    réplicas e grava novos snapshots sob um lease.
+    """
+
+    def __init__(self, nome, get_cliente, prefixo="registro"):
+        super().__init__(name=f"registro-{prefixo}", daemon=True)
+        self.nome = nome
+        self.log = Log(nome)
+        self.get_cliente = get_cliente
+        self.diario = LogPaginado(prefixo)
+        self.chave_snapshot = f"{prefixo}_snapshot"
+        self.chave_lease = f"{prefixo}_lease"
+        self.instancia = os.urandom(8).hex()
+        self.pronto = threading.Event()
+        self._ids = array("q")
+        self._recentes = set()
+        self._seq = 0
+        self._snapshot = {"seq": 0, "partes": 0}
+        self._lacuna = (0, 0)
+        self._ultima_releitura = 0.0
+        self._lock = threading.Lock()
+        self._lock_diario = threading.Lock()
+        self._parar = threading.Event()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ids) + len(self._recentes)
+
+    def conhece(self, id_jogo):
+        """Consulta só a memória do processo"""
+        id_jogo = normalizar(id_jogo)
+        if id_jogo is None:
+            return False
+        with self._lock:
+            if id_jogo in self._recentes:
+                return True
+            posicao = bisect_left(self._ids, id_jogo)
+            return posicao < len(self._ids) and self._ids[posicao] == id_jogo
+
+    def conhece_ou_atualiza(self, id_jogo):
+        """Como conhece(), relendo o diário (com limite de frequência) na falta"""
+        if self.conhece(id_jogo):
+            return True
+        if normalizar(id_jogo) is None or monotonic() - self._ultima_releitura < INTERVALO_RELEITURA:
+            return False
+        self._ultima_releitura = monotonic()
+        try:
+            self.atualizar(self.get_cliente())
+        except Exception as e:
+            self.log.erro("Falha ao reler registro de jogos", erro=str(e))
+        return self.conhece(id_jogo)
+
+    def registrar(self, cliente, id_jogo):
+        """Grava o id no diário compartilhado e no conjunto local"""
+        id_jogo = normalizar(id_jogo)
+        if id_jogo is None:
+            raise ValueError("id_jogo precisa ser inteiro")
+        if not self.conhece(id_jogo):
+            self.diario.adicionar(cliente, ORIGEM, id_jogo)
+        self._incluir([id_jogo])
+
+    def _incluir(self, ids):
+        with self._lock:
+            self._recentes.update(ids)
+            if len(self._recentes) > LIMITE_RECENTES:
+                self._fundir()
+
+    def _fundir(self):
+        self._ids = array("q", sorted(set(self._ids).union(self._recentes)))
+        self._recentes.clear()
+
+    # --- Snapshot e diário ---
+
+    def _chave_parte(self, seq, parte):
+        return f"{self.chave_snapshot}_{seq}_{parte}"
+
+    def _ler_snapshot(self, cliente):
+        """Lê o snapshot atual; (meta, ids) ou (None, None) se não houver"""
+        for _ in range(2):
+            meta_bytes = cliente.get(self.chave_snapshot)
+            if not meta_bytes:
+                return None, None
+            meta = decodificar(meta_bytes)
+            chaves = [self._chave_parte(meta["seq"], parte) for parte in range(meta["partes"])]
+            partes = cliente.get_many(chaves) if chaves else {}
+            if len(partes) == len(chaves):
+                ids = array("q")
+                for chave in chaves:
+                    ids.frombytes(zlib.decompress(partes[chave]))
+                return meta, ids
+            # Um snapshot mais novo substituiu as partes durante a leitura
+        raise RuntimeError("Snapshot do registro incompleto")
+
+    def carregar(self, cliente):
+        """Estado inicial: snapshot + diário, ou a lista do serviço de jogos"""
+        meta, ids = self._ler_snapshot(cliente)
+        if meta is not None:
+            with self._lock:
+                self._ids = ids
+                self._recentes.difference_update(ids)
+                self._snapshot = meta
+                self._seq = max(self._seq, meta["seq"])
+        self.atualizar(cliente)
+
+        if meta is None and self.diario.total(cliente, ORIGEM) == 0 and JOGOS_URL:
+            try:
+                self._importar_jogos(cliente)
+            except Exception as e:
+                # Sem a lista inicial, o registro se forma só com os eventos
+                self.log.aviso("Lista inicial de jogos indisponível", erro=str(e))
+        with self._lock:
+            self._fundir()
+
+    def _importar_jogos(self, cliente):
+        response = requests.get(f"{JOGOS_URL}/jogos", timeout=10)
+        response.raise_for_status()
+        ids = [normalizar(jogo["id_jogo"]) for jogo in response.json()]
+        ids = [id_jogo for id_jogo in ids if id_jogo is not None]
+        if ids:
+            self.diario.adicionar_varios(cliente, ORIGEM, ids)
+            self._incluir(ids)
+        self.log.info("Registro iniciado com a lista do serviço de jogos", jogos=len(ids))
+
+    def atualizar(self, cliente):
+        """Traz os ids gravados no diário desde a última leitura"""
+        with self._lock_diario:
+            self._atualizar(cliente)
+
+    def _atualizar(self, cliente):
+        meta_bytes = cliente.get(self.chave_snapshot)
+        meta = decodificar(meta_bytes) if meta_bytes else None
+        if meta is not None and meta["seq"] > self._seq:
+            # As páginas anteriores ao snapshot podem já ter sido descartadas
+            meta, ids = self._ler_snapshot(cliente)
+            if meta is not None:
+                with self._lock:
+                    self._recentes.update(ids)
+                    self._fundir()
+                    self._snapshot = meta
+                    self._seq = max(self._seq, meta["seq"])
+        elif meta is not None and meta["seq"] > self._snapshot["seq"]:
+            with self._lock:
+                self._snapshot = meta
+
+        total = self.diario.total(cliente, ORIGEM)
+        if total <= self._seq:
+            return
+        entradas = self.diario.ler_intervalo(cliente, ORIGEM, self._seq + 1, total)
+        self._incluir([id_jogo for _, id_jogo in entradas])
+
+        esperado = self._seq + 1
+        for seq, _ in entradas:
+            if seq != esperado:
+                break
+            esperado += 1
+        if esperado > self._seq + 1 or esperado > total:
+            self._lacuna = (0, 0)
+        else:
+            seq_lacuna, vista_em = self._lacuna
+            if seq_lacuna != esperado:
+                self._lacuna = (esperado, monotonic())
+                return
+            if monotonic() - vista_em < ESPERA_LACUNA_SEGUNDOS:
+                return
+            self.log.aviso("Registro ausente do diário, ignorado", seq=esperado)
+            self._lacuna = (0, 0)
+            esperado += 1
+        self._seq = esperado - 1
+
+    def salvar_snapshot(self, cliente):
+        """Grava o conjunto atual como snapshot e descarta o diário coberto"""
+        if not self._obter_lease(cliente):
+            return False
+        with self._lock:
+            self._fundir()
+            ids, seq, anterior = self._ids, self._seq, self._snapshot
+        if seq <= anterior["seq"]:
+            return False
+
+        partes = {}
+        for parte, inicio in enumerate(range(0, len(ids), IDS_POR_PARTE)):
+            partes[self._chave_parte(seq, parte)] = zlib.compress(ids[inicio:inicio + IDS_POR_PARTE].tobytes())
+        if partes:
+            cliente.set_many(partes, noreply=False)
+        meta = {"seq": seq, "partes": len(partes)}
+        cliente.set(self.chave_snapshot, codificar(meta), noreply=False)
+        with self._lock:
+            self._snapshot = meta
+
+        for parte in range(anterior["partes"]):
+            cliente.delete(self._chave_parte(anterior["seq"], parte), noreply=False)
+        tamanho = self.diario.tamanho_pagina
+        for pagina in range(anterior["seq"] // tamanho, seq // tamanho):
+            cliente.delete(self.diario.chave_pagina(ORIGEM, pagina), noreply=False)
+        self.log.info("Snapshot do registro gravado", jogos=len(ids), seq=seq)
+        return True
+
+    def _obter_lease(self, cliente):
+        if cliente.add(self.chave_lease, self.instancia, expire=LEASE_SEGUNDOS, noreply=False):
+            return True
+        dono = cliente.get(self.chave_lease)
+        if dono and dono.decode("utf-8") == self.instancia:
+            cliente.touch(self.chave_lease, expire=LEASE_SEGUNDOS, noreply=False)
+            return True
+        return False
+
+    # --- Thread de manutenção ---
+
+    def run(self):
+        espera = INTERVALO_REGISTRO
+        while not self._parar.is_set():
+            try:
+                cliente = self.get_cliente()
+                if not self.pronto.is_set():
+                    self.carregar(cliente)
+                    self.pronto.set()
+                    self.log.info("Registro carregado", jogos=len(self))
+                else:
+                    self.atualizar(cliente)
+                if self._seq - self._snapshot["seq"] >= SNAPSHOT_A_CADA:
+                    self.salvar_snapshot(cliente)
+                espera = INTERVALO_REGISTRO
+            except Exception as e:
+                self.log.erro("Manutenção do registro falhou", erro=str(e), espera=espera)
+                espera = min(espera * 2, RETRY_MAX_SEGUNDOS)
+            self._parar.wait(espera)
+
+    def parar(self, timeout=5):
+        self._parar.set()
+        self.join(timeout)
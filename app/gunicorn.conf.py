@@ -0,0 +1,48 @@
+"""
+Configuração do gunicorn - Modo de produção dos três serviços
+Uso: gunicorn -c /servico/gunicorn.conf.py --chdir /servico/<servico> servico:servico
+"""
+
+import os
+import sys
+
+bind = "0.0.0.0:5000"
+
+# Workers gthread: cada processo atende GUNICORN_THREADS requisições ao mesmo
+# tempo (I/O bloqueante no Memcached/RabbitMQ libera o GIL) e streams SSE
+# ocupam uma thread cada. Por isso cada processo aceita no máximo
+# LIMITE_STREAMS streams (comum/barramento.py, padrão 16, metade das threads)
+# e recusa os demais com 503; ao subir GUNICORN_THREADS, ajuste os dois
+# juntos. Workers se comportam como réplicas: cache e streams de cada um
+# recebem as escritas dos outros pelos exchanges de novidades.
+worker_class = "gthread"
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+
+# Streams SSE ficam abertos por muito tempo; o heartbeat mantém a conexão viva
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 10
+keepalive = 5
+
+accesslog = None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+
+def post_worker_init(worker):
+    """Inicia as threads de background do serviço dentro de cada worker
+
+    Conexões do pika e do Memcached não sobrevivem a fork, então consumidor
+    e relay são criados depois que o worker carregou a aplicação.
+    """
+    modulo = sys.modules.get(worker.app.app_uri.partition(":")[0])
+    iniciar_tarefas = getattr(modulo, "iniciar_tarefas", None)
+    if iniciar_tarefas is not None:
+        iniciar_tarefas()
+
+
+def child_exit(server, worker):
+    """Descarta as métricas do worker encerrado (modo multiprocesso do Prometheus)"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
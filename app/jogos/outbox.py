@@ -0,0 +1,191 @@
+"""
+Outbox de eventos - Registro dos eventos junto com a escrita e relay para o RabbitMQ
+Os eventos ficam num log paginado no mesmo Memcached dos jogos até serem confirmados
+"""
+
+import os
+import threading
+import uuid
+from time import monotonic, perf_counter
+from concurrent.futures import wait
+
+import pika
+
+from comum.armazenamento import LogPaginado
+from comum.codec import codificar_mensagem
+from comum.logs import Log
+from comum.metricas import RELAY_FALHAS, RELAY_LOTE, RELAY_SEGUNDOS
+
+# O outbox é um LogPaginado de uma única "origem"; o cursor guarda a última
+# sequência confirmada pelo broker e o lease impede relays simultâneos
+ORIGEM = "jogos"
+CHAVE_CURSOR = "outbox_jogos_publicado"
+CHAVE_LEASE = "outbox_jogos_lease"
+
+LOTE_RELAY = int(os.getenv("LOTE_RELAY", "500"))
+INTERVALO_RELAY = float(os.getenv("INTERVALO_RELAY", "1"))
+TIMEOUT_CONFIRMACAO = float(os.getenv("TIMEOUT_CONFIRMACAO", "5"))
+LEASE_SEGUNDOS = 30
+RETRY_MAX_SEGUNDOS = 30
+
+# Sequências reservadas cuja linha não aparece (escrita em andamento ou
+# página despejada) são puladas depois de tantos segundos desde a primeira
+# vez que a lacuna foi vista; contar chamadas não serve, porque cada POST
+# acorda o relay e uma rajada esgotaria as tentativas em milissegundos
+ESPERA_LACUNA_SEGUNDOS = float(os.getenv("ESPERA_LACUNA_SEGUNDOS", "30"))
+
+outbox = LogPaginado("outbox")
+log = Log("JOGOS")
+
+
+def id_mensagem(jogo):
+    """Id idempotente do evento: o mesmo jogo gera sempre o mesmo id"""
+    return f"jogo-{jogo['id_jogo']}"
+
+
+def registrar_eventos(cliente, jogos):
+    """Grava no outbox os eventos dos jogos (um incr e um append por página)"""
+    if jogos:
+        outbox.adicionar_varios(cliente, ORIGEM, jogos)
+
+
+class RelayOutbox(threading.Thread):
+    """Drena o outbox para o exchange em lotes, avançando o cursor só após os acks
+
+    Falhas do broker apenas adiam o lote: o cursor não anda e o mesmo
+    intervalo é republicado com os mesmos message_id, então consumidores
+    idempotentes descartam o que já tinham recebido. Um lote que só estourou
+    o timeout continua em voo: a próxima volta espera pelos mesmos Futures e
+    republica apenas os que falharam, em vez de enfileirar tudo de novo.
+    """
+
+    def __init__(self, get_cliente, get_publicador):
+        super().__init__(name="relay-outbox", daemon=True)
+        self.get_cliente = get_cliente
+        self.get_publicador = get_publicador
+        self.instancia = uuid.uuid4().hex
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._lacuna = (0, 0)
+        self._em_voo = None
+
+    def acordar(self):
+        """Sinaliza que há eventos novos no outbox"""
+        self._acordar.set()
+
+    def parar(self, timeout=5):
+        self._parar.set()
+        self._acordar.set()
+        self.join(timeout)
+
+    def run(self):
+        espera = INTERVALO_RELAY
+        while not self._parar.is_set():
+            try:
+                pendentes = self.drenar()
+                espera = INTERVALO_RELAY
+            except Exception as e:
+                RELAY_FALHAS.inc()
+                log.erro("Relay do outbox falhou", erro=str(e), espera=espera)
+                pendentes = False
+                espera = min(espera * 2, RETRY_MAX_SEGUNDOS)
+
+            if not pendentes:
+                self._acordar.wait(espera)
+                self._acordar.clear()
+
+    def _obter_lease(self, cliente):
+        if cliente.add(CHAVE_LEASE, self.instancia, expire=LEASE_SEGUNDOS, noreply=False):
+            return True
+        dono = cliente.get(CHAVE_LEASE)
+        if dono and dono.decode("utf-8") == self.instancia:
+            cliente.touch(CHAVE_LEASE, expire=LEASE_SEGUNDOS, noreply=False)
+            return True
+        return False
+
+    def drenar(self):
+        """Publica um lote do outbox; retorna True se ainda restam eventos"""
+        cliente = self.get_cliente()
+        total = outbox.total(cliente, ORIGEM)
+        cursor_bytes = cliente.get(CHAVE_CURSOR)
+        publicado = int(cursor_bytes) if cursor_bytes else 0
+        if total <= publicado or not self._obter_lease(cliente):
+            return False
+
+        inicio = perf_counter()
+        publicador = self.get_publicador()
+        em_voo, self._em_voo = self._em_voo, None
+        if em_voo is not None and em_voo[0][0][0] == publicado + 1:
+            entradas, futuros = em_voo
+            futuros = [
+                self._publicar(publicador, jogo) if futuro.done() and futuro.exception() else futuro
+                for (_, jogo), futuro in zip(entradas, futuros)
+            ]
+        else:
+            fim = min(total, publicado + LOTE_RELAY)
+            entradas = self._contiguas(cliente, outbox.ler_intervalo(cliente, ORIGEM, publicado + 1, fim), publicado)
+            if not entradas:
+                return False
+            futuros = [self._publicar(publicador, jogo) for _, jogo in entradas]
+
+        self._em_voo = (entradas, futuros)
+        concluidos, nao_confirmados = wait(futuros, timeout=TIMEOUT_CONFIRMACAO)
+        falhas = sum(1 for futuro in concluidos if futuro.exception())
+        if nao_confirmados or falhas:
+            raise RuntimeError(
+                f"{len(nao_confirmados)} eventos sem confirmação e {falhas} recusados pelo broker"
+            )
+        self._em_voo = None
+
+        novo_cursor = entradas[-1][0]
+        cliente.set(CHAVE_CURSOR, str(novo_cursor), noreply=False)
+        self._descartar_paginas(cliente, publicado, novo_cursor)
+        RELAY_LOTE.observe(len(entradas))
+        RELAY_SEGUNDOS.observe(perf_counter() - inicio)
+        log.debug("Relay publicou lote", eventos=len(entradas), cursor=novo_cursor)
+        return novo_cursor < total
+
+    def _publicar(self, publicador, jogo):
+        corpo, tipo, codificacao = codificar_mensagem(jogo)
+        return publicador.publicar(
+            corpo,
+            pika.BasicProperties(
+                delivery_mode=2,
+                content_type=tipo,
+                content_encoding=codificacao,
+                message_id=id_mensagem(jogo),
+            ),
+        )
+
+    def _contiguas(self, cliente, entradas, publicado):
+        """Mantém só o trecho sem lacunas a partir do cursor"""
+        esperado = publicado + 1
+        contiguas = []
+        for seq, jogo in entradas:
+            if seq != esperado:
+                break
+            contiguas.append((seq, jogo))
+            esperado += 1
+
+        if contiguas:
+            self._lacuna = (0, 0)
+            return contiguas
+
+        # A sequência `esperado` foi reservada mas sua linha ainda não apareceu
+        seq_lacuna, vista_em = self._lacuna
+        if seq_lacuna != esperado:
+            self._lacuna = (esperado, monotonic())
+            return []
+        if monotonic() - vista_em < ESPERA_LACUNA_SEGUNDOS:
+            return []
+
+        log.aviso("Evento ausente do outbox, ignorado", seq=esperado)
+        self._lacuna = (0, 0)
+        cliente.set(CHAVE_CURSOR, str(esperado), noreply=False)
+        return []
+
+    def _descartar_paginas(self, cliente, anterior, atual):
+        """Remove as páginas do outbox inteiramente já publicadas"""
+        tamanho = outbox.tamanho_pagina
+        for pagina in range(anterior // tamanho, atual // tamanho):
+            cliente.delete(outbox.chave_pagina(ORIGEM, pagina), noreply=False)
@@ -4,10 +4,19 @@ Recebe jogos via HTTP POST, armazena no Memcached e publica eventos para outros
 """
 
 from flask import Flask, Response, request
-from pymemcache.client import base
+from comum.armazenamento import LogPaginado, configurar, get_cliente
+from comum.cache import CacheRespostas, responder
+from comum.codec import codificar, decodificar
+from comum.eventos import ConsumidorEventos
+from comum.logs import Log
+from comum.metricas import JOGOS_RECEBIDOS, instrumentar
+from comum.persistencia import PERSISTENCIA_ARQUIVO, Persistencia
+from comum.publicador import PoolPublicadores
+from outbox import RelayOutbox, registrar_eventos
+import atexit
 import json
-import pika
 import os
+import threading
 
 VERSAO = "2.0-event-driven-simple"
 INFO = {
@@ -16,24 +25,105 @@ INFO = {
     "versao": VERSAO,
 }
 
-RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq")
 MEMCACHED_HOST = os.getenv("MEMCACHED_HOST", "banco_jogos")
-MEMCACHED_PORT = 11211
-
-servico = Flask("jogos")
+MEMCACHED_PORT = int(os.getenv("MEMCACHED_PORT", "11211"))
 
+# Exchange fanout: cada serviço interessado liga sua própria fila a ele
+EXCHANGE_EVENTOS = os.getenv("EXCHANGE_EVENTOS", "jogos_eventos")
 
-def get_rabbitmq_channel():
-    """Cria conexão simples com RabbitMQ para publicar eventos"""
-    credentials = pika.PlainCredentials('admin', 'admin')
-    connection = pika.BlockingConnection(
-        pika.ConnectionParameters(host=RABBITMQ_HOST, credentials=credentials)
-    )
-    channel = connection.channel()
-    channel.queue_declare(queue="jogos_eventos", durable=True)
-    return channel, connection
+# Índice paginado com a ordem de inserção dos jogos (indice_jogos_p<n>, uma
+# linha [seq, id_jogo] por jogo): cada página cresce por append e nenhuma
+# chave cresce com o total de jogos
+ORIGEM_INDICE = "jogos"
+TAMANHO_PAGINA_INDICE = 1000
+LOTE_LEITURA = 500
 
+# GET /jogos fica no cache do processo até um jogo novo ser inserido aqui ou,
+# em outra réplica, até o evento dele chegar pelo exchange
+TOPICO_JOGOS = "jogos"
 
+servico = Flask("jogos")
+instrumentar(servico, "jogos")
+cache = CacheRespostas()
+log = Log("JOGOS")
+
+# Cópia durável (jogos e o índice) num arquivo SQLite, gravada em
+# background e usada para reidratar o Memcached ao iniciar
+persistencia = None
+if PERSISTENCIA_ARQUIVO:
+    persistencia = Persistencia("JOGOS", PERSISTENCIA_ARQUIVO, ("jogo_", "indice_"))
+
+configurar(servidor=(MEMCACHED_HOST, MEMCACHED_PORT), persistencia=persistencia)
+indice = LogPaginado("indice", tamanho_pagina=TAMANHO_PAGINA_INDICE)
+
+# Publicador único do processo, criado no primeiro uso
+publicador = None
+publicador_lock = threading.Lock()
+
+
+def get_publicador():
+    """Retorna o pool de publicadores persistentes do processo"""
+    global publicador
+    with publicador_lock:
+        if publicador is None:
+            publicador = PoolPublicadores(EXCHANGE_EVENTOS, nome="JOGOS")
+            atexit.register(publicador.parar)
+        return publicador
+
+
+# Relay do outbox: publica em background os eventos registrados com os jogos
+relay = RelayOutbox(get_cliente, get_publicador)
+
+
+def chave_jogo(id_jogo):
+    """Chave individual de um jogo no Memcached"""
+    return f"jogo_{id_jogo}"
+
+
+def inserir_jogos(cliente, novos_jogos):
+    """Grava jogos ainda não existentes, um por chave, e os anexa ao índice
+
+    A deduplicação usa o próprio Memcached: um get_many do lote descarta os
+    jogos já conhecidos e o `add` (que falha se a chave existe) resolve
+    corridas entre requisições concorrentes. Os eventos e as linhas do índice
+    dos candidatos são gravados antes dos jogos, então nenhum jogo gravado
+    fica sem evento nem fora do índice; uma falha no meio deixa só ids sem
+    jogo ou repetidos, que listar_jogos ignora. Retorna os jogos inseridos.
+    """
+    chaves = [chave_jogo(jogo["id_jogo"]) for jogo in novos_jogos]
+    existentes = cliente.get_many(chaves)
+
+    candidatos = {}
+    for chave, jogo in zip(chaves, novos_jogos):
+        if chave not in existentes and chave not in candidatos:
+            candidatos[chave] = jogo
+    if not candidatos:
+        return []
+    registrar_eventos(cliente, list(candidatos.values()))
+    indice.adicionar_varios(cliente, ORIGEM_INDICE, [jogo["id_jogo"] for jogo in candidatos.values()])
+
+    inseridos = []
+    for chave, jogo in candidatos.items():
+        if cliente.add(chave, codificar(jogo), noreply=False):
+            inseridos.append(jogo)
+    return inseridos
+
+
+def listar_jogos(cliente):
+    """Monta a lista de jogos a partir do índice com get_many em lotes
+
+    Ids repetidos (corridas e novas tentativas) contam só na primeira
+    posição e ids sem jogo gravado são ignorados.
+    """
+    todas = list(dict.fromkeys(chave_jogo(id_jogo) for id_jogo in indice.ler(cliente, ORIGEM_INDICE)))
+    jogos = []
+    for inicio in range(0, len(todas), LOTE_LEITURA):
+        chaves = todas[inicio:inicio + LOTE_LEITURA]
+        valores = cliente.get_many(chaves)
+        for chave in chaves:
+            if chave in valores:
+                jogos.append(decodificar(valores[chave]))
+    return jogos
 
 
 @servico.get("/")
@@ -53,75 +143,74 @@ def criar_jogos():
     novos_jogos = request.get_json()
 
     try:
-        cliente = base.Client((MEMCACHED_HOST, MEMCACHED_PORT))
-
-        # Busca jogos existentes
-        jogos_bytes = cliente.get("jogos")
-        jogos = []
-        if jogos_bytes:
-            jogos = json.loads(jogos_bytes.decode("utf-8"))
+        cliente = get_cliente()
 
-        # Adiciona novos jogos (evitando duplicados)
+        # Cada jogo fica em sua própria chave; o custo depende só do lote recebido
+        inseridos = inserir_jogos(cliente, novos_jogos)
+        ids_inseridos = {jogo["id_jogo"] for jogo in inseridos}
         for jogo in novos_jogos:
-            if not any(j["id_jogo"] == jogo["id_jogo"] for j in jogos):
-                jogos.append(jogo)
-                print(f"[JOGOS] Armazenado via HTTP: {jogo['time1']} vs {jogo['time2']}", flush=True)
+            if jogo["id_jogo"] in ids_inseridos:
+                log.amostra("Jogo armazenado via HTTP", id_jogo=jogo["id_jogo"])
             else:
-                print(f"[JOGOS] Jogo duplicado ignorado: {jogo['id_jogo']}", flush=True)
+                log.amostra("Jogo duplicado ignorado", id_jogo=jogo["id_jogo"])
+        JOGOS_RECEBIDOS.labels("inserido").inc(len(inseridos))
+        JOGOS_RECEBIDOS.labels("duplicado").inc(len(novos_jogos) - len(inseridos))
 
-        # Salva de volta no Memcached
-        cliente.set("jogos", json.dumps(jogos))
-        cliente.close()
-
-        # Publica eventos para outros serviços (Comentarios e Votacao)
-        try:
-            channel, connection = get_rabbitmq_channel()
-            eventos_publicados = 0
-            for jogo in novos_jogos:
-                # Publica apenas jogos novos (não duplicados)
-                if any(j["id_jogo"] == jogo["id_jogo"] for j in jogos):
-                    channel.basic_publish(
-                        exchange="",
-                        routing_key="jogos_eventos",
-                        body=json.dumps(jogo),
-                        properties=pika.BasicProperties(delivery_mode=2)
-                    )
-                    eventos_publicados += 1
-                    print(f"[JOGOS] Evento publicado para jogos_eventos: {jogo['id_jogo']}", flush=True)
-            connection.close()
-            print(f"[JOGOS] Total de eventos publicados: {eventos_publicados}", flush=True)
-        except Exception as e:
-            print(f"[JOGOS] Aviso: Erro ao publicar eventos (não crítico): {str(e)}", flush=True)
+        # Eventos já estão no outbox; o relay publica sem segurar a requisição
+        if inseridos:
+            cache.invalidar(TOPICO_JOGOS)
+            relay.acordar()
 
         sucesso = True
 
     except Exception as e:
-        print(f"[JOGOS] Erro ao armazenar: {str(e)}")
+        log.erro("Erro ao armazenar", erro=str(e))
 
     return Response(status=201 if sucesso else 422)
 
 
 @servico.get("/jogos")
 def get_jogos():
-    """Consulta jogos do Memcached"""
-    sucesso, jogos = False, None
+    """Consulta jogos do Memcached (ou do cache do processo, com ETag)"""
+    def gerar():
+        sucesso, jogos = False, None
 
-    try:
-        cliente = base.Client((MEMCACHED_HOST, MEMCACHED_PORT))
-        jogos_bytes = cliente.get("jogos")
-        if jogos_bytes:
-            jogos = json.loads(jogos_bytes.decode("utf-8"))
-        cliente.close()
-        sucesso = True
+        try:
+            cliente = get_cliente()
+            jogos = listar_jogos(cliente)
+            sucesso = True
 
-    except Exception as e:
-        print(f"[JOGOS] Erro ao buscar: {str(e)}")
+        except Exception as e:
+            log.erro("Erro ao buscar", erro=str(e))
+
+        return Response(
+            json.dumps(jogos if sucesso and jogos else []),
+            status=200 if sucesso else 500,
+            mimetype="application/json",
+        )
+
+    return responder(cache, TOPICO_JOGOS, gerar)
 
-    return Response(
-        json.dumps(jogos if sucesso and jogos else []),
-        status=200 if sucesso else 500,
-        mimetype="application/json",
+
+def iniciar_tarefas():
+    """Inicia as threads de background do processo (relay do outbox)
+
+    Chamado pelo __main__ e, no modo de produção, pelo hook
+    post_worker_init do gunicorn em cada worker.
+    """
+    # Memcached vazio (reiniciado) é reidratado do arquivo antes de tudo
+    if persistencia is not None:
+        persistencia.iniciar(get_cliente)
+
+    relay.start()
+    atexit.register(relay.parar)
+
+    # Jogos inseridos por outras réplicas invalidam o cache deste processo
+    invalidador = ConsumidorEventos(
+        "JOGOS", EXCHANGE_EVENTOS, None, lambda _: cache.invalidar(TOPICO_JOGOS)
     )
+    invalidador.start()
+    atexit.register(invalidador.parar)
 
 
 if __name__ == "__main__":
@@ -130,5 +219,7 @@ if __name__ == "__main__":
     print(f"Versão: {INFO['versao']}")
     print("=" * 60)
 
-    # Inicia Flask
+    iniciar_tarefas()
+
+    # Inicia Flask (servidor de desenvolvimento; produção usa gunicorn)
     servico.run(host="0.0.0.0", port=5000, debug=True, use_reloader=False)
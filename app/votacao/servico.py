@@ -4,12 +4,25 @@ API REST para votação + Consumidor de eventos de jogos
 """
 
 from flask import Flask, Response, request
-from pymemcache.client import base
-from flask_apscheduler import APScheduler
+from comum.armazenamento import FRAGMENTOS, LogPaginado, agrupar_por_jogo, anexar, configurar, get_cliente
+from comum.barramento import Barramento, acompanhar, formatar_sse
+from comum.cache import CacheRespostas, responder
+from comum.eventos import ConsumidorEventos, EventoInvalido
+from comum.ingestao import INGESTAO_EM_LOTE, GravacaoParcial, IngestaoEmLote
+from comum.logs import Log
+from comum.metricas import instrumentar
+from comum.novidades import Novidades
+from comum.persistencia import PERSISTENCIA_ARQUIVO, Persistencia
+from comum.quentes import DetectorQuentes
+from comum.registro import RegistroJogos, normalizar
+from time import monotonic
+import atexit
+import hashlib
 import json
-import pika
 import os
-from time import sleep
+import signal
+import sys
+import zlib
 
 VERSAO = "2.0-event-driven-simple"
 INFO = {
@@ -18,41 +31,265 @@ INFO = {
     "versao": VERSAO,
 }
 
-RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq")
 MEMCACHED_HOST = os.getenv("MEMCACHED_HOST", "banco_votacao")
-MEMCACHED_PORT = 11211
+MEMCACHED_PORT = int(os.getenv("MEMCACHED_PORT", "11211"))
+
+# Eventos de jogos chegam por um exchange fanout: cada serviço tem sua própria
+# fila durável (todos recebem todos os eventos) e réplicas do mesmo serviço
+# compartilham essa fila como consumidores concorrentes
+EXCHANGE_EVENTOS = os.getenv("EXCHANGE_EVENTOS", "jogos_eventos")
+FILA_EVENTOS = os.getenv("FILA_EVENTOS", "jogos_eventos_votacao")
+
+# Votos gravados por uma réplica são anunciados às demais por este exchange
+# (invalidação do cache e streams SSE)
+EXCHANGE_NOVIDADES = os.getenv("EXCHANGE_NOVIDADES", "votacao_novidades")
+
+# Placar pré-agregado: um contador por time (votacao_<id>_placar_<hash>) e a
+# lista dos times já votados (votacao_<id>_times), atualizados a cada voto
+LIMITE_IDS_PLACAR = 500
+
+# Um voto por autor: cada jogo tem um índice de autores (uma chave por autor,
+# votacao_<id>_autor_<hash>_f<k>, com o voto atual) e trocar de time desconta
+# o voto anterior; a chave é escrita com add/cas, então o teste é O(1)
+TENTATIVAS_VOTO = 10
+
+# Leitura de vários jogos numa requisição: GET /votacao?ids=1,2,3 (limit
+# opcional, últimos votos de cada jogo, até LIMITE_VOTOS_POR_JOGO)
+LIMITE_IDS = 500
+LIMITE_VOTOS_POR_JOGO = 500
+
+# Streams SSE: keep-alive sem novidades, votos recuperados por leitura do log
+# e intervalo mínimo entre placares enviados (vários votos viram um placar)
+INTERVALO_HEARTBEAT = 15
+LIMITE_REPLAY = 500
+INTERVALO_PLACAR = 1.0
 
 servico = Flask("votacao")
+instrumentar(servico, "votacao")
+log = Log("VOTACAO")
 
-# Controle de jogos conhecidos (recebidos via eventos)
-jogos_conhecidos = set()
-
-
-def processar_eventos_jogos():
-    """Consome eventos de jogos criados (executado periodicamente)"""
+# Cópia durável (logs de votos, placares e times) num arquivo SQLite, gravada em
+# background e usada para reidratar o Memcached ao iniciar
+persistencia = None
+if PERSISTENCIA_ARQUIVO:
+    persistencia = Persistencia("VOTACAO", PERSISTENCIA_ARQUIVO, ("votacao_",))
+
+configurar(servidor=(MEMCACHED_HOST, MEMCACHED_PORT), persistencia=persistencia)
+log_votacao = LogPaginado("votacao")
+barramento = Barramento()
+cache = CacheRespostas()
+novidades = Novidades("VOTACAO", EXCHANGE_NOVIDADES, cache, barramento)
+
+# Jogos com muitas requisições gravam votos e contadores em sub-chaves e
+# toleram um cache curto; (jogo, time) já presentes na lista de times
+quentes = DetectorQuentes("VOTACAO")
+times_registrados = set()
+
+# Jogos conhecidos (recebidos via eventos), persistidos no Memcached do serviço
+registro = RegistroJogos("VOTACAO", get_cliente)
+
+
+def processar_evento_jogo(jogo):
+    """Registra um jogo criado recebido via evento
+
+    Evento sem id inteiro é descartado; falhas do Memcached sobem para o
+    consumidor, que devolve a mensagem à fila. Registrar de novo um jogo
+    conhecido não grava nada, então reentregas são inofensivas.
+    """
+    id_jogo = normalizar(jogo.get("id_jogo")) if isinstance(jogo, dict) else None
+    if id_jogo is None:
+        raise EventoInvalido(f"Evento de jogo sem id válido: {jogo!r}")
+    registro.registrar(get_cliente(), id_jogo)
+    log.amostra("Jogo recebido", id_jogo=id_jogo)
+
+
+def chave_times(id_jogo):
+    """Lista (uma linha JSON por time) dos times que já receberam votos"""
+    return f"votacao_{id_jogo}_times"
+
+
+def chave_placar(id_jogo, time, fragmento=None):
+    """Contador de votos de um time; o nome é resumido para caber na chave
+
+    Com `fragmento`, um dos sub-contadores usados enquanto o jogo está
+    quente; o placar é a soma do contador com os sub-contadores.
+    """
+    resumo = hashlib.sha1(time.encode("utf-8")).hexdigest()[:16]
+    chave = f"votacao_{id_jogo}_placar_{resumo}"
+    return chave if fragmento is None else f"{chave}_f{fragmento}"
+
+
+def chave_placar_fragmentado(id_jogo):
+    """Presente se o placar do jogo tem sub-contadores"""
+    return f"votacao_{id_jogo}_placar_fragmentos"
+
+
+def somar(cliente, chave, quantidade):
+    """incr que cria o contador (em "0", como em reservar); True se foi esta chamada que o criou"""
+    if cliente.incr(chave, quantidade, noreply=False) is not None:
+        return False
+    criado = cliente.add(chave, "0", noreply=False)
+    cliente.incr(chave, quantidade, noreply=False)
+    return criado
+
+
+def contar_voto(cliente, id_jogo, time, quantidade=1, fragmento=None):
+    """Incrementa o contador do time, registrando-o na primeira vez"""
+    if fragmento is None:
+        if somar(cliente, chave_placar(id_jogo, time), quantidade):
+            anexar(cliente, chave_times(id_jogo), json.dumps(time) + "\n")
+        return
+
+    somar(cliente, chave_placar(id_jogo, time, fragmento), quantidade)
+    if (id_jogo, time) not in times_registrados:
+        # O contador principal (zerado) registra o time e o jogo é marcado
+        if cliente.add(chave_placar(id_jogo, time), "0", noreply=False):
+            anexar(cliente, chave_times(id_jogo), json.dumps(time) + "\n")
+        cliente.add(chave_placar_fragmentado(id_jogo), "1", noreply=False)
+        if len(times_registrados) > 100_000:
+            times_registrados.clear()
+        times_registrados.add((id_jogo, time))
+
+
+def chave_autor(id_jogo, autor):
+    """Voto atual de um autor no jogo: JSON [time, fragmento do contador]
+
+    O autor é resumido (tamanho fixo, ~40 bytes por chave) e o sufixo _f<k>
+    espalha os autores de um jogo por vários nós do anel.
+    """
+    resumo = hashlib.blake2b(autor.encode("utf-8"), digest_size=8).hexdigest()
+    return f"votacao_{id_jogo}_autor_{resumo}_f{zlib.crc32(autor.encode('utf-8')) % FRAGMENTOS}"
+
+
+def trocar_voto(cliente, id_jogo, autor, time, fragmento):
+    """Registra o voto do autor no índice do jogo
+
+    Retorna (aceito, anterior): primeiro voto (True, None), troca de time
+    (True, [time, fragmento] anterior) e voto repetido (False, anterior).
+    Autor novo custa um add; trocas usam gets/cas, então duas trocas
+    simultâneas do mesmo autor descontam cada voto anterior uma única vez.
+    """
+    chave = chave_autor(id_jogo, autor)
+    valor = json.dumps([time, fragmento])
+    for _ in range(TENTATIVAS_VOTO):
+        if cliente.add(chave, valor, noreply=False):
+            return True, None
+        atual, token = cliente.gets(chave)
+        if atual is None:
+            continue
+        anterior = json.loads(atual)
+        if anterior[0] == time:
+            return False, anterior
+        if cliente.cas(chave, valor, token, noreply=False):
+            return True, anterior
+    raise RuntimeError(f"Voto de {autor} no jogo {id_jogo} em disputa após {TENTATIVAS_VOTO} tentativas")
+
+
+def aplicar_votos(cliente, id_jogo, votos):
+    """Aplica votos validados (com autor e voto) de um jogo, na ordem
+
+    Cada voto aceito é contado na hora e, se for uma troca, o contador do
+    time anterior é descontado e o item ganha o campo "anterior". Só os
+    aceitos vão para o log; retorna [(seq, voto)] deles.
+
+    Um voto conta como aplicado quando entra no índice do autor, e a partir
+    daí uma nova tentativa o trataria como repetido. Por isso, numa falha,
+    os votos já aplicados ainda vão para o log e GravacaoParcial leva só os
+    seguintes como pendentes; regravá-los não duplica nada.
+    """
+    aceitos, aplicados, erro = [], 0, None
+    for voto in votos:
+        autor, time = str(voto["autor"]), str(voto["voto"])
+        fragmento = quentes.fragmento(id_jogo, autor)
+        try:
+            aceito, anterior = trocar_voto(cliente, id_jogo, autor, time, fragmento)
+        except Exception as e:
+            erro = e
+            break
+        aplicados += 1
+        if not aceito:
+            continue
+        if anterior is not None:
+            voto = {**voto, "anterior": anterior[0]}
+        aceitos.append(voto)
+        try:
+            contar_voto(cliente, id_jogo, time, fragmento=fragmento)
+            if anterior is not None:
+                cliente.decr(chave_placar(id_jogo, anterior[0], anterior[1]), 1, noreply=False)
+        except Exception as e:
+            log.erro("Placar sem o voto aplicado", id_jogo=id_jogo, erro=str(e))
+            erro = e
+            break
+
+    entradas = []
+    if aceitos:
+        try:
+            seqs = log_votacao.adicionar_varios(cliente, id_jogo, aceitos, quentes.fragmento(id_jogo))
+            entradas = list(zip(seqs, aceitos))
+        except Exception as e:
+            log.erro("Votos aplicados fora do log", id_jogo=id_jogo, votos=len(aceitos), erro=str(e))
+            erro = erro or e
+    if erro is not None:
+        raise GravacaoParcial(votos[aplicados:], entradas) from erro
+    return entradas
+
+
+def voto_valido(voto):
+    return isinstance(voto, dict) and voto.get("autor") is not None and "voto" in voto
+
+
+def gravar_lote(id_jogo, votos):
+    """Grava de uma vez os votos acumulados de um jogo; retorna [(seq, voto)] dos aceitos"""
+    entradas = []
     try:
-        credentials = pika.PlainCredentials('admin', 'admin')
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(host=RABBITMQ_HOST, credentials=credentials)
-        )
-        channel = connection.channel()
-        channel.queue_declare(queue="jogos_eventos", durable=True)
-
-        # Processa mensagens disponíveis
-        method_frame, header_frame, body = channel.basic_get(queue="jogos_eventos")
-
-        while method_frame:
-            jogo = json.loads(body)
-            jogos_conhecidos.add(jogo["id_jogo"])
-            print(f"[VOTACAO] Jogo recebido: {jogo['id_jogo']} - {jogo['time1']} vs {jogo['time2']}")
-
-            channel.basic_ack(method_frame.delivery_tag)
-            method_frame, header_frame, body = channel.basic_get(queue="jogos_eventos")
-
-        connection.close()
-
-    except Exception as e:
-        print(f"[VOTACAO] Erro ao processar eventos: {str(e)}")
+        entradas = aplicar_votos(get_cliente(), id_jogo, votos)
+    except GravacaoParcial as e:
+        entradas = e.gravados
+        raise
+    finally:
+        if entradas:
+            novidades.registrar(id_jogo, entradas)
+    return entradas
+
+
+# Com INGESTAO_EM_LOTE=1, POST responde 202 e um flusher grava por jogo
+ingestao = IngestaoEmLote("VOTACAO", gravar_lote) if INGESTAO_EM_LOTE else None
+
+
+def ler_placares(cliente, ids_jogos):
+    """Lê os placares de vários jogos com dois get_many, sem tocar nos votos"""
+    chaves_times = {id_jogo: chave_times(id_jogo) for id_jogo in ids_jogos}
+    marcas = {id_jogo: chave_placar_fragmentado(id_jogo) for id_jogo in ids_jogos}
+    listas = cliente.get_many(list(chaves_times.values()) + list(marcas.values()))
+
+    times_por_jogo = {}
+    for id_jogo, chave in chaves_times.items():
+        linhas = listas[chave].decode("utf-8").splitlines() if chave in listas else []
+        times_por_jogo[id_jogo] = [json.loads(linha) for linha in linhas]
+
+    fragmentos = {
+        id_jogo: [None] + (list(range(quentes.fragmentos)) if marcas[id_jogo] in listas else [])
+        for id_jogo in ids_jogos
+    }
+    chaves_placar = [
+        chave_placar(id_jogo, time, fragmento)
+        for id_jogo, times in times_por_jogo.items()
+        for time in times
+        for fragmento in fragmentos[id_jogo]
+    ]
+    contadores = cliente.get_many(chaves_placar) if chaves_placar else {}
+
+    placares = []
+    for id_jogo, times in times_por_jogo.items():
+        placar = {
+            time: sum(
+                int(contadores.get(chave_placar(id_jogo, time, fragmento), 0))
+                for fragmento in fragmentos[id_jogo]
+            )
+            for time in times
+        }
+        placares.append({"id_jogo": id_jogo, "placar": placar, "total": sum(placar.values())})
+    return placares
 
 
 @servico.get("/")
@@ -67,69 +304,307 @@ def is_alive():
 
 @servico.post("/votacao/<id_jogo>")
 def adicionar_voto(id_jogo):
-    """Adiciona voto a um jogo"""
-    sucesso = False
+    """Adiciona voto a um jogo
+
+    Um voto por autor: 201 para o primeiro voto ou troca de time e 200 se
+    o autor repetiu o voto atual (nada é gravado); sem autor ou voto, 422.
+    Jogos desconhecidos são recusados (404) pelo registro em memória; 503
+    enquanto o registro ainda está sendo carregado. Na ingestão em lote,
+    202 ao entrar na fila, 429 com a fila cheia e 503 no encerramento.
+    """
+    if not registro.pronto.is_set():
+        return Response(status=503)
+    if not registro.conhece_ou_atualiza(id_jogo):
+        return Response(status=404)
+
     novo_voto = request.get_json()
+    quentes.registrar(id_jogo)
+    if not voto_valido(novo_voto):
+        return Response(status=422)
+
+    if ingestao is not None:
+        return aceitar_em_lote(id_jogo, novo_voto)
+
+    status = 422
+
+    try:
+        entradas = gravar_lote(id_jogo, [novo_voto])
+        if entradas:
+            log.amostra("Adicionado ao jogo", id_jogo=id_jogo, seq=entradas[0][0])
+        status = 201 if entradas else 200
+
+    except GravacaoParcial as e:
+        # Já no índice do autor, o voto está aplicado (repeti-lo daria 200)
+        log.erro("Erro ao adicionar", erro=str(e.__cause__))
+        status = 422 if e.pendentes else 201
+
+    except Exception as e:
+        log.erro("Erro ao adicionar", erro=str(e))
+
+    return Response(status=status)
 
+
+def aceitar_em_lote(id_jogo, item):
+    if ingestao.enfileirar(id_jogo, item):
+        return Response(status=202)
+    # Recusado: fila cheia (429) ou serviço encerrando (503)
+    return Response(status=429 if ingestao.aceitando else 503, headers={"Retry-After": "1"})
+
+
+@servico.post("/votacao/_bulk")
+def importar_votos():
+    """Importa em massa itens de vários jogos: [{"id_jogo": 1, ...}, ...]
+
+    Os itens são agrupados por jogo e cada jogo recebe uma única reserva de
+    sequência e um append por página, em vez de uma requisição por item.
+    Votos repetidos do mesmo autor não entram; `aceitos` conta os gravados
+    e `pendentes` os que falharam (422). Reenviar a importação é seguro: os
+    votos já aplicados voltam como repetidos.
+    """
     try:
-        cliente = base.Client((MEMCACHED_HOST, MEMCACHED_PORT))
-        votacao_bytes = cliente.get(f"votacao_{id_jogo}")
-        votacao = []
-        if votacao_bytes:
-            votacao = json.loads(votacao_bytes.decode("utf-8"))
+        grupos = agrupar_por_jogo(request.get_json())
+        if not all(voto_valido(voto) for itens in grupos.values() for voto in itens):
+            raise ValueError("Cada voto precisa de autor e voto")
+    except (TypeError, ValueError) as e:
+        log.erro("Importação inválida", erro=str(e))
+        return Response(status=400)
+
+    sucesso, total_itens, aceitos, pendentes = False, sum(map(len, grupos.values())), 0, 0
+
+    try:
+        for id_jogo, itens in grupos.items():
+            try:
+                aceitos += len(gravar_lote(id_jogo, itens))
+            except GravacaoParcial as e:
+                aceitos += len(e.gravados)
+                pendentes += len(e.pendentes)
+                log.erro("Jogo importado em parte", id_jogo=id_jogo, pendentes=len(e.pendentes), erro=str(e.__cause__))
+
+        log.info("Importação concluída", itens=total_itens, aceitos=aceitos, pendentes=pendentes, jogos=len(grupos))
+        sucesso = pendentes == 0
+
+    except Exception as e:
+        log.erro("Erro ao importar", erro=str(e))
+
+    return Response(
+        json.dumps({"itens": total_itens, "aceitos": aceitos, "pendentes": pendentes, "jogos": len(grupos)}),
+        status=201 if sucesso else 422,
+        mimetype="application/json",
+    )
 
-        votacao.append(novo_voto)
-        cliente.set(f"votacao_{id_jogo}", json.dumps(votacao))
-        cliente.close()
 
-        print(f"[VOTACAO] Adicionado ao jogo {id_jogo}: {novo_voto}")
+@servico.get("/votacao")
+def get_votacao_varios():
+    """Votos de vários jogos de uma vez: /votacao?ids=1,2,3[&limit=N]
+
+    Dois get_many no total (contadores e páginas), em vez de uma requisição
+    por jogo. Com `limit`, só os últimos N de cada jogo; `total` traz a
+    quantidade completa.
+    """
+    ids_jogos = [id_jogo for id_jogo in request.args.get("ids", "").split(",") if id_jogo]
+    limite = request.args.get("limit", type=int)
+    if (
+        not ids_jogos
+        or len(ids_jogos) > LIMITE_IDS
+        or ("limit" in request.args and (limite is None or not 1 <= limite <= LIMITE_VOTOS_POR_JOGO))
+    ):
+        return Response(status=400)
+
+    sucesso, resultado = False, []
+
+    try:
+        cliente = get_cliente()
+        logs = log_votacao.ler_varios(cliente, list(dict.fromkeys(ids_jogos)), limite)
+        resultado = [
+            {"id_jogo": id_jogo, "total": total, "votos": [item for _, item in entradas]}
+            for id_jogo, (total, entradas) in logs.items()
+        ]
         sucesso = True
 
     except Exception as e:
-        print(f"[VOTACAO] Erro ao adicionar: {str(e)}")
+        log.erro("Erro ao buscar vários jogos", erro=str(e))
 
-    return Response(status=201 if sucesso else 422)
+    return Response(
+        json.dumps(resultado if sucesso else []),
+        status=200 if sucesso else 500,
+        mimetype="application/json",
+    )
 
 
 @servico.get("/votacao/<id_jogo>")
 def get_votacao(id_jogo):
-    """Busca votação de um jogo"""
-    sucesso, votacao = False, []
+    """Busca votação de um jogo (em cache até chegar um voto novo)"""
+    quentes.registrar(id_jogo)
+
+    def gerar():
+        sucesso, votacao = False, []
+
+        try:
+            cliente = get_cliente()
+            votacao = log_votacao.ler(cliente, id_jogo)
+            sucesso = True
+
+        except Exception as e:
+            log.erro("Erro ao buscar", erro=str(e))
+
+        return Response(
+            json.dumps(votacao if sucesso else []),
+            status=200 if sucesso else 500,
+            mimetype="application/json",
+        )
+
+    return responder(cache, id_jogo, gerar, quentes.tolerancia(id_jogo))
+
+
+@servico.get("/votacao/<id_jogo>/placar")
+def get_placar(id_jogo):
+    """Placar agregado de um jogo (custo constante, independente do nº de votos)"""
+    quentes.registrar(id_jogo)
+
+    def gerar():
+        sucesso, placar = False, {"id_jogo": id_jogo, "placar": {}, "total": 0}
+
+        try:
+            cliente = get_cliente()
+            placar = ler_placares(cliente, [id_jogo])[0]
+            sucesso = True
+
+        except Exception as e:
+            log.erro("Erro ao buscar placar", erro=str(e))
+
+        return Response(
+            json.dumps(placar),
+            status=200 if sucesso else 500,
+            mimetype="application/json",
+        )
+
+    return responder(cache, id_jogo, gerar, quentes.tolerancia(id_jogo))
+
+
+@servico.get("/votacao/placar")
+def get_placares():
+    """Placares de vários jogos de uma vez: /votacao/placar?ids=1,2,3"""
+    ids_jogos = [id_jogo for id_jogo in request.args.get("ids", "").split(",") if id_jogo]
+    if not ids_jogos or len(ids_jogos) > LIMITE_IDS_PLACAR:
+        return Response(status=400)
+
+    sucesso, placares = False, []
 
     try:
-        cliente = base.Client((MEMCACHED_HOST, MEMCACHED_PORT))
-        votacao_bytes = cliente.get(f"votacao_{id_jogo}")
-        if votacao_bytes:
-            votacao = json.loads(votacao_bytes.decode("utf-8"))
-        cliente.close()
+        cliente = get_cliente()
+        placares = ler_placares(cliente, list(dict.fromkeys(ids_jogos)))
         sucesso = True
 
     except Exception as e:
-        print(f"[VOTACAO] Erro ao buscar: {str(e)}")
+        log.erro("Erro ao buscar placares", erro=str(e))
 
     return Response(
-        json.dumps(votacao if sucesso else []),
+        json.dumps(placares if sucesso else []),
         status=200 if sucesso else 500,
         mimetype="application/json",
     )
 
 
+@servico.get("/votacao/<id_jogo>/stream")
+def stream_votacao(id_jogo):
+    """Stream SSE com votos novos e o placar atualizado do jogo
+
+    Envia o placar ao conectar e depois cada voto (id = seq). O placar é
+    relido dos contadores no máximo a cada INTERVALO_PLACAR enquanto houver
+    votos novos, então rajadas de votos geram um único placar.
+    Last-Event-ID (ou `since`) recupera os votos perdidos do log. Acima de
+    LIMITE_STREAMS streams no processo, 503 com Retry-After.
+    """
+    ultimo = request.headers.get("Last-Event-ID", type=int)
+    if ultimo is None:
+        ultimo = request.args.get("since", type=int)
+
+    # Assina antes de ler o log para não perder nada entre as duas etapas
+    fila = barramento.assinar(id_jogo)
+    if fila is None:
+        log.amostra("Stream recusado, limite do processo atingido", id_jogo=id_jogo)
+        return Response(status=503, headers={"Retry-After": "5"})
+
+    def gerar(ultimo):
+        try:
+            yield formatar_sse("placar", ler_placares(get_cliente(), [id_jogo])[0])
+
+            while ultimo is not None:
+                entradas = log_votacao.ler_janela(get_cliente(), id_jogo, LIMITE_REPLAY, depois=ultimo)
+                for seq, voto in entradas:
+                    yield formatar_sse("voto", voto, seq)
+                    ultimo = seq
+                if len(entradas) < LIMITE_REPLAY:
+                    break
+
+            placar_pendente, proximo_placar = False, monotonic()
+
+            def espera():
+                if placar_pendente:
+                    return max(0, proximo_placar - monotonic())
+                return INTERVALO_HEARTBEAT
+
+            for evento in acompanhar(fila, espera):
+                if evento is None and not placar_pendente:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if evento is not None:
+                    seq, voto = evento
+                    if ultimo is None or seq > ultimo:
+                        yield formatar_sse("voto", voto, seq)
+                        placar_pendente = True
+
+                if placar_pendente and monotonic() >= proximo_placar:
+                    yield formatar_sse("placar", ler_placares(get_cliente(), [id_jogo])[0])
+                    placar_pendente, proximo_placar = False, monotonic() + INTERVALO_PLACAR
+        finally:
+            barramento.cancelar(id_jogo, fila)
+
+    return Response(
+        gerar(ultimo),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def iniciar_tarefas():
+    """Inicia as threads de background do processo (consumidores de eventos)
+
+    Chamado pelo __main__ e, no modo de produção, pelo hook
+    post_worker_init do gunicorn em cada worker.
+    """
+    # Memcached vazio (reiniciado) é reidratado do arquivo antes de tudo
+    if persistencia is not None:
+        persistencia.iniciar(get_cliente)
+
+    # Flusher da ingestão em lote (grava o que foi aceito ao encerrar)
+    if ingestao is not None:
+        ingestao.iniciar()
+
+    # Carrega o registro de jogos (snapshot + diário) e o mantém atualizado
+    registro.start()
+    atexit.register(registro.parar)
+
+    # Push, idempotente por message_id; workers e réplicas dividem a fila
+    consumidor = ConsumidorEventos(
+        "VOTACAO", EXCHANGE_EVENTOS, FILA_EVENTOS, processar_evento_jogo, get_cliente
+    )
+    consumidor.start()
+    atexit.register(consumidor.parar)
+
+    # Novidades das outras réplicas: fila exclusiva por processo
+    novidades.iniciar()
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print(f"Iniciando {INFO['descricao']}")
     print(f"Versão: {INFO['versao']}")
     print("=" * 60)
 
-    # Inicia agendador para processar eventos em background
-    agendador = APScheduler()
-    agendador.init_app(servico)
-    agendador.add_job(
-        id="processar_eventos_jogos",
-        func=processar_eventos_jogos,
-        trigger="interval",
-        seconds=3
-    )
-    agendador.start()
+    iniciar_tarefas()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
 
-    # Inicia Flask
+    # Inicia Flask (servidor de desenvolvimento; produção usa gunicorn)
     servico.run(host="0.0.0.0", port=5000, debug=True, use_reloader=False)
@@ -0,0 +1,159 @@
+"""
+Teste de carga HTTP - Requisições por segundo e latência dos três serviços
+Roda cenários de leitura, escrita ou mistos com concorrência fixa
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+from time import perf_counter, sleep
+
+import requests
+
+JOGOS_URL = os.getenv("JOGOS_URL", "http://localhost:5001")
+COMENTARIOS_URL = os.getenv("COMENTARIOS_URL", "http://localhost:5002")
+VOTACAO_URL = os.getenv("VOTACAO_URL", "http://localhost:5003")
+
+# Jogos usados pela carga, numa faixa de ids separada dos dados reais
+JOGOS_CARGA = 20
+BASE_IDS_CARGA = 900000
+IDS_CARGA = list(range(BASE_IDS_CARGA + 1, BASE_IDS_CARGA + JOGOS_CARGA + 1))
+
+
+def ler_jogos(sessao, _):
+    return sessao.get(f"{JOGOS_URL}/jogos")
+
+
+def ler_comentarios(sessao, id_jogo):
+    return sessao.get(f"{COMENTARIOS_URL}/comentarios/{id_jogo}")
+
+
+def ler_votacao(sessao, id_jogo):
+    return sessao.get(f"{VOTACAO_URL}/votacao/{id_jogo}")
+
+
+def comentar(sessao, id_jogo):
+    payload = {"autor": "carga", "comentario": "Que jogo!"}
+    return sessao.post(f"{COMENTARIOS_URL}/comentarios/{id_jogo}", json=payload)
+
+
+def votar(sessao, id_jogo):
+    payload = {"autor": "carga", "voto": random.choice(["Bahia", "Vitoria"])}
+    return sessao.post(f"{VOTACAO_URL}/votacao/{id_jogo}", json=payload)
+
+
+CENARIOS = {
+    "leitura": [ler_jogos, ler_comentarios, ler_votacao],
+    "escrita": [comentar, votar],
+    "misto": [ler_jogos, ler_comentarios, ler_votacao, ler_comentarios, comentar, votar],
+}
+
+
+def preparar_jogos(espera=3):
+    """Registra os jogos da carga (escritas em jogo desconhecido dão 404)"""
+    jogos = [
+        {"id_jogo": id_jogo, "time1": "Bahia", "time2": "Vitoria", "data": "2025-11-01"}
+        for id_jogo in IDS_CARGA
+    ]
+    requests.post(f"{JOGOS_URL}/jogos", json=jogos).raise_for_status()
+    sleep(espera)
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def executar(cenario, concorrencia, duracao):
+    """Cada thread usa sua própria sessão keep-alive até o tempo acabar"""
+    operacoes = CENARIOS[cenario]
+    latencias, erros = [], [0]
+    lock = threading.Lock()
+    fim = perf_counter() + duracao
+
+    def trabalhador():
+        locais, falhas = [], 0
+        with requests.Session() as sessao:
+            while perf_counter() < fim:
+                operacao = random.choice(operacoes)
+                inicio = perf_counter()
+                try:
+                    response = operacao(sessao, random.choice(IDS_CARGA))
+                    if response.status_code >= 400:
+                        falhas += 1
+                except requests.RequestException:
+                    falhas += 1
+                locais.append(perf_counter() - inicio)
+        with lock:
+            latencias.extend(locais)
+            erros[0] += falhas
+
+    threads = [threading.Thread(target=trabalhador) for _ in range(concorrencia)]
+    inicio = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = perf_counter() - inicio
+
+    latencias_ms = [latencia * 1000 for latencia in latencias]
+    resultado = {
+        "cenario": cenario,
+        "concorrencia": concorrencia,
+        "requisicoes": len(latencias),
+        "erros": erros[0],
+        "rps": len(latencias) / total,
+        "p50_ms": percentil(latencias_ms, 50),
+        "p99_ms": percentil(latencias_ms, 99),
+    }
+    print(
+        f"[{cenario:<8}] {resultado['rps']:8.0f} req/s │ "
+        f"p50={resultado['p50_ms']:7.1f} ms p99={resultado['p99_ms']:7.1f} ms │ "
+        f"erros={resultado['erros']}"
+    )
+    return resultado
+
+
+def comparar(caminho):
+    """Tabela por cenário com cada rótulo gravado em `caminho` (JSON lines)"""
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        resultados = [json.loads(linha) for linha in arquivo if linha.strip()]
+
+    base = {}
+    for resultado in resultados:
+        chave = (resultado["cenario"], resultado["concorrencia"])
+        referencia = base.setdefault(chave, resultado)
+        ganho = resultado["rps"] / referencia["rps"] if referencia["rps"] else 0
+        print(
+            f"[{resultado['cenario']:<8} c={resultado['concorrencia']:<3}] {resultado['rotulo']:<12} "
+            f"{resultado['rps']:8.0f} req/s ({ganho:4.1f}x) │ "
+            f"p50={resultado['p50_ms']:7.1f} ms p99={resultado['p99_ms']:7.1f} ms │ "
+            f"erros={resultado['erros']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Carga HTTP nos serviços (compare execuções antes/depois de uma mudança)"
+    )
+    parser.add_argument("--cenario", choices=[*CENARIOS, "todos"], default="todos")
+    parser.add_argument("--concorrencia", type=int, default=16, help="Clientes simultâneos (padrão: 16)")
+    parser.add_argument("--duracao", type=float, default=20, help="Segundos por cenário (padrão: 20)")
+    parser.add_argument("--rotulo", default="", help="Nome da execução gravado com os resultados (ex.: dev, gunicorn)")
+    parser.add_argument("--saida", help="Acrescenta os resultados a este arquivo JSON lines")
+    parser.add_argument("--comparar", metavar="ARQUIVO", help="Só compara execuções já gravadas com --saida")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(args.comparar)
+        raise SystemExit(0)
+
+    preparar_jogos()
+    cenarios = list(CENARIOS) if args.cenario == "todos" else [args.cenario]
+    for cenario in cenarios:
+        resultado = executar(cenario, args.concorrencia, args.duracao)
+        if args.saida:
+            with open(args.saida, "a", encoding="utf-8") as arquivo:
+                arquivo.write(json.dumps({"rotulo": args.rotulo, **resultado}) + "\n")
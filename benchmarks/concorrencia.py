@@ -0,0 +1,99 @@
+"""
+Teste de estresse de concorrência - Comentários e Votação
+Dispara escritas simultâneas no mesmo jogo e confere se nenhuma foi perdida
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, sleep, time
+
+import requests
+
+JOGOS_URL = os.getenv("JOGOS_URL", "http://localhost:5001")
+COMENTARIOS_URL = os.getenv("COMENTARIOS_URL", "http://localhost:5002")
+VOTACAO_URL = os.getenv("VOTACAO_URL", "http://localhost:5003")
+
+# Com a ingestão em lote (202), espera o flusher antes de conferir
+ESPERA_LOTE = 0.5
+
+
+def escrever(url, id_jogo, campo, autor, quantidade):
+    """Envia `quantidade` itens de um mesmo autor reaproveitando a conexão"""
+    falhas = 0
+    with requests.Session() as sessao:
+        for i in range(quantidade):
+            payload = {"autor": autor, campo: f"{autor}-{i}"}
+            response = sessao.post(f"{url}/{id_jogo}", json=payload)
+            if response.status_code not in (201, 202):
+                falhas += 1
+    return falhas
+
+
+def criar_jogo():
+    """Registra um jogo novo no serviço de jogos e devolve seu id"""
+    id_jogo = int(time() * 1000)
+    jogo = {"id_jogo": id_jogo, "time1": "Estresse", "time2": "Concorrência", "data": "2025-11-01"}
+    requests.post(f"{JOGOS_URL}/jogos", json=[jogo]).raise_for_status()
+    return id_jogo
+
+
+def aguardar_jogo(url, id_jogo, campo, timeout=30):
+    """Espera o evento do jogo chegar ao serviço (escrita de sonda aceita)"""
+    limite = perf_counter() + timeout
+    while perf_counter() < limite:
+        response = requests.post(f"{url}/{id_jogo}", json={"autor": "sonda", campo: "sonda"})
+        if response.status_code in (201, 202):
+            return
+        sleep(0.05)
+    raise RuntimeError(f"Jogo {id_jogo} não chegou a {url} em {timeout}s")
+
+
+def estressar(nome, url, campo, threads, por_thread, placar=False):
+    """Escreve concorrentemente em um jogo novo e compara o esperado com o lido
+
+    Com `placar`, confere também o placar: cada autor troca de voto a cada
+    escrita, então o total é um voto por autor (mais o da sonda).
+    """
+    id_jogo = criar_jogo()
+    aguardar_jogo(url, id_jogo, campo)
+    esperado = threads * por_thread
+
+    inicio = perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futuros = [
+            executor.submit(escrever, url, id_jogo, campo, f"autor{t}", por_thread)
+            for t in range(threads)
+        ]
+        falhas = sum(futuro.result() for futuro in futuros)
+    duracao = perf_counter() - inicio
+    sleep(ESPERA_LOTE)
+
+    itens = [item for item in requests.get(f"{url}/{id_jogo}").json() if item["autor"] != "sonda"]
+    valores = {item[campo] for item in itens}
+    perdidos = esperado - falhas - len(valores)
+
+    print(f"[{nome}] jogo={id_jogo} threads={threads} escritas={esperado}")
+    print(f"[{nome}] {esperado / duracao:.0f} escritas/s, falhas HTTP={falhas}")
+    print(f"[{nome}] lidos={len(itens)} distintos={len(valores)} perdidos={perdidos}")
+    ok = perdidos == 0 and len(itens) == len(valores)
+    if placar:
+        total = requests.get(f"{url}/{id_jogo}/placar").json()["total"]
+        print(f"[{nome}] placar total={total} autores={threads + 1}")
+        ok = ok and total == threads + 1
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Estresse de escritas concorrentes em comentários e votação"
+    )
+    parser.add_argument("--threads", type=int, default=32, help="Escritores simultâneos (padrão: 32)")
+    parser.add_argument("--por-thread", type=int, default=50, help="Escritas por escritor (padrão: 50)")
+    args = parser.parse_args()
+
+    ok = estressar("COMENTARIOS", f"{COMENTARIOS_URL}/comentarios", "comentario", args.threads, args.por_thread)
+    ok = estressar("VOTACAO", f"{VOTACAO_URL}/votacao", "voto", args.threads, args.por_thread, placar=True) and ok
+
+    print("✓ Nenhuma escrita perdida" if ok else "✗ Escritas perdidas ou duplicadas")
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,127 @@
+"""
+Benchmark de consumo de eventos - Polling (basic_get) vs Push (basic_consume)
+Mede latência ponta a ponta e vazão de mensagens em uma fila temporária
+"""
+
+import argparse
+import json
+import os
+import statistics
+import threading
+from time import perf_counter, sleep, time
+
+import pika
+
+RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "localhost")
+
+
+def conectar():
+    credentials = pika.PlainCredentials('admin', 'admin')
+    return pika.BlockingConnection(
+        pika.ConnectionParameters(host=RABBITMQ_HOST, credentials=credentials)
+    )
+
+
+def publicar(fila, total, taxa):
+    """Publica `total` eventos a `taxa` msg/s com o instante de envio no corpo"""
+    connection = conectar()
+    channel = connection.channel()
+    channel.queue_declare(queue=fila, durable=True)
+    intervalo = 1 / taxa if taxa else 0
+    for i in range(total):
+        evento = {"id_jogo": i, "time1": "A", "time2": "B", "enviado_em": time()}
+        channel.basic_publish(
+            exchange="",
+            routing_key=fila,
+            body=json.dumps(evento),
+            properties=pika.BasicProperties(delivery_mode=2)
+        )
+        if intervalo:
+            sleep(intervalo)
+    connection.close()
+
+
+def consumir_polling(fila, total, intervalo):
+    """Reproduz o modelo antigo: nova conexão + basic_get a cada `intervalo`"""
+    latencias = []
+    while len(latencias) < total:
+        connection = conectar()
+        channel = connection.channel()
+        channel.queue_declare(queue=fila, durable=True)
+        method_frame, _, body = channel.basic_get(queue=fila)
+        while method_frame:
+            latencias.append(time() - json.loads(body)["enviado_em"])
+            channel.basic_ack(method_frame.delivery_tag)
+            method_frame, _, body = channel.basic_get(queue=fila)
+        connection.close()
+        if len(latencias) < total:
+            sleep(intervalo)
+    return latencias
+
+
+def consumir_push(fila, total, prefetch_count):
+    """Modelo novo: conexão persistente com basic_consume e prefetch"""
+    latencias = []
+    connection = conectar()
+    channel = connection.channel()
+    channel.queue_declare(queue=fila, durable=True)
+    channel.basic_qos(prefetch_count=prefetch_count)
+
+    def ao_receber(channel, method, properties, body):
+        latencias.append(time() - json.loads(body)["enviado_em"])
+        channel.basic_ack(method.delivery_tag)
+        if len(latencias) >= total:
+            channel.stop_consuming()
+
+    channel.basic_consume(queue=fila, on_message_callback=ao_receber)
+    channel.start_consuming()
+    connection.close()
+    return latencias
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def executar(modo, args):
+    fila = f"benchmark_consumo_{modo}"
+    connection = conectar()
+    connection.channel().queue_delete(queue=fila)
+    connection.close()
+
+    resultado = {}
+
+    def consumir():
+        if modo == "polling":
+            resultado["latencias"] = consumir_polling(fila, args.mensagens, args.intervalo)
+        else:
+            resultado["latencias"] = consumir_push(fila, args.mensagens, args.prefetch)
+
+    consumidor = threading.Thread(target=consumir)
+    inicio = perf_counter()
+    consumidor.start()
+    publicar(fila, args.mensagens, args.taxa)
+    consumidor.join()
+    duracao = perf_counter() - inicio
+
+    latencias = [latencia * 1000 for latencia in resultado["latencias"]]
+    print(
+        f"[{modo.upper():<7}] {args.mensagens / duracao:8.0f} msg/s │ "
+        f"latência ms p50={statistics.median(latencias):8.1f} "
+        f"p95={percentil(latencias, 95):8.1f} p99={percentil(latencias, 99):8.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compara polling com basic_get e consumo push com basic_consume"
+    )
+    parser.add_argument("--mensagens", type=int, default=2000, help="Eventos por modo (padrão: 2000)")
+    parser.add_argument("--taxa", type=int, default=500, help="Eventos/s publicados, 0 = sem limite (padrão: 500)")
+    parser.add_argument("--intervalo", type=float, default=3, help="Intervalo do polling em s (padrão: 3)")
+    parser.add_argument("--prefetch", type=int, default=50, help="prefetch_count do modo push (padrão: 50)")
+    args = parser.parse_args()
+
+    for modo in ("polling", "push"):
+        executar(modo, args)
@@ -0,0 +1,76 @@
+"""
+Benchmark de estado estável - Eventos publicados por reenvio do mesmo arquivo
+Reenvia o mesmo lote de jogos várias vezes e conta as mensagens no exchange
+"""
+
+import argparse
+import json
+import os
+from time import perf_counter, sleep, time
+
+import pika
+import requests
+
+JOGOS_URL = os.getenv("JOGOS_URL", "http://localhost:5001")
+RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "localhost")
+EXCHANGE_EVENTOS = os.getenv("EXCHANGE_EVENTOS", "jogos_eventos")
+
+
+def abrir_espiao():
+    """Fila exclusiva ligada ao fanout: recebe uma cópia de cada evento"""
+    credentials = pika.PlainCredentials('admin', 'admin')
+    connection = pika.BlockingConnection(
+        pika.ConnectionParameters(host=RABBITMQ_HOST, credentials=credentials)
+    )
+    channel = connection.channel()
+    channel.exchange_declare(exchange=EXCHANGE_EVENTOS, exchange_type="fanout", durable=True)
+    fila = channel.queue_declare(queue="", exclusive=True).method.queue
+    channel.queue_bind(queue=fila, exchange=EXCHANGE_EVENTOS)
+    return connection, channel, fila
+
+
+def contar_mensagens(channel, fila, espera):
+    """Drena a fila espiã depois de `espera` segundos de relay"""
+    sleep(espera)
+    total = 0
+    method_frame, _, _ = channel.basic_get(queue=fila, auto_ack=True)
+    while method_frame:
+        total += 1
+        method_frame, _, _ = channel.basic_get(queue=fila, auto_ack=True)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mostra que reenviar jogos já conhecidos não gera eventos"
+    )
+    parser.add_argument("--jogos", type=int, default=1000, help="Jogos no lote (padrão: 1000)")
+    parser.add_argument("--passadas", type=int, default=5, help="Reenvios do mesmo lote (padrão: 5)")
+    parser.add_argument("--espera", type=float, default=3, help="Segundos para o relay drenar (padrão: 3)")
+    args = parser.parse_args()
+
+    # Ids novos a cada execução para a primeira passada publicar o lote todo
+    base = int(time()) * 100000
+    jogos = [
+        {"id_jogo": base + i, "time1": "Bahia", "time2": "Vitoria", "data": "2025-11-01"}
+        for i in range(args.jogos)
+    ]
+
+    connection, channel, fila = abrir_espiao()
+    resultados = []
+    for passada in range(1, args.passadas + 1):
+        inicio = perf_counter()
+        response = requests.post(f"{JOGOS_URL}/jogos", data=json.dumps(jogos),
+                                 headers={"Content-Type": "application/json"})
+        duracao = perf_counter() - inicio
+        mensagens = contar_mensagens(channel, fila, args.espera)
+        resultados.append(mensagens)
+        print(
+            f"[PASSADA {passada}] HTTP {response.status_code} em {duracao * 1000:7.1f} ms │ "
+            f"eventos publicados: {mensagens} ({mensagens / (duracao + args.espera):.0f} msg/s)"
+        )
+    connection.close()
+
+    estavel = all(mensagens == 0 for mensagens in resultados[1:])
+    print("✓ Estado estável sem eventos redundantes" if estavel else "✗ Reenvio gerou eventos")
+    raise SystemExit(0 if estavel else 1)
@@ -0,0 +1,210 @@
+"""
+Benchmark de distribuição - Vazão do log paginado com 1, 2, 4... nós Memcached
+Sobe nós locais (memcached, se instalado, ou um substituto em Python com capacidade fixa)
+e mede operações/s e a fração de chaves movidas a cada nó incluído
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, sleep
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from comum.anel import AnelConsistente  # noqa: E402
+from comum.armazenamento import LogPaginado, configurar, get_cliente  # noqa: E402
+
+
+class NoSubstituto(socketserver.StreamRequestHandler):
+    """Protocolo de texto do Memcached (o que o pymemcache usa aqui)
+
+    Cada comando ocupa o nó por `custo` segundos sob um lock global, então
+    a capacidade do nó é fixa (~1/custo comandos/s), como um nó saturado.
+    """
+
+    dados = {}
+    lock = threading.Lock()
+    custo = 0.0
+
+    def handle(self):
+        while True:
+            linha = self.rfile.readline()
+            if not linha:
+                return
+            partes = linha.split()
+            if not partes:
+                continue
+            comando, argumentos = partes[0].decode(), partes[1:]
+            bloco = None
+            if comando in ("set", "add", "append"):
+                bloco = self.rfile.read(int(argumentos[3]) + 2)[:-2]
+            with self.lock:
+                if self.custo:
+                    sleep(self.custo)
+                resposta = self.executar(comando, argumentos, bloco)
+            if argumentos and argumentos[-1] == b"noreply":
+                continue
+            self.wfile.write(resposta)
+
+    def executar(self, comando, argumentos, bloco):
+        dados = self.dados
+        if comando in ("get", "gets"):
+            saida = []
+            for chave in argumentos:
+                if chave in dados:
+                    flags, valor = dados[chave]
+                    saida.append(b"VALUE %s %s %d\r\n%s\r\n" % (chave, flags, len(valor), valor))
+            return b"".join(saida) + b"END\r\n"
+        if comando in ("set", "add", "append"):
+            chave, flags = argumentos[0], argumentos[1]
+            if comando == "add" and chave in dados:
+                return b"NOT_STORED\r\n"
+            if comando == "append":
+                if chave not in dados:
+                    return b"NOT_STORED\r\n"
+                flags, bloco = dados[chave][0], dados[chave][1] + bloco
+            dados[chave] = (flags, bloco)
+            return b"STORED\r\n"
+        if comando in ("incr", "decr"):
+            chave = argumentos[0]
+            if chave not in dados:
+                return b"NOT_FOUND\r\n"
+            delta = int(argumentos[1]) * (1 if comando == "incr" else -1)
+            valor = str(max(0, int(dados[chave][1]) + delta)).encode()
+            dados[chave] = (dados[chave][0], valor)
+            return valor + b"\r\n"
+        if comando == "delete":
+            return b"DELETED\r\n" if dados.pop(argumentos[0], None) else b"NOT_FOUND\r\n"
+        if comando == "touch":
+            return b"TOUCHED\r\n" if argumentos[0] in dados else b"NOT_FOUND\r\n"
+        return b"ERROR\r\n"
+
+
+class ServidorSubstituto(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def servir_substituto(porta, custo):
+    NoSubstituto.custo = custo
+    ServidorSubstituto(("127.0.0.1", porta), NoSubstituto).serve_forever()
+
+
+def aguardar_porta(porta, timeout=10):
+    limite = perf_counter() + timeout
+    while perf_counter() < limite:
+        try:
+            socket.create_connection(("127.0.0.1", porta), timeout=0.2).close()
+            return
+        except OSError:
+            sleep(0.05)
+    raise RuntimeError(f"Nó na porta {porta} não respondeu em {timeout}s")
+
+
+def subir_nos(quantidade, porta_base, custo, binario):
+    """Inicia os nós locais e devolve (nos, processos)"""
+    nos, processos = [], []
+    for i in range(quantidade):
+        porta = porta_base + i
+        if binario:
+            processo = subprocess.Popen([binario, "-p", str(porta), "-t", "1", "-U", "0", "-l", "127.0.0.1"])
+        else:
+            processo = multiprocessing.Process(target=servir_substituto, args=(porta, custo), daemon=True)
+            processo.start()
+        aguardar_porta(porta)
+        nos.append(("127.0.0.1", porta))
+        processos.append(processo)
+    return nos, processos
+
+
+def fracao_movida(nos, chaves):
+    """Fração das chaves cujo nó primário muda ao incluir o último nó"""
+    antes, depois = AnelConsistente(nos[:-1]), AnelConsistente(nos)
+    return sum(antes.nos_para(chave) != depois.nos_para(chave) for chave in chaves) / len(chaves)
+
+
+def medir(nos, replicas, threads, duracao, jogos, fracao_leitura):
+    """Comentários e leituras da janela recente em jogos aleatórios"""
+    configurar(nos=nos, replicas=replicas)
+    log = LogPaginado("comentarios")
+    cliente = get_cliente()
+    parar = threading.Event()
+
+    def trabalhar(semente):
+        aleatorio = random.Random(semente)
+        latencias = []
+        while not parar.is_set():
+            id_jogo = aleatorio.randrange(jogos)
+            inicio = perf_counter()
+            if aleatorio.random() < fracao_leitura:
+                log.ler_janela(cliente, id_jogo, 20)
+            else:
+                log.adicionar(cliente, id_jogo, {"autor": f"torcedor{semente}", "comentario": "Vamos!"})
+            latencias.append(perf_counter() - inicio)
+        return latencias
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futuros = [executor.submit(trabalhar, semente) for semente in range(threads)]
+        sleep(duracao)
+        parar.set()
+        latencias = sorted(latencia for futuro in futuros for latencia in futuro.result())
+
+    def percentil(p):
+        return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000
+
+    return len(latencias) / duracao, percentil(0.5), percentil(0.99)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Vazão do armazenamento com as chaves distribuídas por 1..N nós Memcached"
+    )
+    parser.add_argument("--nos", default="1,2,4", help="Quantidades de nós a medir (padrão: 1,2,4)")
+    parser.add_argument("--replicas", type=int, default=1, help="Cópias de cada chave (padrão: 1)")
+    parser.add_argument("--threads", type=int, default=64, help="Threads de carga (padrão: 64)")
+    parser.add_argument("--duracao", type=float, default=10, help="Segundos por medida (padrão: 10)")
+    parser.add_argument("--jogos", type=int, default=2000, help="Jogos distintos (padrão: 2000)")
+    parser.add_argument("--leituras", type=float, default=0.8, help="Fração de leituras (padrão: 0.8)")
+    parser.add_argument("--porta-base", type=int, default=21211, help="Porta do primeiro nó (padrão: 21211)")
+    parser.add_argument(
+        "--custo-no", type=float, default=0.0005,
+        help="Segundos por comando no substituto em Python (padrão: 0.0005, ~2000 comandos/s por nó)",
+    )
+    parser.add_argument(
+        "--memcached", action="store_true",
+        help="Usa o binário memcached do PATH (um processo com uma thread por nó) em vez do substituto",
+    )
+    args = parser.parse_args()
+
+    binario = None
+    if args.memcached:
+        binario = shutil.which("memcached")
+        if binario is None:
+            parser.error("memcached não encontrado no PATH")
+
+    quantidades = sorted(int(n) for n in args.nos.split(","))
+    chaves = [f"comentarios_{id_jogo}" for id_jogo in range(args.jogos)]
+    base = None
+    for quantidade in quantidades:
+        nos, processos = subir_nos(quantidade, args.porta_base, args.custo_no, binario)
+        try:
+            vazao, p50, p99 = medir(nos, args.replicas, args.threads, args.duracao, args.jogos, args.leituras)
+        finally:
+            for processo in processos:
+                processo.terminate()
+            for processo in processos:
+                processo.wait() if binario else processo.join()
+        base = base or vazao
+        movidas = f"{fracao_movida(nos, chaves) * 100:5.1f}%" if quantidade > 1 else "   - "
+        print(
+            f"[{quantidade} nó(s)] {vazao:9.0f} ops/s │ {vazao / base:4.2f}x │ "
+            f"p50 {p50:7.2f} ms │ p99 {p99:7.2f} ms │ chaves movidas ao incluir o último nó {movidas}"
+        )
@@ -0,0 +1,451 @@
+"""
+Harness do pipeline de eventos - Carga ponta a ponta com resultados em JSON
+Roda contra os serviços no ar (http) ou com os três serviços no mesmo processo,
+usando stand-ins locais do Memcached e do RabbitMQ (local)
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import queue
+import random
+import subprocess
+import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+from time import perf_counter, sleep, time
+
+RAIZ = os.path.join(os.path.dirname(__file__), "..")
+
+JOGOS_URL = os.getenv("JOGOS_URL", "http://localhost:5001")
+COMENTARIOS_URL = os.getenv("COMENTARIOS_URL", "http://localhost:5002")
+VOTACAO_URL = os.getenv("VOTACAO_URL", "http://localhost:5003")
+
+TIMES = ["Bahia", "Vitoria", "Flamengo", "Palmeiras"]
+
+
+# --- Stand-ins locais ---
+
+class MemcachedMemoria:
+    """Subconjunto do PooledClient usado pelos serviços, em memória"""
+
+    def __init__(self):
+        self._dados = {}
+        self._versoes = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bytes(valor):
+        return valor if isinstance(valor, bytes) else str(valor).encode("utf-8")
+
+    def get(self, chave):
+        return self._dados.get(chave)
+
+    def gets(self, chave):
+        with self._lock:
+            if chave not in self._dados:
+                return None, None
+            return self._dados[chave], self._versoes.get(chave, 0)
+
+    def cas(self, chave, valor, versao, expire=0, noreply=False):
+        with self._lock:
+            if chave not in self._dados:
+                return None
+            if self._versoes.get(chave, 0) != versao:
+                return False
+            self._dados[chave] = self._bytes(valor)
+            self._versoes[chave] = versao + 1
+            return True
+
+    def get_many(self, chaves):
+        dados = self._dados
+        return {chave: dados[chave] for chave in chaves if chave in dados}
+
+    def set(self, chave, valor, expire=0, noreply=None):
+        self._dados[chave] = self._bytes(valor)
+        self._versoes[chave] = self._versoes.get(chave, 0) + 1
+        return True
+
+    def set_many(self, valores, expire=0, noreply=None):
+        for chave, valor in valores.items():
+            self.set(chave, valor)
+        return []
+
+    def add(self, chave, valor, expire=0, noreply=None):
+        with self._lock:
+            if chave in self._dados:
+                return False
+            self._dados[chave] = self._bytes(valor)
+            self._versoes[chave] = self._versoes.get(chave, 0) + 1
+            return True
+
+    def append(self, chave, valor, expire=0, noreply=None):
+        with self._lock:
+            if chave not in self._dados:
+                return False
+            self._dados[chave] += self._bytes(valor)
+            return True
+
+    def incr(self, chave, valor, noreply=False):
+        with self._lock:
+            if chave not in self._dados:
+                return None
+            novo = int(self._dados[chave]) + int(valor)
+            self._dados[chave] = str(novo).encode("utf-8")
+            return novo
+
+    def decr(self, chave, valor, noreply=False):
+        with self._lock:
+            if chave not in self._dados:
+                return None
+            novo = max(0, int(self._dados[chave]) - int(valor))
+            self._dados[chave] = str(novo).encode("utf-8")
+            return novo
+
+    def delete(self, chave, noreply=None):
+        return self._dados.pop(chave, None) is not None
+
+    def touch(self, chave, expire=0, noreply=None):
+        return chave in self._dados
+
+
+class BrokerMemoria:
+    """Exchanges fanout em memória: cada assinante recebe uma cópia"""
+
+    def __init__(self):
+        self._filas = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def ligar(self, exchange):
+        fila = queue.Queue()
+        with self._lock:
+            self._filas[exchange].append(fila)
+        return fila
+
+    def publicar(self, exchange, corpo, properties):
+        with self._lock:
+            filas = list(self._filas[exchange])
+        for fila in filas:
+            fila.put((corpo, properties))
+
+
+class PublicadorMemoria:
+    """Mesma interface do PoolPublicadores; confirma na hora"""
+
+    def __init__(self, broker, exchange):
+        self.broker = broker
+        self.exchange = exchange
+
+    def publicar(self, corpo, properties=None):
+        self.broker.publicar(self.exchange, corpo, properties)
+        futuro = Future()
+        futuro.set_result(True)
+        return futuro
+
+    def parar(self, timeout=5):
+        pass
+
+
+def carregar_servico(nome):
+    caminho = os.path.join(RAIZ, "app", nome, "servico.py")
+    spec = importlib.util.spec_from_file_location(f"servico_{nome}", caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+class AlvoLocal:
+    """Os três serviços no mesmo processo, chamados pelo test_client do Flask
+
+    O Memcached é um dicionário (ou um servidor real com --memcached) e o
+    RabbitMQ um broker em memória; relay do outbox, registro de jogos e
+    consumidores rodam de verdade, então o atraso medido inclui o outbox.
+    """
+
+    def __init__(self, memcached=None):
+        os.environ["JOGOS_URL"] = ""
+        sys.path[:0] = [os.path.join(RAIZ, "app"), os.path.join(RAIZ, "app", "jogos")]
+
+        from comum import armazenamento
+        from comum.codec import decodificar_mensagem
+
+        self.servicos = {nome: carregar_servico(nome) for nome in ("jogos", "comentarios", "votacao")}
+        if memcached:
+            host, _, porta = memcached.partition(":")
+            armazenamento.configurar(servidor=(host, int(porta or 11211)))
+        else:
+            armazenamento.configurar(cliente=MemcachedMemoria())
+
+        broker = BrokerMemoria()
+        jogos = self.servicos["jogos"]
+        publicador_jogos = PublicadorMemoria(broker, jogos.EXCHANGE_EVENTOS)
+        jogos.relay.get_publicador = lambda: publicador_jogos
+        jogos.relay.start()
+
+        self.chegadas = defaultdict(dict)
+        for nome in ("comentarios", "votacao"):
+            modulo = self.servicos[nome]
+            modulo.novidades._publicador = PublicadorMemoria(broker, modulo.EXCHANGE_NOVIDADES)
+            modulo.registro.start()
+            modulo.registro.pronto.wait(10)
+            fila = broker.ligar(modulo.EXCHANGE_EVENTOS)
+            threading.Thread(
+                target=self._consumir, args=(nome, modulo, fila, decodificar_mensagem), daemon=True
+            ).start()
+
+        self._local = threading.local()
+
+    def _consumir(self, nome, modulo, fila, decodificar_mensagem):
+        while True:
+            corpo, properties = fila.get()
+            jogo = decodificar_mensagem(corpo, properties)
+            modulo.processar_evento_jogo(jogo)
+            self.chegadas[nome][jogo["id_jogo"]] = perf_counter()
+
+    def _cliente(self, servico):
+        clientes = getattr(self._local, "clientes", None)
+        if clientes is None:
+            clientes = self._local.clientes = {}
+        if servico not in clientes:
+            clientes[servico] = self.servicos[servico].servico.test_client()
+        return clientes[servico]
+
+    def chamar(self, metodo, servico, caminho, corpo=None):
+        response = self._cliente(servico).open(caminho, method=metodo, json=corpo)
+        return response.status_code
+
+    def aguardar_chegada(self, servico, id_jogo, limite):
+        while perf_counter() < limite:
+            if id_jogo in self.chegadas[servico]:
+                return self.chegadas[servico][id_jogo]
+            sleep(0.001)
+        return None
+
+
+class AlvoHttp:
+    """Serviços no ar (docker-compose), uma sessão keep-alive por thread
+
+    A chegada de um jogo a um serviço é detectada quando uma escrita de
+    sonda deixa de ser recusada com 404.
+    """
+
+    def __init__(self):
+        import requests
+        self.requests = requests
+        self.urls = {"jogos": JOGOS_URL, "comentarios": COMENTARIOS_URL, "votacao": VOTACAO_URL}
+        self._local = threading.local()
+
+    def _sessao(self):
+        if not hasattr(self._local, "sessao"):
+            self._local.sessao = self.requests.Session()
+        return self._local.sessao
+
+    def chamar(self, metodo, servico, caminho, corpo=None):
+        response = self._sessao().request(metodo, f"{self.urls[servico]}{caminho}", json=corpo)
+        return response.status_code
+
+    def aguardar_chegada(self, servico, id_jogo, limite):
+        campo = "comentario" if servico == "comentarios" else "voto"
+        while perf_counter() < limite:
+            if self.chamar("POST", servico, f"/{servico}/{id_jogo}", {"autor": "sonda", campo: "sonda"}) in (201, 202):
+                return perf_counter()
+            sleep(0.005)
+        return None
+
+
+# --- Cargas ---
+
+def percentis(valores_ms):
+    if not valores_ms:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    ordenados = sorted(valores_ms)
+
+    def p(n):
+        return round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * n / 100))], 3)
+
+    return {"p50_ms": p(50), "p95_ms": p(95), "p99_ms": p(99)}
+
+
+def executar_concorrente(alvo, operacoes, concorrencia, duracao):
+    """Cada thread sorteia operações até o tempo acabar"""
+    latencias, erros = [], [0]
+    lock = threading.Lock()
+    fim = perf_counter() + duracao
+
+    def trabalhador():
+        locais, falhas = [], 0
+        while perf_counter() < fim:
+            metodo, servico, caminho, corpo = random.choice(operacoes)()
+            inicio = perf_counter()
+            try:
+                if alvo.chamar(metodo, servico, caminho, corpo) >= 400:
+                    falhas += 1
+            except Exception:
+                falhas += 1
+            locais.append((perf_counter() - inicio) * 1000)
+        with lock:
+            latencias.extend(locais)
+            erros[0] += falhas
+
+    inicio = perf_counter()
+    threads = [threading.Thread(target=trabalhador) for _ in range(concorrencia)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = perf_counter() - inicio
+    return {"operacoes": len(latencias), "erros": erros[0], "ops_s": round(len(latencias) / total, 1),
+            **percentis(latencias)}
+
+
+def novos_jogos(quantidade):
+    base = int(time() * 1000) * 1000
+    return [
+        {"id_jogo": base + i, "time1": random.choice(TIMES), "time2": random.choice(TIMES), "data": "2025-11-01"}
+        for i in range(quantidade)
+    ]
+
+
+def preparar_jogos(alvo, quantidade, timeout=30):
+    """Cria jogos e espera os dois serviços consumidores os conhecerem"""
+    jogos = novos_jogos(quantidade)
+    alvo.chamar("POST", "jogos", "/jogos", jogos)
+    limite = perf_counter() + timeout
+    for jogo in jogos:
+        for servico in ("comentarios", "votacao"):
+            if alvo.aguardar_chegada(servico, jogo["id_jogo"], limite) is None:
+                raise RuntimeError(f"Jogo {jogo['id_jogo']} não chegou a {servico}")
+    return [jogo["id_jogo"] for jogo in jogos]
+
+
+def carga_ingestao(alvo, args):
+    """Rajadas de POST /jogos e atraso até cada jogo chegar aos consumidores"""
+    latencias, atrasos, perdidos = [], defaultdict(list), 0
+    inicio_total = perf_counter()
+    for _ in range(args.rajadas):
+        jogos = novos_jogos(args.lote)
+        inicio = perf_counter()
+        status = alvo.chamar("POST", "jogos", "/jogos", jogos)
+        latencias.append((perf_counter() - inicio) * 1000)
+        if status != 201:
+            perdidos += len(jogos)
+            continue
+        amostra = jogos if isinstance(alvo, AlvoLocal) else random.sample(jogos, min(args.amostras_atraso, len(jogos)))
+        limite = perf_counter() + args.timeout_atraso
+        for jogo in amostra:
+            for servico in ("comentarios", "votacao"):
+                chegada = alvo.aguardar_chegada(servico, jogo["id_jogo"], limite)
+                if chegada is None:
+                    perdidos += 1
+                else:
+                    atrasos[servico].append((chegada - inicio) * 1000)
+    total = perf_counter() - inicio_total
+    return {
+        "jogos": args.rajadas * args.lote,
+        "jogos_s": round(args.rajadas * args.lote / total, 1),
+        "post_jogos": percentis(latencias),
+        "atraso_eventos": {servico: percentis(valores) for servico, valores in atrasos.items()},
+        "eventos_nao_recebidos": perdidos,
+    }
+
+
+def carga_tempestade(alvo, args):
+    """Comentários e votos concentrados em poucos jogos quentes"""
+    ids = preparar_jogos(alvo, args.jogos_quentes)
+
+    def comentar():
+        return ("POST", "comentarios", f"/comentarios/{random.choice(ids)}",
+                {"autor": f"torcedor{random.randint(1, 10000)}", "comentario": "Que jogo!"})
+
+    def votar():
+        return ("POST", "votacao", f"/votacao/{random.choice(ids)}",
+                {"autor": f"torcedor{random.randint(1, 10000)}", "voto": random.choice(TIMES)})
+
+    return executar_concorrente(alvo, [comentar, votar], args.concorrencia, args.duracao)
+
+
+def carga_mista(alvo, args):
+    """Leituras e escritas misturadas na proporção de --leituras"""
+    ids = preparar_jogos(alvo, args.jogos_quentes)
+
+    def ler_jogos():
+        return ("GET", "jogos", "/jogos", None)
+
+    def ler_comentarios():
+        return ("GET", "comentarios", f"/comentarios/{random.choice(ids)}?limit=50", None)
+
+    def ler_placar():
+        return ("GET", "votacao", f"/votacao/{random.choice(ids)}/placar", None)
+
+    def comentar():
+        return ("POST", "comentarios", f"/comentarios/{random.choice(ids)}",
+                {"autor": "misto", "comentario": "Vamos!"})
+
+    def votar():
+        return ("POST", "votacao", f"/votacao/{random.choice(ids)}",
+                {"autor": f"torcedor{random.randint(1, 10000)}", "voto": random.choice(TIMES)})
+
+    leituras = [ler_jogos, ler_comentarios, ler_placar]
+    escritas = [comentar, votar]
+    pesos = max(1, round(args.leituras * 10)), max(1, round((1 - args.leituras) * 10))
+    operacoes = leituras * pesos[0] + escritas * pesos[1]
+    return executar_concorrente(alvo, operacoes, args.concorrencia, args.duracao)
+
+
+CARGAS = {"ingestao": carga_ingestao, "tempestade": carga_tempestade, "misto": carga_mista}
+
+
+def commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Carga ponta a ponta no pipeline (vazão, p50/p95/p99 e atraso dos eventos)"
+    )
+    parser.add_argument("--alvo", choices=["local", "http"], default="local",
+                        help="local: serviços no processo com stand-ins; http: serviços no ar")
+    parser.add_argument("--memcached", help="host:porta de um Memcached real no modo local (padrão: em memória)")
+    parser.add_argument("--cargas", default="ingestao,tempestade,misto", help="Cargas separadas por vírgula")
+    parser.add_argument("--concorrencia", type=int, default=16, help="Clientes simultâneos (padrão: 16)")
+    parser.add_argument("--duracao", type=float, default=10, help="Segundos por carga concorrente (padrão: 10)")
+    parser.add_argument("--rajadas", type=int, default=10, help="POSTs de jogos na ingestão (padrão: 10)")
+    parser.add_argument("--lote", type=int, default=200, help="Jogos por POST (padrão: 200)")
+    parser.add_argument("--amostras-atraso", type=int, default=10,
+                        help="Jogos por rajada com atraso medido no modo http (padrão: 10)")
+    parser.add_argument("--timeout-atraso", type=float, default=30, help="Espera máxima por um evento (padrão: 30)")
+    parser.add_argument("--jogos-quentes", type=int, default=5, help="Jogos disputados na tempestade (padrão: 5)")
+    parser.add_argument("--leituras", type=float, default=0.8, help="Fração de leituras no misto (padrão: 0.8)")
+    parser.add_argument("--rotulo", default="", help="Nome da execução gravado com os resultados")
+    parser.add_argument("--saida", help="Acrescenta o resultado a este arquivo JSON lines")
+    args = parser.parse_args()
+
+    # Os logs dos serviços (modo local) vão para stderr; stdout fica só com o JSON
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+
+    alvo = AlvoLocal(args.memcached) if args.alvo == "local" else AlvoHttp()
+    resultado = {
+        "rotulo": args.rotulo,
+        "alvo": args.alvo,
+        "commit": commit_atual(),
+        "inicio": time(),
+        "parametros": {chave: valor for chave, valor in vars(args).items() if chave not in ("saida", "rotulo")},
+        "cargas": {},
+    }
+    for nome in args.cargas.split(","):
+        print(f"[PIPELINE] Executando carga {nome}...", file=sys.stderr, flush=True)
+        resultado["cargas"][nome] = CARGAS[nome](alvo, args)
+
+    saida = json.dumps(resultado, ensure_ascii=False)
+    print(saida, file=stdout)
+    if args.saida:
+        with open(args.saida, "a", encoding="utf-8") as arquivo:
+            arquivo.write(saida + "\n")
@@ -0,0 +1,95 @@
+"""
+Benchmark de publicação - Conexão por requisição vs publicador persistente
+Simula rajadas do crawler publicando lotes de eventos de jogos no exchange fanout
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, wait
+from time import perf_counter
+
+os.environ.setdefault("RABBITMQ_HOST", "localhost")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import pika  # noqa: E402
+from comum.publicador import PoolPublicadores, RABBITMQ_HOST  # noqa: E402
+
+EXCHANGE = "benchmark_publicacao"
+
+
+def lote_de_jogos(tamanho, inicio):
+    return [
+        {"id_jogo": inicio + i, "time1": "Bahia", "time2": "Vitoria", "data": "2025-11-01"}
+        for i in range(tamanho)
+    ]
+
+
+def publicar_conexao_por_requisicao(jogos, confirmar):
+    """Modelo antigo: conecta, declara, publica um a um e desconecta"""
+    credentials = pika.PlainCredentials('admin', 'admin')
+    connection = pika.BlockingConnection(
+        pika.ConnectionParameters(host=RABBITMQ_HOST, credentials=credentials)
+    )
+    channel = connection.channel()
+    channel.exchange_declare(exchange=EXCHANGE, exchange_type="fanout", durable=True)
+    if confirmar:
+        channel.confirm_delivery()
+    for jogo in jogos:
+        channel.basic_publish(
+            exchange=EXCHANGE,
+            routing_key="",
+            body=json.dumps(jogo),
+            properties=pika.BasicProperties(delivery_mode=2)
+        )
+    connection.close()
+
+
+def publicar_persistente(pool, jogos):
+    """Modelo novo: enfileira no pool e espera as confirmações do lote"""
+    propriedades = pika.BasicProperties(delivery_mode=2, content_type="application/json")
+    futuros = [pool.publicar(json.dumps(jogo), propriedades) for jogo in jogos]
+    _, pendentes = wait(futuros, timeout=30)
+    if pendentes:
+        raise RuntimeError(f"{len(pendentes)} mensagens sem confirmação")
+
+
+def medir(nome, publicar, args):
+    """Executa `requisicoes` lotes com `concorrencia` threads simulando o Flask"""
+    latencias = []
+
+    def requisicao(n):
+        inicio = perf_counter()
+        publicar(lote_de_jogos(args.lote, n * args.lote))
+        latencias.append(perf_counter() - inicio)
+
+    inicio = perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concorrencia) as executor:
+        list(executor.map(requisicao, range(args.requisicoes)))
+    duracao = perf_counter() - inicio
+
+    latencias.sort()
+    total = args.requisicoes * args.lote
+    p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] * 1000
+    print(f"[{nome:<28}] {total / duracao:9.0f} msg/s │ requisição p99={p99:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compara vazão de publicação com e sem conexão persistente"
+    )
+    parser.add_argument("--requisicoes", type=int, default=200, help="POSTs simulados (padrão: 200)")
+    parser.add_argument("--lote", type=int, default=20, help="Jogos por POST (padrão: 20)")
+    parser.add_argument("--concorrencia", type=int, default=8, help="Threads do servidor (padrão: 8)")
+    parser.add_argument("--pool", type=int, default=2, help="Conexões do pool persistente (padrão: 2)")
+    args = parser.parse_args()
+
+    medir("conexão por requisição", lambda jogos: publicar_conexao_por_requisicao(jogos, False), args)
+    medir("conexão por requisição+ack", lambda jogos: publicar_conexao_por_requisicao(jogos, True), args)
+
+    pool = PoolPublicadores(EXCHANGE, tamanho=args.pool)
+    try:
+        medir("pool persistente+confirms", lambda jogos: publicar_persistente(pool, jogos), args)
+    finally:
+        pool.parar()
@@ -0,0 +1,96 @@
+"""
+Microbenchmark de serialização - json da biblioteca padrão vs orjson/msgpack e zlib
+Mede codificação, decodificação e bytes de listas de jogos, comentários e votos
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from comum import codec  # noqa: E402
+
+TIMES = ["Bahia", "Vitória", "Flamengo", "Palmeiras", "Grêmio", "Internacional"]
+FRASES = [
+    "Que jogo!", "Juiz ladrão", "Golaço no ângulo, sem chance pro goleiro",
+    "Esse time não joga nada no segundo tempo", "Vamos virar!",
+]
+
+
+def gerar_cargas(jogos, comentarios, votos):
+    """Estruturas com os tamanhos vistos no sistema"""
+    return {
+        "jogos": [
+            {"id_jogo": i, "time1": random.choice(TIMES), "time2": random.choice(TIMES), "data": "2025-11-01"}
+            for i in range(jogos)
+        ],
+        "comentarios": [
+            [seq, {"autor": f"torcedor{random.randint(1, 5000)}", "comentario": random.choice(FRASES)}]
+            for seq in range(1, comentarios + 1)
+        ],
+        "votos": [
+            [seq, {"autor": f"torcedor{random.randint(1, 50000)}", "voto": random.choice(TIMES)}]
+            for seq in range(1, votos + 1)
+        ],
+    }
+
+
+def variantes():
+    """(nome, codificar, decodificar) de cada formato disponível"""
+    lista = [
+        ("json padrão", lambda obj: json.dumps(obj).encode("utf-8"), lambda dados: json.loads(dados.decode("utf-8"))),
+    ]
+    if codec.orjson is not None:
+        lista.append(("orjson", codec.orjson.dumps, codec.orjson.loads))
+    lista.append((
+        f"codec {codec.CODEC_FORMATO}",
+        lambda obj: codec.codificar(obj, comprimir_acima=0),
+        codec.decodificar,
+    ))
+    lista.append((
+        f"codec {codec.CODEC_FORMATO}+zlib",
+        lambda obj: codec.codificar(obj, comprimir_acima=1),
+        codec.decodificar,
+    ))
+    if codec.msgpack is not None:
+        lista.append((
+            "codec msgpack+zlib",
+            lambda obj: codec.codificar(obj, formato="msgpack", comprimir_acima=1),
+            codec.decodificar,
+        ))
+    return lista
+
+
+def medir(funcao, argumento, repeticoes):
+    inicio = perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao(argumento)
+    return (perf_counter() - inicio) / repeticoes, resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compara custo de CPU e bytes dos formatos de serialização"
+    )
+    parser.add_argument("--jogos", type=int, default=2000, help="Jogos na lista (padrão: 2000)")
+    parser.add_argument("--comentarios", type=int, default=1000, help="Comentários no jogo (padrão: 1000)")
+    parser.add_argument("--votos", type=int, default=20000, help="Votos no jogo (padrão: 20000)")
+    parser.add_argument("--repeticoes", type=int, default=20, help="Repetições por medida (padrão: 20)")
+    args = parser.parse_args()
+
+    random.seed(42)
+    cargas = gerar_cargas(args.jogos, args.comentarios, args.votos)
+    for nome_carga, carga in cargas.items():
+        print(f"── {nome_carga} ({len(carga)} itens)")
+        for nome, codificar, decodificar in variantes():
+            tempo_cod, dados = medir(codificar, carga, args.repeticoes)
+            tempo_dec, lido = medir(decodificar, dados, args.repeticoes)
+            assert len(lido) == len(carga)
+            print(
+                f"   [{nome:<20}] codificar {tempo_cod * 1000:8.2f} ms │ "
+                f"decodificar {tempo_dec * 1000:8.2f} ms │ {len(dados) / 1024:9.1f} KiB"
+            )
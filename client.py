@@ -5,6 +5,7 @@ Interface CLI para interagir com os microsserviços via REST
 
 import json
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
 
 # URLs dos serviços
@@ -12,6 +13,10 @@ JOGOS_URL = "http://localhost:5001"
 COMENTARIOS_URL = "http://localhost:5002"
 VOTACAO_URL = "http://localhost:5003"
 
+# Painel: ids por requisição de leitura em lote e requisições simultâneas
+LOTE_IDS = 100
+CONEXOES_PAINEL = 8
+
 
 def get_jogos():
     """Busca todos os jogos"""
@@ -49,6 +54,84 @@ def get_votacao(id_jogo):
         return False, []
 
 
+def get_placar(id_jogo):
+    """Busca o placar agregado da votação de um jogo"""
+    try:
+        response = requests.get(f"{VOTACAO_URL}/votacao/{id_jogo}/placar")
+        if response.status_code == 200:
+            return True, response.json()
+        return False, {}
+    except Exception as e:
+        print(f"Erro ao buscar placar: {e}")
+        return False, {}
+
+
+def get_em_lote(url, ids, params=None):
+    """GET /...?ids=... em lotes de LOTE_IDS; retorna a lista concatenada"""
+    resultado = []
+    for inicio in range(0, len(ids), LOTE_IDS):
+        lote = ",".join(str(id_jogo) for id_jogo in ids[inicio:inicio + LOTE_IDS])
+        response = requests.get(url, params={"ids": lote, **(params or {})})
+        response.raise_for_status()
+        resultado.extend(response.json())
+    return resultado
+
+
+def get_comentarios_varios(ids, limite=None):
+    """Comentários de vários jogos (os últimos `limite` de cada, se informado)"""
+    params = {"limit": limite} if limite else None
+    return get_em_lote(f"{COMENTARIOS_URL}/comentarios", ids, params)
+
+
+def get_votacao_varios(ids, limite=None):
+    """Votos de vários jogos (os últimos `limite` de cada, se informado)"""
+    params = {"limit": limite} if limite else None
+    return get_em_lote(f"{VOTACAO_URL}/votacao", ids, params)
+
+
+def get_placares(ids):
+    """Placares de vários jogos"""
+    return get_em_lote(f"{VOTACAO_URL}/votacao/placar", ids)
+
+
+def get_painel():
+    """Jogos, últimos comentários e placares com poucas requisições paralelas
+
+    Em vez de duas requisições por jogo, busca a lista de jogos e depois os
+    lotes de comentários e placares ao mesmo tempo.
+    """
+    sucesso, jogos = get_jogos()
+    if not sucesso or not jogos:
+        return False, []
+
+    ids = [jogo["id_jogo"] for jogo in jogos]
+    lotes = [ids[inicio:inicio + LOTE_IDS] for inicio in range(0, len(ids), LOTE_IDS)]
+    try:
+        with ThreadPoolExecutor(max_workers=CONEXOES_PAINEL) as executor:
+            futuros_comentarios = [executor.submit(get_comentarios_varios, lote, 1) for lote in lotes]
+            futuros_placares = [executor.submit(get_placares, lote) for lote in lotes]
+            comentarios = {
+                str(item["id_jogo"]): item for futuro in futuros_comentarios for item in futuro.result()
+            }
+            placares = {
+                str(item["id_jogo"]): item for futuro in futuros_placares for item in futuro.result()
+            }
+    except Exception as e:
+        print(f"Erro ao montar painel: {e}")
+        return False, []
+
+    painel = []
+    for jogo in jogos:
+        chave = str(jogo["id_jogo"])
+        painel.append({
+            **jogo,
+            "comentarios": comentarios.get(chave, {}).get("total", 0),
+            "ultimo_comentario": (comentarios.get(chave, {}).get("comentarios") or [None])[-1],
+            "placar": placares.get(chave, {"placar": {}, "total": 0}),
+        })
+    return True, painel
+
+
 def adicionar_comentario(id_jogo, autor, comentario):
     """Adiciona comentário a um jogo"""
     try:
@@ -57,7 +140,7 @@ def adicionar_comentario(id_jogo, autor, comentario):
             f"{COMENTARIOS_URL}/comentarios/{id_jogo}",
             json=payload
         )
-        return response.status_code == 201
+        return response.status_code in (201, 202)
     except Exception as e:
         print(f"Erro ao adicionar comentário: {e}")
         return False
@@ -71,7 +154,7 @@ def adicionar_voto(id_jogo, autor, voto):
             f"{VOTACAO_URL}/votacao/{id_jogo}",
             json=payload
         )
-        return response.status_code == 201
+        return response.status_code in (200, 201, 202)
     except Exception as e:
         print(f"Erro ao adicionar voto: {e}")
         return False
@@ -115,6 +198,33 @@ def imprimir_votacao(id_jogo, votacao):
     print("╚════════════════════════════════════════════════════════════╝\n")
 
 
+def imprimir_placar(placar):
+    print("╔════════════════════════════════════════════════════════════╗")
+    print(f"║  📊 PLACAR DA VOTAÇÃO ({placar['total']} votos)                          ║")
+    print("╠════════════════════════════════════════════════════════════╣")
+    for time, votos in sorted(placar["placar"].items(), key=lambda item: -item[1]):
+        print(f"║  {time:<30}: {votos:>25} ║")
+    print("╚════════════════════════════════════════════════════════════╝\n")
+
+
+def imprimir_painel(painel):
+    print("\n╔════════════════════════════════════════════════════════════╗")
+    print("║              📊 PAINEL DE JOGOS                           ║")
+    print("╠════════════════════════════════════════════════════════════╣")
+    for jogo in painel:
+        placar = jogo["placar"]
+        favorito = max(placar["placar"].items(), key=lambda item: item[1])[0] if placar["total"] else "-"
+        print(
+            f"║  ID: {jogo['id_jogo']:<3} │ {jogo['time1']:<12} x {jogo['time2']:<12} │ "
+            f"💬 {jogo['comentarios']:<5} 🗳️  {placar['total']:<5} ║"
+        )
+        print(f"║          Favorito: {favorito:<39} ║")
+        if jogo["ultimo_comentario"]:
+            ultimo = jogo["ultimo_comentario"]
+            print(f"║          👤 {ultimo['autor']:<10}: {ultimo['comentario'][:34]:<34} ║")
+    print("╚════════════════════════════════════════════════════════════╝\n")
+
+
 def menu_principal():
     print("\n╔════════════════════════════════════════════════════════════╗")
     print("║     ⚽ FUTEBOL MICROSERVICES - EVENT-DRIVEN CLI           ║")
@@ -122,7 +232,8 @@ def menu_principal():
     print("║  1. 📋 Listar jogos e detalhes                            ║")
     print("║  2. 💬 Adicionar comentário                               ║")
     print("║  3. 🗳️  Adicionar voto                                     ║")
-    print("║  4. 🚪 Sair                                                ║")
+    print("║  4. 📊 Painel de jogos                                    ║")
+    print("║  5. 🚪 Sair                                                ║")
     print("╚════════════════════════════════════════════════════════════╝")
     return input("Escolha uma opção: ")
 
@@ -159,10 +270,24 @@ def listar_jogos_e_detalhes():
         else:
             print("❌ Erro ao buscar votação.")
 
+        sucesso, placar = get_placar(id_jogo)
+        if sucesso and placar["total"]:
+            imprimir_placar(placar)
+
     except ValueError:
         print("❌ ID de jogo inválido.")
 
 
+def mostrar_painel():
+    """Mostra todos os jogos com comentários e placar"""
+    print("\n🔄 Montando painel...")
+    sucesso, painel = get_painel()
+    if sucesso:
+        imprimir_painel(painel)
+    else:
+        print("❌ Não há jogos disponíveis ou erro ao buscar.")
+
+
 def adicionar_novo_comentario():
     """Adiciona um novo comentário"""
     print("\n╔════════════════════════════════════════════════════════════╗")
@@ -222,6 +347,8 @@ if __name__ == "__main__":
             elif escolha == "3":
                 adicionar_novo_voto()
             elif escolha == "4":
+                mostrar_painel()
+            elif escolha == "5":
                 print("\n👋 Saindo... Até logo!\n")
                 break
             else:
@@ -3,41 +3,146 @@ Crawler - Carrega dados iniciais através de HTTP
 Lê arquivos JSON e envia via POST para o serviço de jogos
 """
 
+import hashlib
 import json
 import requests
 import os
-from time import sleep
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, sleep
 
 JOGOS_SERVICE_URL = os.getenv("JOGOS_SERVICE_URL", "http://localhost:5001")
+COMENTARIOS_SERVICE_URL = os.getenv("COMENTARIOS_SERVICE_URL", "http://localhost:5002")
+VOTACAO_SERVICE_URL = os.getenv("VOTACAO_SERVICE_URL", "http://localhost:5003")
 
 JOGOS = "data/jogos.json"
 COMENTARIOS = "data/comentarios.json"
 VOTACAO = "data/votacao.json"
 
+# Estado entre iterações: mtime/tamanho/hash do arquivo e impressão digital
+# de cada jogo já enviado, para mandar só o que mudou
+ESTADO = os.getenv("CRAWLER_ESTADO", ".crawler_estado.json")
+TAMANHO_LOTE = 500
+WORKERS_IMPORTACAO = 4
 
-def enviar_jogos():
-    """Envia jogos via HTTP POST para o serviço de jogos"""
+# Sessão keep-alive reaproveitada por todas as requisições
+sessao = requests.Session()
+
+# Na importação em massa cada worker mantém a sua própria sessão
+sessoes_locais = threading.local()
+
+
+def sessao_local():
+    """Sessão keep-alive da thread atual"""
+    if not hasattr(sessoes_locais, "sessao"):
+        sessoes_locais.sessao = requests.Session()
+    return sessoes_locais.sessao
+
+
+def carregar_estado():
+    """Lê o estado salvo da última execução (ou um estado vazio)"""
+    try:
+        with open(ESTADO, "r", encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return {"arquivos": {}, "jogos": {}, "importados": {}, "adiantados": {}}
+
+
+def salvar_estado(estado):
+    """Grava o estado de forma atômica (arquivo temporário + rename)"""
+    temporario = f"{ESTADO}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(estado, arquivo)
+    os.replace(temporario, ESTADO)
+
+
+def impressao_digital(jogo):
+    """Resumo estável do conteúdo de um jogo"""
+    canonico = json.dumps(jogo, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonico.encode("utf-8")).hexdigest()[:16]
+
+
+def ler_registros(caminho, chave, hash_conteudo=None):
+    """Gera os registros do arquivo, atualizando o hash do conteúdo se pedido
+
+    Arquivos .jsonl (um registro por linha) são lidos em streaming; arquivos
+    .json continuam no formato {"<chave>": [...]}.
+    """
+    with open(caminho, "rb") as arquivo:
+        if caminho.endswith(".jsonl"):
+            for linha in arquivo:
+                if hash_conteudo is not None:
+                    hash_conteudo.update(linha)
+                if linha.strip():
+                    yield json.loads(linha)
+        else:
+            conteudo = arquivo.read()
+            if hash_conteudo is not None:
+                hash_conteudo.update(conteudo)
+            yield from json.loads(conteudo)[chave]
+
+
+def enviar_lote(jogos):
+    """Envia um lote de jogos pela sessão keep-alive"""
+    response = sessao.post(f"{JOGOS_SERVICE_URL}/jogos", json=jogos)
+    if response.status_code != 201:
+        print(f"[CRAWLER] Erro HTTP {response.status_code} ao enviar jogos")
+        return False
+    return True
+
+
+def enviar_jogos(caminho=JOGOS, tamanho_lote=TAMANHO_LOTE, completo_forcado=False):
+    """Envia via HTTP POST só os jogos novos ou alterados desde a última vez"""
     sucesso = False
 
     try:
-        with open(JOGOS, "r", encoding="utf-8") as arquivo:
-            conteudo = json.load(arquivo)
-            jogos = conteudo["jogos"]
-
-        # Envia todos os jogos em uma única requisição POST
-        response = requests.post(
-            f"{JOGOS_SERVICE_URL}/jogos",
-            json=jogos,
-            headers={"Content-Type": "application/json"}
-        )
+        estado = carregar_estado()
+        if completo_forcado:
+            estado["arquivos"], estado["jogos"] = {}, {}
+        info = os.stat(caminho)
+        assinatura = {"mtime": info.st_mtime_ns, "tamanho": info.st_size}
+        anterior = estado["arquivos"].get(caminho, {})
+
+        if {chave: anterior.get(chave) for chave in assinatura} == assinatura:
+            print("[CRAWLER] Arquivo de jogos inalterado, nada a enviar")
+            return True
+
+        impressoes = estado["jogos"]
+        hash_conteudo = hashlib.sha256()
+        pendentes, enviados, completo = [], 0, True
+
+        def descarregar():
+            nonlocal enviados, completo
+            if completo and enviar_lote([jogo for jogo, _ in pendentes]):
+                for jogo, digital in pendentes:
+                    impressoes[str(jogo["id_jogo"])] = digital
+                enviados += len(pendentes)
+            else:
+                completo = False
+            pendentes.clear()
 
-        if response.status_code == 201:
-            sucesso = True
-            print(f"[CRAWLER] {len(jogos)} jogos enviados com sucesso")
-            for jogo in jogos:
-                print(f"[CRAWLER] Enviado jogo: {jogo['time1']} vs {jogo['time2']}")
+        for jogo in ler_registros(caminho, "jogos", hash_conteudo):
+            digital = impressao_digital(jogo)
+            if impressoes.get(str(jogo["id_jogo"])) != digital:
+                pendentes.append((jogo, digital))
+                if len(pendentes) >= tamanho_lote:
+                    descarregar()
+        if pendentes:
+            descarregar()
+
+        # Só marca o arquivo como processado se todos os lotes foram aceitos
+        if completo:
+            assinatura["hash"] = hash_conteudo.hexdigest()
+            estado["arquivos"][caminho] = assinatura
+        salvar_estado(estado)
+
+        sucesso = completo
+        if enviados:
+            print(f"[CRAWLER] {enviados} jogos novos ou alterados enviados")
+        elif assinatura.get("hash") == anterior.get("hash"):
+            print("[CRAWLER] Conteúdo de jogos idêntico, nada a enviar")
         else:
-            print(f"[CRAWLER] Erro HTTP {response.status_code} ao enviar jogos")
+            print("[CRAWLER] Nenhum jogo novo ou alterado")
 
     except Exception as e:
         print(f"[CRAWLER] Erro ao enviar jogos: {e}")
@@ -45,19 +150,123 @@ def enviar_jogos():
     return sucesso
 
 
-def enviar_comentarios():
-    """Carrega comentários diretamente via REST (não há eventos para comentários iniciais)"""
-    print("[CRAWLER] Comentários serão adicionados via client.py ou REST API")
-    return True
+def lotes(registros, tamanho):
+    """Agrupa um iterável em listas de até `tamanho` itens"""
+    lote = []
+    for registro in registros:
+        lote.append(registro)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
 
 
-def enviar_votacao():
-    """Carrega votação diretamente via REST (não há eventos para votos iniciais)"""
-    print("[CRAWLER] Votos serão adicionados via client.py ou REST API")
-    return True
+def intervalos(posicoes):
+    """Posições ordenadas -> intervalos [inicio, fim) contíguos"""
+    resultado = []
+    for posicao in posicoes:
+        if resultado and resultado[-1][1] == posicao:
+            resultado[-1][1] += 1
+        else:
+            resultado.append([posicao, posicao + 1])
+    return resultado
+
 
+def importar(nome, url, caminho, chave, tamanho_lote=TAMANHO_LOTE, workers=WORKERS_IMPORTACAO):
+    """Importa itens de vários jogos pelo endpoint _bulk com workers paralelos
+
+    O arquivo é tratado como append-only: o estado guarda quantos itens já
+    foram aceitos em sequência e, como os lotes vão em paralelo, os
+    intervalos aceitos depois de um lote recusado. Só o que falta é
+    enviado, para não duplicar comentários ou votos a cada iteração.
+    """
+    sucesso = False
 
-def run_crawler(loop=True, interval=10):
+    try:
+        estado = carregar_estado()
+        importados = estado.setdefault("importados", {})
+        adiantados = estado.setdefault("adiantados", {})
+        ja_enviados = importados.get(caminho, 0)
+        aceitos = {
+            posicao for inicio, fim in adiantados.get(caminho, []) for posicao in range(inicio, fim)
+        }
+
+        registros = ler_registros(caminho, chave)
+        for _ in range(ja_enviados):
+            next(registros)
+        pendentes = (
+            (posicao, registro)
+            for posicao, registro in enumerate(registros, ja_enviados)
+            if posicao not in aceitos
+        )
+
+        def enviar(lote):
+            """Posições do lote se ele foi aceito; falhas ficam restritas ao lote"""
+            try:
+                response = sessao_local().post(f"{url}/_bulk", json=[registro for _, registro in lote])
+            except requests.RequestException as e:
+                print(f"[CRAWLER] Erro ao enviar lote de {nome}: {e}")
+                return []
+            if response.status_code != 201:
+                print(f"[CRAWLER] Erro HTTP {response.status_code} ao importar lote de {nome}")
+                return []
+            return [posicao for posicao, _ in lote]
+
+        inicio = perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            resultados = [futuro.result() for futuro in [
+                executor.submit(enviar, lote) for lote in lotes(pendentes, tamanho_lote)
+            ]]
+        duracao = perf_counter() - inicio
+
+        # Avança a contagem pelo prefixo contínuo e guarda o resto como intervalos
+        enviados = sum(map(len, resultados))
+        aceitos.update(posicao for posicoes in resultados for posicao in posicoes)
+        total = ja_enviados
+        while total in aceitos:
+            aceitos.discard(total)
+            total += 1
+        importados[caminho] = total
+        adiantados[caminho] = intervalos(sorted(aceitos))
+        if not adiantados[caminho]:
+            del adiantados[caminho]
+        salvar_estado(estado)
+
+        sucesso = all(resultados)
+        if enviados:
+            print(f"[CRAWLER] {enviados} {nome} importados ({enviados / duracao:.0f} itens/s)")
+        elif sucesso:
+            print(f"[CRAWLER] Nada novo para importar em {nome}")
+
+    except StopIteration:
+        print(f"[CRAWLER] Arquivo de {nome} menor que o já importado, ignorado")
+    except Exception as e:
+        print(f"[CRAWLER] Erro ao importar {nome}: {e}")
+
+    return sucesso
+
+
+def enviar_comentarios(tamanho_lote=TAMANHO_LOTE, workers=WORKERS_IMPORTACAO):
+    """Importa comentários em massa via POST /comentarios/_bulk"""
+    return importar(
+        "comentários", f"{COMENTARIOS_SERVICE_URL}/comentarios", COMENTARIOS, "comentarios",
+        tamanho_lote, workers,
+    )
+
+
+def enviar_votacao(tamanho_lote=TAMANHO_LOTE, workers=WORKERS_IMPORTACAO):
+    """Importa votos em massa via POST /votacao/_bulk"""
+    return importar(
+        "votos", f"{VOTACAO_SERVICE_URL}/votacao", VOTACAO, "votacao",
+        tamanho_lote, workers,
+    )
+
+
+def run_crawler(
+    loop=True, interval=10, arquivo=JOGOS, tamanho_lote=TAMANHO_LOTE, completo=False,
+    workers=WORKERS_IMPORTACAO,
+):
     """Executa o crawler"""
     print("=" * 60)
     print("Iniciando Crawler HTTP")
@@ -69,15 +278,16 @@ def run_crawler(loop=True, interval=10):
         while True:
             print(f"\n--- Iteração {iteration} ---")
 
-            if enviar_jogos():
+            # Só a primeira iteração ignora o estado salvo, se pedido
+            if enviar_jogos(arquivo, tamanho_lote, completo_forcado=completo and iteration == 1):
                 print("✓ Jogos publicados")
             else:
                 print("✗ Erro publicando jogos")
 
             sleep(2)
 
-            enviar_comentarios()
-            enviar_votacao()
+            enviar_comentarios(tamanho_lote, workers)
+            enviar_votacao(tamanho_lote, workers)
 
             if not loop:
                 print("\nModo único: execução finalizada")
@@ -108,7 +318,37 @@ if __name__ == "__main__":
         default=10,
         help="Intervalo entre iterações em segundos (padrão: 10)",
     )
+    parser.add_argument(
+        "--arquivo",
+        default=JOGOS,
+        help=f"Arquivo de jogos .json ou .jsonl (padrão: {JOGOS})",
+    )
+    parser.add_argument(
+        "--lote",
+        type=int,
+        default=TAMANHO_LOTE,
+        help=f"Jogos por requisição (padrão: {TAMANHO_LOTE})",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=WORKERS_IMPORTACAO,
+        help=f"Requisições paralelas na importação de comentários e votos (padrão: {WORKERS_IMPORTACAO})",
+    )
+    parser.add_argument(
+        "--completo",
+        action="store_true",
+        help="Ignora o estado salvo e reenvia todos os jogos na primeira iteração",
+    )
 
     args = parser.parse_args()
 
-    run_crawler(loop=not args.once, interval=args.interval)
+    run_crawler(
+        loop=not args.once,
+        interval=args.interval,
+        arquivo=args.arquivo,
+        tamanho_lote=args.lote,
+        completo=args.completo,
+        workers=args.workers,
+    )
@@ -0,0 +1,81 @@
+"""
+Testes do anel - Reparo de réplicas que perderam a chave em incr/append
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from comum.anel import ClienteDistribuido  # noqa: E402
+from pipeline import MemcachedMemoria  # noqa: E402
+
+NOS = [("memcached_a", 11211), ("memcached_b", 11211)]
+
+
+class ReparoConcorrente(MemcachedMemoria):
+    """Réplica em que outra requisição incrementa e repara a chave logo antes do nosso add"""
+
+    def __init__(self, origem):
+        super().__init__()
+        self.origem = origem
+
+    def add(self, chave, valor, expire=0, noreply=None):
+        if chave not in self._dados:
+            super().add(chave, self.origem.incr(chave, 1))
+        return super().add(chave, valor, expire, noreply)
+
+
+def distribuido(fabricar_replica=lambda origem: MemcachedMemoria()):
+    """Cliente com duas réplicas de cada chave; devolve (cliente, origem, réplica) de `chave`"""
+    origem = MemcachedMemoria()
+    replica = fabricar_replica(origem)
+    cliente = ClienteDistribuido([origem, replica], NOS, replicas=2)
+    if cliente._ordem("jogos_1_total")[0] == 1:
+        cliente = ClienteDistribuido([replica, origem], NOS, replicas=2)
+    return cliente, origem, replica
+
+
+def test_incr_copia_o_contador_para_a_replica_vazia():
+    cliente, origem, replica = distribuido()
+    origem.set("jogos_1_total", "10")
+
+    assert cliente.incr("jogos_1_total", 1, noreply=False) == 11
+    assert replica.get("jogos_1_total") == b"11"
+
+
+def test_append_copia_a_pagina_para_a_replica_vazia():
+    cliente, origem, replica = distribuido()
+    origem.set("jogos_1_total", b"[1]\n")
+
+    assert cliente.append("jogos_1_total", b"[2]\n", noreply=False)
+    assert replica.get("jogos_1_total") == b"[1]\n[2]\n"
+
+
+def test_reparo_concorrente_nao_faz_o_contador_voltar():
+    cliente, origem, replica = distribuido(ReparoConcorrente)
+    origem.set("jogos_1_total", "10")
+
+    assert cliente.incr("jogos_1_total", 1, noreply=False) == 11
+    # O outro reparo gravou 12; um set com o 11 desta chamada faria a réplica voltar
+    assert int(replica.get("jogos_1_total")) >= int(origem.get("jogos_1_total")) == 12
+
+
+def test_incr_concorrente_com_replica_vazia():
+    cliente, origem, replica = distribuido()
+    origem.set("jogos_1_total", "0")
+
+    def incrementar():
+        for _ in range(200):
+            cliente.incr("jogos_1_total", 1, noreply=False)
+
+    threads = [threading.Thread(target=incrementar) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert origem.get("jogos_1_total") == b"1600"
+    assert int(replica.get("jogos_1_total")) >= 1600
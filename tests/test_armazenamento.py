@@ -0,0 +1,76 @@
+"""
+Testes do log paginado - Escritas concorrentes sem sequências perdidas ou repetidas
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from comum.armazenamento import EscritaParcial, LogPaginado  # noqa: E402
+from pipeline import MemcachedMemoria  # noqa: E402
+
+THREADS = 8
+ESCRITAS = 100
+
+
+def escrever_em_paralelo(log, cliente, fragmento=None):
+    """Cada thread grava ESCRITAS itens, alternando adicionar e adicionar_varios"""
+    seqs = []
+    lock = threading.Lock()
+
+    def escrever(thread):
+        minhas = []
+        for i in range(0, ESCRITAS, 4):
+            minhas.append(log.adicionar(cliente, "1", [thread, i], fragmento))
+            minhas.extend(log.adicionar_varios(cliente, "1", [[thread, i + j] for j in range(1, 4)], fragmento))
+        with lock:
+            seqs.extend(minhas)
+
+    threads = [threading.Thread(target=escrever, args=(thread,)) for thread in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return seqs
+
+
+@pytest.mark.parametrize("fragmento", [None, 3])
+def test_escritas_concorrentes_nao_perdem_nem_repetem_sequencias(fragmento):
+    log, cliente = LogPaginado("comentarios", tamanho_pagina=7), MemcachedMemoria()
+    total = THREADS * ESCRITAS
+
+    seqs = escrever_em_paralelo(log, cliente, fragmento)
+
+    assert sorted(seqs) == list(range(1, total + 1))
+    assert log.total(cliente, "1") == total
+    entradas = log.ler_intervalo(cliente, "1", 1, total)
+    assert [seq for seq, _ in entradas] == list(range(1, total + 1))
+    assert sorted(tuple(item) for _, item in entradas) == sorted(
+        (thread, i) for thread in range(THREADS) for i in range(ESCRITAS)
+    )
+
+
+def test_falha_no_meio_do_lote_indica_so_os_itens_pendentes():
+    log, cliente = LogPaginado("comentarios", tamanho_pagina=3), MemcachedMemoria()
+    append = cliente.append
+
+    def append_falhando(chave, valor, **kwargs):
+        if chave.endswith("_p1"):
+            raise ConnectionError("nó fora do ar")
+        return append(chave, valor, **kwargs)
+
+    cliente.append = append_falhando
+    with pytest.raises(EscritaParcial) as erro:
+        log.adicionar_varios(cliente, "1", list("abcdefg"))
+
+    assert erro.value.gravadas == [(1, "a"), (2, "b"), (3, "c")]
+    assert erro.value.pendentes == ["d", "e", "f", "g"]
+
+    cliente.append = append
+    log.adicionar_varios(cliente, "1", erro.value.pendentes)
+    assert log.ler(cliente, "1") == list("abcdefg")
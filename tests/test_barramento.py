@@ -0,0 +1,57 @@
+"""
+Testes do barramento em processo - Assinantes atrasados encerram o stream
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from comum.barramento import ATRASADO, Barramento, acompanhar  # noqa: E402
+
+
+def test_sentinela_nao_se_confunde_com_timeout():
+    assert ATRASADO is not None
+
+
+def test_timeout_produz_none_para_keep_alive():
+    barramento = Barramento(tamanho_fila=2)
+    fila = barramento.assinar("1")
+    eventos = acompanhar(fila, 0.01)
+    assert next(eventos) is None
+    barramento.publicar("1", (1, {"voto": "Bahia"}))
+    assert next(eventos) == (1, {"voto": "Bahia"})
+
+
+def test_fila_cheia_encerra_o_stream():
+    barramento = Barramento(tamanho_fila=2)
+    fila = barramento.assinar("1")
+    for seq in range(1, 4):
+        barramento.publicar("1", (seq, {"voto": "Bahia"}))
+
+    # Os eventos pendentes foram descartados e o laço termina, sem keep-alive
+    assert list(acompanhar(fila, 0.01)) == []
+
+
+def test_fila_cheia_nao_afeta_outros_assinantes():
+    barramento = Barramento(tamanho_fila=2)
+    lento, outro = barramento.assinar("1"), barramento.assinar("1")
+    for seq in range(1, 4):
+        barramento.publicar("1", (seq, {}))
+        if seq < 3:
+            outro.get_nowait()
+
+    assert list(acompanhar(lento, 0.01)) == []
+    assert next(acompanhar(outro, 0.01)) == (3, {})
+
+
+def test_limite_de_assinantes_por_processo():
+    barramento = Barramento(limite=2)
+    primeira, segunda = barramento.assinar("1"), barramento.assinar("2")
+    assert barramento.assinar("1") is None
+
+    barramento.cancelar("1", primeira)
+    barramento.cancelar("1", primeira)
+    assert barramento.assinar("3") is not None
+    assert barramento.assinar("3") is None
+    assert segunda is not None
@@ -0,0 +1,58 @@
+"""
+Testes da ingestão em lote - Itens aceitos por várias threads são gravados uma única vez
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from comum import ingestao  # noqa: E402
+from comum.ingestao import GravacaoParcial, IngestaoEmLote  # noqa: E402
+
+
+def test_itens_aceitos_em_paralelo_sao_gravados_uma_vez():
+    gravados, lock = [], threading.Lock()
+
+    def gravar(id_jogo, itens):
+        with lock:
+            gravados.extend((id_jogo, item) for item in itens)
+
+    lote = IngestaoEmLote("TESTE", gravar, capacidade=100_000, intervalo=0.001, maximo=50)
+    lote.iniciar()
+    aceitos, lock_aceitos = [], threading.Lock()
+
+    def enfileirar(thread):
+        meus = [(str(i % 5), (thread, i)) for i in range(500) if lote.enfileirar(str(i % 5), (thread, i))]
+        with lock_aceitos:
+            aceitos.extend(meus)
+
+    threads = [threading.Thread(target=enfileirar, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    lote.parar()
+
+    assert len(aceitos) == 8 * 500
+    assert sorted(gravados) == sorted(aceitos)
+    assert not lote.enfileirar("1", "depois do encerramento")
+
+
+def test_gravacao_parcial_regrava_so_os_pendentes(monkeypatch):
+    monkeypatch.setattr(ingestao, "ESPERA_TENTATIVA", 0)
+    chamadas, gravados = [], []
+
+    def gravar(id_jogo, itens):
+        chamadas.append(list(itens))
+        if len(chamadas) == 1:
+            gravados.extend(itens[:2])
+            raise GravacaoParcial(itens[2:], itens[:2]) from ConnectionError("nó fora do ar")
+        gravados.extend(itens)
+
+    lote = IngestaoEmLote("TESTE", gravar)
+    lote._gravar([("1", item) for item in "abcde"])
+
+    assert chamadas == [list("abcde"), list("cde")]
+    assert gravados == list("abcde")
@@ -0,0 +1,112 @@
+"""
+Testes do outbox - Eventos gravados em paralelo chegam todos ao broker, em ordem
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app", "jogos"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+import outbox  # noqa: E402
+from comum.codec import decodificar_mensagem  # noqa: E402
+from comum.publicador import ErroPublicacao  # noqa: E402
+from pipeline import MemcachedMemoria  # noqa: E402
+
+
+class PublicadorFalso:
+    """Guarda as mensagens; `confirmar` decide se o Future já volta resolvido"""
+
+    def __init__(self, confirmar=True):
+        self.confirmar = confirmar
+        self.mensagens = []
+        self.futuros = []
+
+    def publicar(self, corpo, properties=None):
+        futuro = Future()
+        if self.confirmar:
+            futuro.set_result(True)
+        self.mensagens.append((corpo, properties))
+        self.futuros.append(futuro)
+        return futuro
+
+
+def relay_com(cliente, publicador):
+    return outbox.RelayOutbox(lambda: cliente, lambda: publicador)
+
+
+def test_eventos_gravados_em_paralelo_sao_publicados_uma_vez_em_ordem():
+    cliente, publicador = MemcachedMemoria(), PublicadorFalso()
+
+    def registrar(thread):
+        for i in range(50):
+            outbox.registrar_eventos(cliente, [{"id_jogo": thread * 1000 + i}])
+
+    threads = [threading.Thread(target=registrar, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    gravados = [jogo["id_jogo"] for _, jogo in outbox.outbox.ler_intervalo(cliente, outbox.ORIGEM, 1, 400)]
+    relay = relay_com(cliente, publicador)
+    while relay.drenar():
+        pass
+
+    ids = [
+        decodificar_mensagem(corpo, properties)["id_jogo"]
+        for corpo, properties in publicador.mensagens
+    ]
+    assert sorted(ids) == sorted(thread * 1000 + i for thread in range(8) for i in range(50))
+    assert ids == gravados
+    assert cliente.get(outbox.CHAVE_CURSOR) == b"400"
+
+
+def test_lacuna_so_e_pulada_depois_da_espera(monkeypatch):
+    cliente, publicador = MemcachedMemoria(), PublicadorFalso()
+    agora = [1000.0]
+    monkeypatch.setattr(outbox, "monotonic", lambda: agora[0])
+
+    # Sequência 1 reservada por uma escrita ainda em andamento
+    outbox.outbox.reservar(cliente, outbox.ORIGEM)
+    outbox.registrar_eventos(cliente, [{"id_jogo": 2}])
+    relay = relay_com(cliente, publicador)
+
+    for _ in range(100):
+        assert relay.drenar() is False
+    agora[0] += outbox.ESPERA_LACUNA_SEGUNDOS - 1
+    assert relay.drenar() is False
+    assert publicador.mensagens == []
+
+    agora[0] += 2
+    relay.drenar()
+    assert cliente.get(outbox.CHAVE_CURSOR) == b"1"
+    relay.drenar()
+    assert len(publicador.mensagens) == 1
+    assert cliente.get(outbox.CHAVE_CURSOR) == b"2"
+
+
+def test_lote_sem_confirmacao_nao_e_enfileirado_de_novo(monkeypatch):
+    cliente, publicador = MemcachedMemoria(), PublicadorFalso(confirmar=False)
+    monkeypatch.setattr(outbox, "TIMEOUT_CONFIRMACAO", 0.01)
+    outbox.registrar_eventos(cliente, [{"id_jogo": i} for i in range(1, 6)])
+    relay = relay_com(cliente, publicador)
+
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            relay.drenar()
+    assert len(publicador.mensagens) == 5
+
+    # Só o recusado pelo broker é republicado
+    publicador.futuros[0].set_exception(ErroPublicacao("nack"))
+    for futuro in publicador.futuros[1:]:
+        futuro.set_result(True)
+    publicador.confirmar = True
+    assert relay.drenar() is False
+    assert len(publicador.mensagens) == 6
+    assert cliente.get(outbox.CHAVE_CURSOR) == b"5"